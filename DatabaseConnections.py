@@ -1,5 +1,11 @@
+import json
+import os
 import sqlite3
+import time
+import uuid
+from collections import namedtuple
 from datetime import datetime
+from decimal import Decimal
 
 class DatabaseManager:
     def __init__(self, db_name='weights.db'):
@@ -42,4 +48,391 @@ class DatabaseManager:
         with sqlite3.connect(self.db_name) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM weight_events ORDER BY id DESC')
-            return cursor.fetchall()
\ No newline at end of file
+            return cursor.fetchall()
+
+# Shared by the desktop app and the web server; REPLICA_DB overrides it.
+# Resolved from this module so it does not depend on the working directory
+REPLICA_PATH = os.environ.get('REPLICA_DB') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'replica.db'
+)
+
+
+class LocalReplica:
+    """
+    Local SQLite copy of the Access tables that the views read.
+
+    The Access files live on a network share, so every read pays the SMB
+    round trips. The replica keeps BDEnturne (per folio), TablaPesajes2 (per
+    folio) and Taras in a local file that answers in milliseconds. It is
+    filled by common.replica_sync.ReplicaSync; writes still go to Access and
+    are then copied here. sync_state records when each table/scope was last
+    copied, so callers can show how stale the data is.
+    """
+
+    VEHICLE_COLUMNS = (
+        "ID", "Folio", "Consecutivo", "Cedula", "NombreConductor", "Placa", "Remolque",
+        "GrupoProducto", "Producto", "Proceso", "Cliente", "Origen", "Destino",
+        "Estado", "Ejes", "TipoEmbalaje",
+    )
+    PESAJE_COLUMNS = (
+        "Id", "Folio", "Proceso", "IdentificacionPlaca", "Terminaltractor",
+        "PesoInicial", "PesoFinal", "PesoBruto",
+    )
+    TARA_COLUMNS = ("VEHICULO", "PESO", "FECHA")
+
+    def __init__(self, db_name=REPLICA_PATH):
+        self.db_name = db_name
+        self.create_tables()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        conn.row_factory = _namedtuple_factory
+        return conn
+
+    def create_tables(self):
+        """Create the replica tables if they don't exist"""
+        with sqlite3.connect(self.db_name) as conn:
+            # WAL lets the views read while the sync thread writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            cursor = conn.cursor()
+            # Value columns have no declared type so SQLite stores exactly what
+            # Access returned (no affinity conversion) and comparisons stay exact
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bdenturne (
+                    ID INTEGER PRIMARY KEY,
+                    Folio INTEGER,
+                    Consecutivo INTEGER,
+                    Cedula,
+                    NombreConductor,
+                    Placa,
+                    Remolque,
+                    GrupoProducto,
+                    Producto,
+                    Proceso,
+                    Cliente,
+                    Origen,
+                    Destino,
+                    Estado,
+                    Ejes,
+                    TipoEmbalaje
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS ix_bdenturne_folio ON bdenturne (Folio, Consecutivo)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tabla_pesajes2 (
+                    Id INTEGER PRIMARY KEY,
+                    Folio INTEGER,
+                    Proceso,
+                    IdentificacionPlaca,
+                    Terminaltractor,
+                    PesoInicial,
+                    PesoFinal,
+                    PesoBruto
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS ix_tabla_pesajes2_folio ON tabla_pesajes2 (Folio, Id)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS taras (
+                    VEHICULO,
+                    PESO,
+                    FECHA
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    table_name TEXT,
+                    scope TEXT,
+                    synced_at FLOAT,
+                    row_count INTEGER,
+                    PRIMARY KEY (table_name, scope)
+                )
+            ''')
+            conn.commit()
+
+    def replace_vehicles(self, folio, rows):
+        """
+        Replace the BDEnturne rows of a folio.
+
+        Returns:
+            True if the rows differ from the ones already stored
+        """
+        return self._replace('bdenturne', self.VEHICLE_COLUMNS, 'Folio = ?', (folio,),
+                             'Consecutivo, ID', rows, folio)
+
+    def replace_pesajes(self, folio, rows):
+        """Replace the TablaPesajes2 rows of a folio; returns True if they changed"""
+        return self._replace('tabla_pesajes2', self.PESAJE_COLUMNS, 'Folio = ?', (folio,),
+                             'Id', rows, folio)
+
+    def replace_taras(self, rows):
+        """Replace the whole Taras table; returns True if it changed"""
+        return self._replace('taras', self.TARA_COLUMNS, '1 = 1', (), 'rowid', rows, '*')
+
+    def update_vehicle(self, vehicle):
+        """Copy a vehicle already written to Access (write-through)"""
+        columns = [c for c in self.VEHICLE_COLUMNS if c in vehicle and c != 'ID']
+        if not columns:
+            return 0
+        conn = self.connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    f"UPDATE bdenturne SET {', '.join(f'{c} = ?' for c in columns)} WHERE ID = ?",
+                    [_to_sqlite(vehicle[c]) for c in columns] + [vehicle['ID']],
+                )
+                return cursor.rowcount
+        finally:
+            conn.close()
+
+    def fetch_vehicle_summary(self, folio):
+        """Rows of a folio with the same columns as DatabaseManager.fetch_vehicle_summary"""
+        conn = self.connect()
+        try:
+            return conn.execute(
+                'SELECT ID, Cedula, NombreConductor, Placa, Remolque, GrupoProducto, '
+                'Producto, Proceso, Cliente, Origen, Destino, Estado, Ejes, TipoEmbalaje '
+                'FROM bdenturne WHERE Folio = ? ORDER BY Consecutivo, ID',
+                (folio,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def get_pesajes_resumen(self, folio):
+        """Same result as PesajesManager.get_pesajes_resumen"""
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                'SELECT Proceso, IdentificacionPlaca, Terminaltractor, PesoInicial, PesoFinal, PesoBruto '
+                'FROM tabla_pesajes2 WHERE Folio = ? ORDER BY Id',
+                (folio,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "Proceso": row.Proceso,
+                "Contenedor": row.IdentificacionPlaca,
+                "TerminalTractor": row.Terminaltractor,
+                "Peso Inicial": row.PesoInicial,
+                "Peso Final": row.PesoFinal,
+                "Bruto": row.PesoBruto,
+            }
+            for row in rows
+        ]
+
+    def get_taras(self):
+        """Retrieve the replicated Taras rows"""
+        conn = self.connect()
+        try:
+            return conn.execute('SELECT VEHICULO, PESO, FECHA FROM taras ORDER BY rowid').fetchall()
+        finally:
+            conn.close()
+
+    def last_sync(self, table_name, scope):
+        """Time (time.time()) of the last copy of a table/scope, or None if never copied"""
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                'SELECT synced_at FROM sync_state WHERE table_name = ? AND scope = ?',
+                (table_name, str(scope)),
+            ).fetchone()
+            return row.synced_at if row else None
+        finally:
+            conn.close()
+
+    def staleness(self, table_name, scope):
+        """Seconds since the last copy of a table/scope, or None if never copied"""
+        synced_at = self.last_sync(table_name, scope)
+        if synced_at is None:
+            return None
+        return max(0.0, time.time() - synced_at)
+
+    def _replace(self, table_name, columns, where, params, order_by, rows, scope):
+        new_rows = [tuple(_to_sqlite(value) for value in row) for row in rows]
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            with conn:
+                current = conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {table_name} WHERE {where} ORDER BY {order_by}",
+                    params,
+                ).fetchall()
+                changed = current != new_rows
+                if changed:
+                    conn.execute(f"DELETE FROM {table_name} WHERE {where}", params)
+                    # OR REPLACE: a row that moved to this scope in Access (e.g. a
+                    # vehicle changed folio) may still be stored under its old scope
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {table_name} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' for _ in columns)})",
+                        new_rows,
+                    )
+                conn.execute(
+                    'INSERT OR REPLACE INTO sync_state (table_name, scope, synced_at, row_count) '
+                    'VALUES (?, ?, ?, ?)',
+                    (table_name, str(scope), time.time(), len(new_rows)),
+                )
+            return changed
+        finally:
+            conn.close()
+
+
+class LocalOutbox:
+    """
+    Local append-only outbox for writes that could not reach Access.
+
+    Every pending write is a row with an idempotency key, the operation name
+    and its JSON payload. common.outbox.OutboxReplayer drains the rows in
+    order once the network share is back and marks them as sent (rows are
+    never rewritten, only their state changes). Adding the same key twice is
+    a no-op, so a caller that retries after a crash cannot queue a write twice.
+    """
+
+    PENDING = 'pendiente'
+    SENT = 'enviado'
+    FAILED = 'error'
+
+    def __init__(self, db_name='outbox.db'):
+        self.db_name = db_name
+        self.create_tables()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        conn.row_factory = _namedtuple_factory
+        return conn
+
+    def create_tables(self):
+        """Create the outbox table if it doesn't exist"""
+        with sqlite3.connect(self.db_name) as conn:
+            # WAL: the scale station appends while the replayer reads
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    clave TEXT NOT NULL UNIQUE,
+                    operacion TEXT NOT NULL,
+                    datos TEXT NOT NULL,
+                    creado REAL NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'pendiente',
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    ultimo_error TEXT,
+                    enviado REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_outbox_estado ON outbox (estado, seq)')
+            conn.commit()
+
+    def add(self, operacion, datos, clave=None, estado=PENDING, error=None):
+        """
+        Append a write.
+
+        Args:
+            operacion: Handler name in the replayer ('update_vehicle', 'insert_weight'...)
+            datos: JSON-serializable payload
+            clave: Idempotency key (a new one is generated if None)
+            estado: Initial state; FAILED stores a write another queue gave up on
+            error: Error that made it fail (with estado=FAILED)
+
+        Returns:
+            The idempotency key
+        """
+        clave = clave or uuid.uuid4().hex
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT OR IGNORE INTO outbox (clave, operacion, datos, creado, estado, ultimo_error) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (clave, operacion, json.dumps(datos, default=str, ensure_ascii=False), time.time(),
+                     estado, str(error) if error is not None else None),
+                )
+        finally:
+            conn.close()
+        return clave
+
+    def pending(self, limit=100):
+        """Oldest pending writes in insertion order, with datos already decoded"""
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                'SELECT seq, clave, operacion, datos, intentos FROM outbox '
+                'WHERE estado = ? ORDER BY seq LIMIT ?',
+                (self.PENDING, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row._replace(datos=json.loads(row.datos)) for row in rows]
+
+    def pending_count(self):
+        conn = self.connect()
+        try:
+            return conn.execute(
+                'SELECT COUNT(*) AS n FROM outbox WHERE estado = ?', (self.PENDING,)
+            ).fetchone().n
+        finally:
+            conn.close()
+
+    def mark_sent(self, clave):
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    'UPDATE outbox SET estado = ?, enviado = ? WHERE clave = ?',
+                    (self.SENT, time.time(), clave),
+                )
+        finally:
+            conn.close()
+
+    def mark_failed(self, clave, error, give_up=False):
+        """Record a failed attempt; give_up moves the row out of the pending queue"""
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            with conn:
+                conn.execute(
+                    'UPDATE outbox SET intentos = intentos + 1, ultimo_error = ?, estado = ? WHERE clave = ?',
+                    (str(error), self.FAILED if give_up else self.PENDING, clave),
+                )
+        finally:
+            conn.close()
+
+    def purge_sent(self, older_than=7 * 24 * 3600):
+        """Delete sent rows older than `older_than` seconds; returns the count"""
+        conn = sqlite3.connect(self.db_name, timeout=10)
+        try:
+            with conn:
+                return conn.execute(
+                    'DELETE FROM outbox WHERE estado = ? AND enviado < ?',
+                    (self.SENT, time.time() - older_than),
+                ).rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self):
+        """Row count per state"""
+        conn = self.connect()
+        try:
+            rows = conn.execute('SELECT estado, COUNT(*) AS n FROM outbox GROUP BY estado').fetchall()
+        finally:
+            conn.close()
+        return {row.estado: row.n for row in rows}
+
+
+def _to_sqlite(value):
+    """Access returns datetimes and decimals; store them as text/float"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _namedtuple_factory(cursor, row):
+    # Rows with attribute access (row.Placa), like pyodbc rows
+    fields = tuple(column[0] for column in cursor.description)
+    row_class = _ROW_CLASSES.get(fields)
+    if row_class is None:
+        row_class = namedtuple('ReplicaRow', fields)
+        _ROW_CLASSES[fields] = row_class
+    return row_class(*row)
+
+
+_ROW_CLASSES = {}
@@ -1,4 +1,8 @@
 import flet as ft
+from bisect import bisect_left, insort
+from common.search_index import SearchIndex
+from common.row_views import RowView, ServerSideRows
+from common.vehicle_store import VehicleRecord, VehicleStore
 
 class EditVehicleModal:
     def __init__(self, page, db_manager, on_vehicle_updated):
@@ -229,20 +233,26 @@ class EditVehicleModal:
         }
         
         # Intentar guardar los cambios
-        if self.db_manager.update_vehicle(updated_data):
+        result = self.db_manager.update_vehicle(updated_data)
+        if result:
             # Cerrar el modal
             self.close_modal(e)
             
             # Mostrar mensaje de éxito
+            queued = result == self.db_manager.QUEUED
             self.page.snack_bar = ft.SnackBar(
-                content=ft.Text("¡Cambios guardados correctamente!"),
+                content=ft.Text(
+                    "Cambios guardados; se enviarán a la base de datos cuando responda"
+                    if queued else "¡Cambios guardados correctamente!"
+                ),
                 bgcolor=ft.Colors.GREEN_400
             )
             self.page.snack_bar.open = True
             
-            # Llamar al callback para actualizar los datos
+            # Llamar al callback para actualizar los datos; si el cambio quedó
+            # en la bandeja se pasa tal cual, porque Access aún no lo tiene
             if self.on_vehicle_updated:
-                self.on_vehicle_updated()
+                self.on_vehicle_updated(updated_data if queued else None)
         else:
             # Mostrar mensaje de error
             self.page.snack_bar = ft.SnackBar(
@@ -255,10 +265,35 @@ class EditVehicleModal:
 
         # Modificación de la clase VehicleData para incluir ID 
 class VehicleData:
-    def __init__(self):
+    ITEM_FIELDS = VehicleRecord.FIELDS
+    # Filtro (tarjeta) al que pertenece cada estado; el resto va a 'pendiente'
+    FILTRO_POR_ESTADO = {
+        'En inspeccion': 'inspeccion',
+        'En proceso': 'en_proceso',
+        'Transito entrando': 'entrando',
+        'Finalizado': 'finalizado',
+    }
+    TOTAL_POR_FILTRO = {
+        'inspeccion': 'total_inspeccion',
+        'en_proceso': 'total_proceso',
+        'entrando': 'total_entrando',
+        'finalizado': 'total_finalizados',
+        'pendiente': 'total_pendiente',
+    }
+    
+    def __init__(self, server_side=False):
         
         from common.database_manager import DatabaseManager  # Import the DatabaseManager class
         self.db_manager = DatabaseManager()
+        # Con server_side el filtro, la búsqueda y la paginación se resuelven
+        # en la consulta SQL en lugar de cargar el folio completo
+        self.server_side = server_side
+        self.folio_hasta = None
+        # Réplica local opcional (common.replica_sync.ReplicaSync)
+        self.replica_sync = None
+        # Consultas en segundo plano de las páginas y conteos del modo
+        # server_side (DataLoader.fetch_async); sin él se hacen en el momento
+        self.fetcher = None
         self.data = []
         self.filtered_data = []
         self.totals = {
@@ -269,124 +304,424 @@ class VehicleData:
             'total_proceso': 0,
             'total_pendiente': 0,
         }
+        # Filas compactas (VehicleRecord) con los textos repetidos compartidos
+        self.store = VehicleStore()
+        # Filtro de cada código de estado (índice: estado_code)
+        self._filtro_por_codigo = []
+        # Estado de la última carga, usado por la recarga incremental
+        self.folio_cargado = None
+        self._items_by_id = {}
+        # Rango (folio_desde, folio_hasta) cargado con merge_folio, o None
+        self.rango = None
+        self._records_by_folio = {}
+        self._position_by_id = {}
+        # Índice de búsqueda del folio cargado (posiciones dentro de self.data)
+        self.search_index = SearchIndex()
+        self.current_filter = 'todos'
+        # Posiciones (ordenadas) de las filas de cada filtro
+        self._buckets = {filtro: [] for filtro in self.TOTAL_POR_FILTRO}
+    
+    def load_data(self, fecha_numerica_excel, incremental=True):
+        """
+        Cargar los vehículos de un folio.
+        
+        Si el folio ya está cargado e incremental es True, sólo se reconstruyen
+        las filas nuevas o modificadas y se eliminan las que ya no están; los
+        registros existentes se actualizan en su lugar. Las cubetas por
+        estado que usan apply_filter y los totales se mantienen al día.
+        """
+        rows = self.fetch_rows(fecha_numerica_excel)
+        self.apply_rows(fecha_numerica_excel, rows, incremental)
+    
+    def fetch_rows(self, fecha_numerica_excel, on_first_row=None, from_source=False):
+        """
+        Consultar las filas del folio sin modificar los datos cargados.
+        
+        En modo server_side sólo se consulta el conteo por estado; las filas
+        se piden por páginas cuando se muestran. Con réplica local las filas
+        se leen de ella, salvo que from_source pida copiar antes desde Access.
+        """
+        if self.server_side:
+            rows = self.db_manager.count_vehicles_by_estado(fecha_numerica_excel, self.folio_hasta)
+            if on_first_row:
+                on_first_row()
+            return rows
+        if self.replica_sync is not None:
+            return self.replica_sync.read_vehicles(fecha_numerica_excel, on_first_row, from_source)
+        return self.db_manager.fetch_vehicle_summary(fecha_numerica_excel, on_first_row)
+    
+    def apply_rows(self, fecha_numerica_excel, rows, incremental=True):
+        """Aplicar filas ya consultadas (ver load_data)"""
+        if self.rango is not None:
+            # Venimos de un rango: el folio se carga completo
+            self.rango = None
+            self._records_by_folio = {}
+            self.folio_cargado = None
+        
+        if self.server_side:
+            self._apply_estado_counts(fecha_numerica_excel, rows)
+        elif incremental and self.folio_cargado == fecha_numerica_excel:
+            self._apply_delta(rows)
+        else:
+            self._load_full(fecha_numerica_excel, rows)
+        
+        self.filtered_data = self.data
+    
+    def begin_range(self, folio_desde, folio_hasta):
+        """
+        Preparar la carga de un rango de folios; las filas llegan luego
+        folio por folio con merge_folio (ver DataLoader.load_range).
+        """
+        self.rango = (folio_desde, folio_hasta)
+        self.folio_cargado = None
+        self._records_by_folio = {}
+        self.data = []
+        self.filtered_data = self.data
+        self._items_by_id = {}
+        self._rebuild_positions()
+        self._update_totals()
+    
+    def merge_folio(self, folio, rows):
+        """
+        Agregar (o reemplazar) las filas de un folio del rango cargado.
+        
+        Las filas quedan ordenadas por folio y, dentro de cada folio, en el
+        orden de la consulta. Si el folio es posterior a todos los ya
+        cargados (lo habitual, porque se piden en orden) sólo se indexan las
+        filas nuevas; si no, se reordena el rango completo.
+        """
+        records = self.store.build_many(rows)
+        previous = self._records_by_folio.get(folio)
+        appended = previous is None and all(other < folio for other in self._records_by_folio)
+        self._records_by_folio[folio] = records
+        
+        if previous is not None:
+            for item in previous:
+                self._items_by_id.pop(item.ID, None)
+        for item in records:
+            self._items_by_id[item.ID] = item
+        
+        if appended:
+            start = len(self.data)
+            self.data.extend(records)
+            self._rebuild_positions(start=start)
+        else:
+            self.data = [
+                item
+                for other in sorted(self._records_by_folio)
+                for item in self._records_by_folio[other]
+            ]
+            self._rebuild_positions()
+        
+        self.filtered_data = self.data
+        self._update_totals()
     
-    def load_data(self, fecha_numerica_excel):
-        rows = self.db_manager.fetch_vehicle_data(fecha_numerica_excel)
+    def set_server_side(self, enabled, folio_hasta=None):
+        """
+        Activar o desactivar el modo server_side. Los datos cargados se
+        descartan; hay que volver a cargar el folio.
+        
+        Args:
+            enabled: True para resolver filtro, búsqueda y páginas en SQL
+            folio_hasta: Último folio del rango a consultar (None para uno solo)
+        """
+        self.server_side = enabled
+        self.folio_hasta = folio_hasta
+        self.folio_cargado = None
+        self.rango = None
+        self._records_by_folio = {}
         self.data = []
-        self.reset_counters()
+        self.filtered_data = []
+        self._items_by_id = {}
+        self._rebuild_positions()
+    
+    def _apply_estado_counts(self, fecha_numerica_excel, rows):
+        """Totales de las tarjetas a partir del COUNT(*) ... GROUP BY Estado"""
+        self.folio_cargado = fecha_numerica_excel
+        for key in self.totals:
+            self.totals[key] = 0
+        for estado, total in rows:
+            self.totals['total_pesajes'] += total
+            self.totals[self.TOTAL_POR_FILTRO[self._filtro_de_estado(estado)]] += total
+        self.data = self._server_rows('todos')
+    
+    def _server_rows(self, filtro, search_text=None):
+        """Secuencia paginada desde la base de datos para un filtro y una búsqueda"""
+        estados = None
+        excluir_estados = None
+        if filtro == 'pendiente':
+            excluir_estados = list(self.FILTRO_POR_ESTADO)
+        elif filtro in self._buckets:
+            estados = [estado for estado, f in self.FILTRO_POR_ESTADO.items() if f == filtro]
+        
+        folio = self.folio_cargado
+        if folio is None:
+            return []
+        
+        folio_hasta = self.folio_hasta
+        if not search_text and filtro in self.TOTAL_POR_FILTRO:
+            total = self.totals[self.TOTAL_POR_FILTRO[filtro]]
+        elif not search_text and filtro == 'todos':
+            total = self.totals['total_pesajes']
+        else:
+            # Con búsqueda el total sale de un COUNT(*) que hace ServerSideRows
+            total = None
+        
+        def count():
+            return self.db_manager.count_vehicles(
+                folio, folio_hasta, estados, excluir_estados, search_text
+            )
+        
+        def fetch_page(offset, limit):
+            rows = self.db_manager.fetch_vehicle_page(
+                folio, offset, limit, len(server_rows), folio_hasta,
+                estados, excluir_estados, search_text,
+            )
+            return self.store.build_many(rows)
+        
+        server_rows = ServerSideRows(fetch_page, total, count=count, fetcher=self.fetcher)
+        return server_rows
+    
+    def _load_full(self, fecha_numerica_excel, rows):
+        # Las filas de la consulta no se guardan: sólo los VehicleRecord
+        self.data = self.store.build_many(rows)
+        self._items_by_id = {item.ID: item for item in self.data}
+        
+        self.folio_cargado = fecha_numerica_excel
+        self._rebuild_positions()
+        self._update_totals()
+    
+    def _apply_delta(self, rows):
+        """Aplicar sobre self.data sólo las filas insertadas, modificadas o eliminadas"""
+        seen_ids = []
+        structure_changed = False
         
         for row in rows:
-            # Para cédula, necesitamos formatear el número sin decimales si es float
-            self.cedula_str = ""
-            if row.Cedula is not None:
-                if isinstance(row.Cedula, float):
-                    # Si es un número entero (como 12345.0), mostrar sin decimal
-                    if row.Cedula.is_integer():
-                        self.cedula_str = str(int(row.Cedula))
-                    else:
-                        self.cedula_str = str(row.Cedula)
-                else:
-                    self.cedula_str = str(row.Cedula)
-
-
-            item = {
-                "ID": row.ID,
-                "Cedula": row.Cedula,
-                "NombreConductor": row.NombreConductor,
-                "Placa": row.Placa,
-                "Remolque": row.Remolque,
-                "GrupoProducto": row.GrupoProducto,
-                "Producto": row.Producto,
-                "Proceso": row.Proceso,
-                "Cliente": row.Cliente,
-                "Origen": getattr(row, 'Origen', None),
-                "Destino": getattr(row, 'Destino', None),
-                "Estado": row.Estado,
-                "Ejes": getattr(row, 'Ejes', None),
-                "TipoEmbalaje": getattr(row, 'TipoEmbalaje', None),
-            }
-            self.data.append(item)
+            vehicle_id = row.ID
+            seen_ids.append(vehicle_id)
             
-            # Contar estados
-            self._count_state(row.Estado)
+            item = self._items_by_id.get(vehicle_id)
+            if item is None:
+                # Fila nueva
+                item = self.store.build(row)
+                self._items_by_id[vehicle_id] = item
+                structure_changed = True
+            elif item.as_tuple() != tuple(row):
+                # Fila modificada: actualizar el registro existente
+                self._patch_item(item, self.store.build(row))
         
-        self.totals['total_pesajes'] = len(self.data)
-        self.totals['total_pendiente'] = self.totals['total_pesajes']- self.totals['total_entrando']- self.totals['total_proceso']- self.totals['total_finalizados']- self.totals['total_inspeccion']
-        self.filtered_data = self.data
-        self.filtered_data = self.data
+        # Filas que ya no pertenecen al folio (eliminadas o anuladas)
+        if len(seen_ids) != len(self._items_by_id):
+            current_ids = set(seen_ids)
+            for vehicle_id in list(self._items_by_id):
+                if vehicle_id not in current_ids:
+                    self._items_by_id.pop(vehicle_id)
+            structure_changed = True
+        
+        if structure_changed:
+            # Reordenar según Consecutivo reutilizando los registros existentes
+            previous_data = self.data
+            self.data = [self._items_by_id[vehicle_id] for vehicle_id in seen_ids]
+            
+            # Caso habitual: sólo se agregaron turnos al final
+            appended_only = len(self.data) > len(previous_data) and all(
+                old is new for old, new in zip(previous_data, self.data)
+            )
+            self._rebuild_positions(start=len(previous_data) if appended_only else 0)
+        
+        self._update_totals()
+    
+    def refresh_vehicle(self, vehicle_id, vehicle=None):
+        """
+        Recargar un único vehículo (por ejemplo, después de editarlo) sin
+        volver a consultar todo el folio.
+        
+        Args:
+            vehicle_id: ID del vehículo
+            vehicle: Campos editados que quedaron en la bandeja local
+                     (opcional). Se aplican tal cual a la fila y a la réplica
+                     en lugar de leer de Access, que todavía no los tiene
+        
+        Returns:
+            bool: True si el vehículo estaba cargado y se actualizó
+        """
+        if vehicle is not None:
+            return self._apply_queued_update(vehicle_id, vehicle)
+        return self.apply_vehicle_refresh(vehicle_id, self.fetch_vehicle_refresh(vehicle_id))
+    
+    def fetch_vehicle_refresh(self, vehicle_id):
+        """
+        Consultar lo que necesita refresh_vehicle sin modificar los datos
+        cargados; DataLoader lo llama sin su candado.
+        
+        Returns:
+            (folio, resultado) para apply_vehicle_refresh, o None si el
+            vehículo no está cargado
+        """
+        if self.server_side:
+            folio = self.folio_cargado
+            if folio is None:
+                return None
+            # Conteo por estado; las páginas se vuelven a consultar al filtrar
+            return folio, self.fetch_rows(folio)
+        if vehicle_id not in self._items_by_id:
+            return None
+        return self.folio_cargado, self.db_manager.get_vehicle_by_id(vehicle_id)
+    
+    def apply_vehicle_refresh(self, vehicle_id, refresh):
+        """
+        Aplicar el resultado de fetch_vehicle_refresh.
+        
+        Returns:
+            bool: True si el vehículo estaba cargado y se actualizó
+        """
+        if refresh is None:
+            return False
+        folio, result = refresh
+        if folio != self.folio_cargado:
+            # Otra carga cambió los datos mientras se consultaba
+            return False
+        
+        if self.server_side:
+            self.apply_rows(folio, result)
+            return True
+        
+        item = self._items_by_id.get(vehicle_id)
+        if item is None or not result:
+            return False
+        
+        vehicle = result
+        self._patch_item(item, self.store.build_from_dict(vehicle))
+        if self.replica_sync is not None:
+            # La escritura ya se hizo en Access; copiarla a la réplica
+            self.replica_sync.replica.update_vehicle(vehicle)
+        self._update_totals()
+        return True
+    
+    def _apply_queued_update(self, vehicle_id, vehicle):
+        if self.replica_sync is not None:
+            self.replica_sync.replica.update_vehicle(vehicle)
+        if self.server_side:
+            # Las páginas salen de Access: el cambio se verá al enviarse
+            return self.folio_cargado is not None
+        
+        item = self._items_by_id.get(vehicle_id)
+        if item is None:
+            return False
+        new_item = item.to_dict()
+        new_item.update((field, vehicle[field]) for field in self.ITEM_FIELDS if field in vehicle)
+        self._patch_item(item, self.store.build_from_dict(new_item))
+        self._update_totals()
+        return True
+    
+    def _patch_item(self, item, new_item):
+        old_filtro = self._filtro_de_item(item)
+        item.update(new_item)
+        
+        position = self._position_by_id.get(item["ID"])
+        if position is None:
+            return
         
-    def _count_state(self, estado):
-        if estado == "Finalizado":
-            self.totals['total_finalizados'] += 1
-        elif estado == "En proceso":
-            self.totals['total_proceso'] += 1
-        elif estado == "Transito entrando":
-            self.totals['total_entrando'] += 1
-        elif estado == "En inspeccion":
-            self.totals['total_inspeccion'] += 1
+        # Mover la fila de cubeta si cambió de estado
+        new_filtro = self._filtro_de_item(item)
+        if new_filtro != old_filtro:
+            old_bucket = self._buckets[old_filtro]
+            index = bisect_left(old_bucket, position)
+            if index < len(old_bucket) and old_bucket[index] == position:
+                del old_bucket[index]
+            insort(self._buckets[new_filtro], position)
+        
+        self.search_index.update(position, item)
+    
+    def _rebuild_positions(self, start=0):
+        """
+        Recalcular posiciones, cubetas por estado e índice de búsqueda tras
+        cambiar el orden o el número de filas. Con start > 0 sólo se procesan
+        las filas agregadas al final.
+        """
+        if start == 0:
+            self._position_by_id = {}
+            self._buckets = {filtro: [] for filtro in self.TOTAL_POR_FILTRO}
+            self.search_index.build([])
+        
+        for position in range(start, len(self.data)):
+            item = self.data[position]
+            self._position_by_id[item["ID"]] = position
+            self._buckets[self._filtro_de_item(item)].append(position)
+            self.search_index.add(item)
+    
+    def _filtro_de_estado(self, estado):
+        return self.FILTRO_POR_ESTADO.get(estado, 'pendiente')
+    
+    def _filtro_de_item(self, item):
+        """Filtro de una fila a partir de su código de estado (sin comparar textos)"""
+        filtros = self._filtro_por_codigo
+        code = item.estado_code
+        while len(filtros) <= code:
+            filtros.append(self._filtro_de_estado(self.store.estados.decode(len(filtros))))
+        return filtros[code]
+    
+    def _update_totals(self):
+        """Los totales salen directamente del tamaño de cada cubeta"""
+        self.totals['total_pesajes'] = len(self.data)
+        for filtro, total_key in self.TOTAL_POR_FILTRO.items():
+            self.totals[total_key] = len(self._buckets[filtro])
     
     def reset_counters(self):
         for key in self.totals:
             self.totals[key] = 0
     
     def apply_filter(self, filtro):
-        if filtro == 'todos':
+        """
+        Seleccionar las filas de un filtro. Devuelve una vista sobre la cubeta
+        del estado, sin copiar filas.
+        """
+        self.current_filter = filtro
+        if self.server_side:
+            self.filtered_data = self.data if filtro == 'todos' else self._server_rows(filtro)
+        elif filtro == 'todos':
             self.filtered_data = self.data
-        elif filtro == 'inspeccion':
-            self.filtered_data = [item for item in self.data if item['Estado'] == 'En inspeccion']
-        elif filtro == 'en_proceso':
-            self.filtered_data = [item for item in self.data if item['Estado'] == 'En proceso']
-        elif filtro == 'entrando':
-            self.filtered_data = [item for item in self.data if item['Estado'] == 'Transito entrando']
-        elif filtro == 'finalizado':
-            self.filtered_data = [item for item in self.data if item['Estado'] == 'Finalizado']
-        elif filtro == 'pendiente':
-            self.filtered_data = [item for item in self.data if item['Estado'] != 'En proceso' and 
-                                                                 item['Estado'] != 'Finalizado' and 
-                                                                 item['Estado'] != 'En inspeccion' and
-                                                                 item['Estado'] != 'Transito entrando']
+        elif filtro in self._buckets:
+            self.filtered_data = RowView(self.data, self._buckets[filtro])
         return self.filtered_data
     
-    def search_data(self, search_text):
+    def _matches_filter(self, item):
+        """Indica si una fila pertenece al filtro actual"""
+        if self.current_filter not in self._buckets:
+            return True
+        return self._filtro_de_item(item) == self.current_filter
+    
+    def search_data(self, search_text, base=None):
+        """
+        Buscar texto en los campos de las filas filtradas.
+        
+        Usa el índice de trigramas construido en load_data, así que el costo
+        depende del número de coincidencias y no del tamaño del folio.
+        
+        Args:
+            search_text: Texto a buscar
+            base: Resultado de una búsqueda anterior para refinar (opcional).
+                  Sólo es válido si el texto nuevo contiene al anterior.
+        """
         if not search_text:
-            return self.filtered_data
+            return self.filtered_data if base is None else base
         
-        search_text = search_text.lower()
+        if self.server_side:
+            # La búsqueda se hace en SQL; refinar no ahorra una consulta
+            return self._server_rows(self.current_filter, search_text)
+        
+        if base is not None:
+            candidates = [self._position_by_id[item['ID']] for item in base]
+            positions = self.search_index.search(search_text.lower(), candidates)
+            return [self.data[position] for position in positions]
+        
+        positions = self.search_index.search(search_text.lower())
+        if self.filtered_data is self.data:
+            return [self.data[position] for position in positions]
         
-        def safe_search(value):
-            """Busca text en value manejando distintos tipos de datos"""
-            if value is None:
-                return False
-            
-            # Convertir a string para poder buscar, sin importar el tipo original
-            if isinstance(value, (int, float)):
-                # Para números, convertir a string
-                value_str = str(value)
-            elif isinstance(value, str):
-                # Para strings, mantener como está pero en minúsculas
-                value_str = value.lower()
-            else:
-                # Para otros tipos, intentar convertir a string
-                value_str = str(value).lower()
-                
-            return search_text in value_str
-        
-        # Filtrar usando la función safe_search para cada campo
         result = []
-        for item in self.filtered_data:
-            if (safe_search(item['Cedula']) or
-                safe_search(item['NombreConductor']) or
-                safe_search(item['Placa']) or
-                safe_search(item['Remolque']) or
-                safe_search(item['GrupoProducto']) or
-                safe_search(item['Producto']) or
-                safe_search(item['Proceso']) or
-                safe_search(item['Cliente']) or
-                safe_search(item['Origen']) or
-                safe_search(item['Ejes']) or
-                safe_search(item['Destino']) or
-                safe_search(item['Estado'])or
-                safe_search(item['TipoEmbalaje'])):
+        for position in positions:
+            item = self.data[position]
+            if self._matches_filter(item):
                 result.append(item)
-        
-        return result
\ No newline at end of file
+        return result
@@ -2,6 +2,7 @@ import flet as ft
 from datetime import datetime
 from DatabaseConnections import DatabaseManager
 from common.serial_manager import SerialPortManager
+from common.scale_protocols import get_parser
 
 class WeightTrackingApp:
     def __init__(self, page: ft.Page):
@@ -116,15 +117,15 @@ class WeightTrackingApp:
         self.page.update()
 
     def update_weight_display(self, weight):
-        try:
-            # Remove any non-numeric characters and convert to float
-            numeric_weight = float(''.join(filter(str.isdigit, weight)))
-            # Format with 2 decimal places and add 'kg'
-            formatted_weight = f"{numeric_weight:.2f} kg"
-            self.weight_display.value = formatted_weight
-            self.page.update()
-        except ValueError:
+        # Keep sign, decimals and unit instead of stripping every non-digit
+        reading = get_parser(getattr(self.serial_manager, 'protocol', 'generico'))(weight)
+        if reading is None:
             print(f"Could not parse weight: {weight}")
+            return
+        # Format with 2 decimal places and add the unit
+        formatted_weight = f"{reading.peso:.2f} {reading.unidad}"
+        self.weight_display.value = formatted_weight
+        self.page.update()
 
     def capture_weight(self, e):
         captured_weight = self.weight_display.value
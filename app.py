@@ -1,61 +1,103 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, Response
 from flask_cors import CORS
-import pyodbc
 from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from DatabaseConnections import LocalReplica, REPLICA_PATH
+from common.connection_pool import get_pool
+from common.database_manager import DatabaseManager
+from common.event_hub import EventHub, format_sse
+from common.query_cache import QueryCache
+from common.replica_sync import TARAS_CONN_STR
 
 app = Flask(__name__)
 CORS(app)  # Habilita CORS para toda la app
 
-@app.route('/api/pesajes')
-def index():
-    # Obtener el parámetro de filtro (si existe)
-    filtro = request.args.get('filtro', 'todos')
-    
-    # Conectar a la primera base de datos (Isotanques.accdb)
-    conn_str1 = r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=\\TTRAFEJT2K02\User$\Manuel.Rodriguez\enturne\Isotanques1\Isotanques.accdb'
-    conn1 = pyodbc.connect(conn_str1)
-    cursor1 = conn1.cursor()
+# Réplica local que mantiene al día la aplicación de escritorio; si su copia
+# es más antigua que esto (o no existe) se consulta Access directamente
+REPLICA_MAX_AGE = 120  # segundos
+_replica = None
+_replica_lock = threading.Lock()
 
-    # Realiza la consulta para la primera tabla (Taras)
-    cursor1.execute("SELECT * FROM Taras")
-    rows_taras = cursor1.fetchall()
+# Conexiones compartidas con la aplicación de escritorio (un pool por base)
+taras_pool = get_pool(TARAS_CONN_STR, health_query="SELECT TOP 1 VEHICULO FROM Taras")
+enturne_pool = DatabaseManager().pool
 
-    # Convierte los datos a un formato adecuado para pasar al frontend
-    pesajes_data = []
-    for row in rows_taras:
-        pesajes_data.append({
-            "Vehiculo": row.VEHICULO,  
-            "Peso": row.PESO,  
-            "Fecha": row.FECHA,  
-        })
-
-    # Cerrar la conexión a la primera base de datos
-    cursor1.close()
-    conn1.close()
-
-    # Conectar a la segunda base de datos (EnturneVehiculosSPITB2.mdb)
-    conn_str2 = r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=\\ttrafejt2k02\Shared\Safety Program\CEV 2021\BaseDatos\EnturneVehiculosSPITB2.mdb'
-    conn2 = pyodbc.connect(conn_str2)
-    cursor2 = conn2.cursor()
+# Resultados recientes: varios tableros consultando a la vez generan una sola
+# consulta por clave cada CACHE_TTL segundos. Las escrituras las hace la
+# aplicación de escritorio en otro proceso, así que los datos servidos pueden
+# tener hasta CACHE_TTL segundos de antigüedad
+CACHE_TTL = 10  # segundos
+query_cache = QueryCache(ttl=CACHE_TTL)
 
-    # Calcular la fecha actual en formato numérico de Excel
-    hoy = datetime.now()
-    fecha_numerica_excel = (hoy - datetime(1900, 1, 1)).days + 2  
 
-    # Realiza la consulta para la segunda tabla (BDEnturne)
-    cursor2.execute("SELECT NombreConductor, Placa, Producto, Proceso, Cliente, Estado FROM BDEnturne WHERE Folio = ? Order By Consecutivo", (fecha_numerica_excel,))
-    rows_pesajes1 = cursor2.fetchall()
+def get_replica():
+    """
+    Réplica compartida con la aplicación de escritorio (se abre en el primer uso).
+
+    Returns:
+        LocalReplica, o None si la aplicación de escritorio aún no la creó
+    """
+    global _replica
+    with _replica_lock:
+        if _replica is None and os.path.exists(REPLICA_PATH):
+            _replica = LocalReplica(REPLICA_PATH)
+        return _replica
 
-    # Convierte los datos de la segunda consulta
-    pesajes1_data = []
-    total_finalizados = 0  # Contador de registros con Estado "Finalizado"
-    total_proceso = 0  
-    total_inspeccion = 0
-    total_pendiente = 0
-    filtered_data = []
 
-    for row in rows_pesajes1:
-        item = {
+def replica_is_fresh(table_name, scope):
+    replica = get_replica()
+    if replica is None:
+        return False
+    staleness = replica.staleness(table_name, scope)
+    return staleness is not None and staleness <= REPLICA_MAX_AGE
+
+
+def fetch_all(pool, query, params=()):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def load_taras():
+    """Tabla Taras como lista de diccionarios"""
+    if replica_is_fresh('taras', '*'):
+        rows_taras = get_replica().get_taras()
+    else:
+        # Realiza la consulta para la primera tabla (Taras)
+        rows_taras = fetch_all(taras_pool, "SELECT VEHICULO, PESO, FECHA FROM Taras")
+
+    # Convierte los datos a un formato adecuado para pasar al frontend
+    return [
+        {
+            "Vehiculo": row.VEHICULO,
+            "Peso": row.PESO,
+            "Fecha": row.FECHA,
+        }
+        for row in rows_taras
+    ]
+
+
+def load_vehiculos(folio):
+    """Vehículos del folio (BDEnturne) como lista de diccionarios"""
+    if replica_is_fresh('bdenturne', folio):
+        rows_pesajes1 = get_replica().fetch_vehicle_summary(folio)
+    else:
+        # Misma consulta que la aplicación de escritorio: sólo registros
+        # activos, como los que copia la réplica
+        rows_pesajes1 = fetch_all(enturne_pool, DatabaseManager.VEHICLE_SUMMARY_QUERY, (folio,))
+
+    return [
+        {
+            "ID": row.ID,
             "NombreConductor": row.NombreConductor,
             "Placa": row.Placa,
             "Producto": row.Producto,
@@ -63,19 +105,47 @@ def index():
             "Cliente": row.Cliente,
             "Estado": row.Estado,
         }
-        pesajes1_data.append(item)
-        
+        for row in rows_pesajes1
+    ]
+
+
+def folio_actual():
+    # Calcular la fecha actual en formato numérico de Excel
+    hoy = datetime.now()
+    return (hoy - datetime(1900, 1, 1)).days + 2
+
+
+def contar_estados(pesajes1_data):
+    """Totales de las tarjetas del tablero"""
+    total_finalizados = 0  # Contador de registros con Estado "Finalizado"
+    total_proceso = 0  
+    total_inspeccion = 0
+
+    for item in pesajes1_data:
+        estado = item['Estado']
         # Contar registros con estado "Finalizado"
-        if row.Estado == "Finalizado":
+        if estado == "Finalizado":
             total_finalizados += 1
         # Contar registros con estado "En proceso"
-        elif row.Estado == "En proceso":
+        elif estado == "En proceso":
             total_proceso += 1  
-        elif row.Estado == "En inspeccion":
+        elif estado == "En inspeccion":
             total_inspeccion += 1  
 
     total_pesajes1 = len(pesajes1_data)
     total_pendiente = total_pesajes1 - total_proceso - total_finalizados
+    return {
+        "total_pesajes1": total_pesajes1,
+        "total_finalizados": total_finalizados,
+        "total_proceso": total_proceso,
+        "total_inspeccion": total_inspeccion,
+        "total_pendiente": total_pendiente,
+    }
+
+
+def filtrar_vehiculos(pesajes1_data, filtro):
+    """Vehículos de BDEnturne que corresponden al filtro del tablero"""
+    filtered_data = []
 
     # Filtrar los datos según el filtro seleccionado
     if filtro == 'todos':
@@ -88,21 +158,283 @@ def index():
         filtered_data = [item for item in pesajes1_data if item['Estado'] != 'En inspeccion'and item['Estado'] != 'Finalizado']
     elif filtro == 'pendiente':
         filtered_data = [item for item in pesajes1_data if item['Estado'] != 'En proceso' and item['Estado'] != 'Finalizado']
+    return filtered_data
+
 
-    # Cerrar la conexión a la segunda base de datos
-    cursor2.close()
-    conn2.close()
+def build_pesajes(folio, filtro):
+    """Datos de la página de pesajes para un folio y un filtro"""
+    pesajes_data = query_cache.get(('taras',), load_taras)
+    pesajes1_data = query_cache.get(('bdenturne', folio), lambda: load_vehiculos(folio))
+
+    return {
+        "pesajes_data": pesajes_data,
+        "pesajes1_data": filtrar_vehiculos(pesajes1_data, filtro),
+        **contar_estados(pesajes1_data),
+    }
+
+
+@app.route('/api/pesajes')
+def index():
+    # Obtener el parámetro de filtro (si existe)
+    filtro = request.args.get('filtro', 'todos')
+    folio = folio_actual()
+
+    # Las peticiones simultáneas con el mismo folio comparten una carga
+    context = build_pesajes(folio, filtro)
 
     # Pasar ambas consultas a la plantilla junto con el filtro activo
-    return render_template('index.html', 
-                          pesajes_data=pesajes_data, 
-                          pesajes1_data=filtered_data, 
-                          total_pesajes1=total_pesajes1, 
-                          total_finalizados=total_finalizados, 
-                          total_proceso=total_proceso, 
-                          total_inspeccion=total_inspeccion, 
-                          total_pendiente=total_pendiente,
-                          filtro_activo=filtro)
+    return render_template('index.html', filtro_activo=filtro, **context)
+
+
+# Respuestas JSON del tablero: se serializan, se firman (ETag) y se comprimen
+# una sola vez por carga de las consultas de las que salen. No tienen
+# vencimiento propio, así que no suman antigüedad a la de query_cache
+GZIP_MIN_SIZE = 1024  # bytes
+MAX_ENCODED = 64  # respuestas codificadas guardadas
+_encoded = {}  # clave -> (instantes de carga de sus consultas, (etag, cuerpo, comprimido))
+_encoded_lock = threading.Lock()
+
+
+def encode_json(payload):
+    """(etag, cuerpo, cuerpo comprimido o None) de un objeto JSON"""
+    body = json.dumps(payload, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha1(body).hexdigest()[:20]
+    compressed = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+    return etag, body, compressed
+
+
+def json_response(key, sources, build):
+    """
+    Respuesta JSON con GET condicional.
+
+    Si el cliente envía If-None-Match con el ETag vigente se responde 304 sin
+    cuerpo; si acepta gzip se envía comprimido.
+
+    Args:
+        key: Clave de la respuesta, p. ej. ('totales', folio)
+        sources: Consultas de las que sale, como pares (clave de query_cache, loader)
+        build: Función que recibe los valores de sources y devuelve el objeto JSON
+    """
+    entries = [query_cache.get_entry(source_key, loader) for source_key, loader in sources]
+    stamp = tuple(loaded_at for loaded_at, _ in entries)
+    with _encoded_lock:
+        cached = _encoded.get(key)
+    if cached is not None and cached[0] == stamp:
+        etag, body, compressed = cached[1]
+    else:
+        etag, body, compressed = encoded = encode_json(build(*[value for _, value in entries]))
+        with _encoded_lock:
+            if key not in _encoded and len(_encoded) >= MAX_ENCODED:
+                _encoded.clear()
+            _encoded[key] = (stamp, encoded)
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif compressed is not None and request.accept_encodings['gzip']:
+        response = Response(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def vehiculos_source(folio):
+    return ('bdenturne', folio), lambda: load_vehiculos(folio)
+
+
+def folio_solicitado():
+    folio = request.args.get('folio', type=int)
+    return folio if folio is not None else folio_actual()
+
+
+@app.route('/api/datos/vehiculos')
+def datos_vehiculos():
+    """Vehículos del folio con el filtro del tablero"""
+    filtro = request.args.get('filtro', 'todos')
+    folio = folio_solicitado()
+
+    def build(rows):
+        return {"folio": folio, "filtro": filtro, "vehiculos": filtrar_vehiculos(rows, filtro)}
+
+    return json_response(('vehiculos', folio, filtro), [vehiculos_source(folio)], build)
+
+
+@app.route('/api/datos/totales')
+def datos_totales():
+    """Totales por estado del folio"""
+    folio = folio_solicitado()
+
+    def build(rows):
+        return {"folio": folio, **contar_estados(rows)}
+
+    return json_response(('totales', folio), [vehiculos_source(folio)], build)
+
+
+@app.route('/api/datos/taras')
+def datos_taras():
+    return json_response(('taras',), [(('taras',), load_taras)], lambda taras: {"taras": taras})
+
+
+# Eventos en vivo para los tableros (/api/eventos): un solo productor por
+# fuente y una cola acotada por navegador
+hub = EventHub(client_queue_size=100)
+ESTADO_POLL_INTERVAL = 5  # segundos
+# Báscula conectada a este servidor (opcional; el puerto sólo puede tenerlo
+# abierto un proceso, así que normalmente lo usa la aplicación de escritorio)
+BASCULA_PUERTO = os.environ.get('BASCULA_PUERTO')
+BASCULA_PROTOCOLO = os.environ.get('BASCULA_PROTOCOLO', 'numero')
+PESO_RATE_HZ = 4
+
+
+class EstadoPoller:
+    """
+    Vigila los estados de BDEnturne del folio actual y publica en el hub
+    cada transición ('estado') y los totales nuevos ('totales').
+
+    Lee a través de la misma caché que las peticiones HTTP, así que no
+    agrega consultas por cada tablero conectado.
+    """
+
+    def __init__(self, hub, interval=ESTADO_POLL_INTERVAL):
+        self.hub = hub
+        self.interval = interval
+        self.folio = None
+        self.estados = {}
+        self.totales = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error vigilando los estados de BDEnturne: {e}")
+            time.sleep(self.interval)
+
+    def check(self):
+        folio = folio_actual()
+        rows = query_cache.get(('bdenturne', folio), lambda: load_vehiculos(folio))
+        estados = {row['ID']: row for row in rows}
+
+        if folio != self.folio:
+            # Folio nuevo (o primera lectura): instantánea sin transiciones
+            self.folio = folio
+            self.estados = estados
+            self.totales = contar_estados(rows)
+            self.hub.publish('totales', {"folio": folio, **self.totales}, clave='totales')
+            return
+
+        cambios = []
+        for vehicle_id, row in estados.items():
+            anterior = self.estados.get(vehicle_id)
+            anterior_estado = anterior['Estado'] if anterior else None
+            if anterior_estado != row['Estado']:
+                cambios.append({
+                    "ID": vehicle_id,
+                    "Placa": row['Placa'],
+                    "anterior": anterior_estado,
+                    "nuevo": row['Estado'],
+                })
+        for vehicle_id in self.estados.keys() - estados.keys():
+            anterior = self.estados[vehicle_id]
+            cambios.append({"ID": vehicle_id, "Placa": anterior['Placa'], "anterior": anterior['Estado'], "nuevo": None})
+
+        self.estados = estados
+        if not cambios:
+            return
+
+        for cambio in cambios:
+            self.hub.publish('estado', {"folio": folio, **cambio})
+        self.totales = contar_estados(rows)
+        self.hub.publish('totales', {"folio": folio, **self.totales}, clave='totales')
+
+
+estado_poller = EstadoPoller(hub)
+_producers_lock = threading.Lock()
+_producers_started = False
+
+
+def start_serial_source():
+    """Publicar en el hub las lecturas de la báscula de BASCULA_PUERTO"""
+    from common.display_throttle import DisplayThrottle
+    from common.multi_scale import MultiScaleManager
+
+    scales = MultiScaleManager()
+    scales.add_scale("Báscula 1", port=BASCULA_PUERTO, protocol=BASCULA_PROTOCOLO)
+
+    def publish_reading(event):
+        reading = event["lectura"]
+        hub.publish('peso', {
+            "bascula": event["bascula"],
+            "peso": reading.peso,
+            "unidad": reading.unidad,
+            "estable": reading.estable,
+        }, clave='peso:' + event["bascula"], historial=False)
+
+    # Los navegadores no necesitan cada trama: como máximo PESO_RATE_HZ por segundo
+    throttle = DisplayThrottle(publish_reading, PESO_RATE_HZ)
+    scales.subscribe(throttle.push, tipos=['lectura'])
+    scales.subscribe(
+        lambda event: hub.publish('peso_estable', {"bascula": event["bascula"], **event["estable"]}),
+        tipos=['estable'],
+    )
+    if not scales.connect_all().get("Báscula 1"):
+        print(f"No se pudo abrir la báscula en {BASCULA_PUERTO}")
+    return scales
+
+
+def start_producers():
+    """Arrancar las fuentes de eventos con el primer tablero conectado"""
+    global _producers_started
+    with _producers_lock:
+        if _producers_started:
+            return
+        _producers_started = True
+    estado_poller.start()
+    if BASCULA_PUERTO:
+        start_serial_source()
+
+
+@app.route('/api/eventos')
+def eventos():
+    """Canal Server-Sent Events con transiciones de estado, totales y pesos"""
+    start_producers()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    client = hub.subscribe(last_event_id)
+    totales = estado_poller.totales
+    folio = estado_poller.folio
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            if totales is not None:
+                yield format_sse({"id": None, "tipo": "totales", "datos": {"folio": folio, **totales}})
+            for event in client.events():
+                yield format_sse(event)
+        finally:
+            hub.unsubscribe(client)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/api/cache')
+def estado_cache():
+    return jsonify({
+        "cache": query_cache.get_stats(),
+        "taras_pool": taras_pool.get_stats(),
+        "enturne_pool": enturne_pool.get_stats(),
+        "eventos": hub.get_stats(),
+    })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    # threaded: cada petición en su hilo, la caché agrupa las consultas iguales
+    app.run(debug=True, port=5001, threaded=True)
@@ -0,0 +1,333 @@
+import threading
+import time
+
+
+class PooledConnection:
+    """
+    Envoltura de una conexión del pool.
+
+    Se comporta como la conexión original (cursor, commit, rollback...) pero
+    close() la devuelve al pool en lugar de cerrarla, de modo que el código
+    existente que hace connect() ... finally: conn.close() reutiliza conexiones
+    sin cambios.
+    """
+
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._raw = raw_conn
+        self._invalid = False
+        self._returned = False
+
+    def invalidate(self):
+        """Marca la conexión como rota para que el pool la descarte al devolverla"""
+        self._invalid = True
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        if not self._invalid:
+            # No dejar transacciones abiertas en una conexión que otro va a reutilizar
+            try:
+                self._raw.rollback()
+            except Exception:
+                self._invalid = True
+        self._pool.release(self._raw, discard=self._invalid)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and is_connection_error(exc):
+            self.invalidate()
+        self.close()
+        return False
+
+
+def is_connection_error(error):
+    """
+    Indica si un error de base de datos corresponde a una conexión caída.
+
+    Los errores de pyodbc traen el SQLSTATE como primer argumento; la clase 08
+    agrupa los errores de conexión (recurso compartido no disponible, enlace
+    de red perdido, etc.).
+    """
+    args = getattr(error, "args", None)
+    if not args:
+        return False
+    return str(args[0]).startswith("08")
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones reutilizables.
+
+    Abrir un .mdb sobre el recurso compartido de red es la operación más lenta
+    de cada consulta, así que las conexiones se mantienen abiertas y se
+    reparten entre los gestores que usan la misma cadena de conexión.
+
+    Args:
+        factory: Función sin argumentos que abre una conexión nueva
+        max_size: Número máximo de conexiones abiertas a la vez
+        idle_timeout: Segundos que una conexión libre puede quedar abierta
+        health_check_interval: Segundos de inactividad tras los cuales se
+                               verifica la conexión antes de entregarla
+        health_query: Consulta ligera usada para verificar la conexión
+        acquire_timeout: Segundos máximos de espera por una conexión libre
+        connect_retries: Reintentos al abrir una conexión nueva
+    """
+
+    def __init__(self, factory, max_size=4, idle_timeout=300, health_check_interval=30,
+                 health_query=None, acquire_timeout=30, connect_retries=2):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.health_query = health_query
+        self.acquire_timeout = acquire_timeout
+        self.connect_retries = connect_retries
+
+        self._idle = []  # Pila de (conexión, instante en que quedó libre)
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.stats = {
+            "conexiones_creadas": 0,
+            "reutilizadas": 0,
+            "descartadas": 0,
+            "expulsadas_inactivas": 0,
+            "fallos_salud": 0,
+            "fallos_conexion": 0,
+            "esperas": 0,
+        }
+
+    def acquire(self):
+        """
+        Obtiene una conexión del pool, abriendo una nueva si hace falta.
+
+        Returns:
+            PooledConnection o None si no fue posible conectar
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                self._evict_idle_locked()
+
+                while self._idle:
+                    raw, idle_since = self._idle.pop()
+                    self._in_use += 1
+                    # Verificar fuera del candado sólo si lleva tiempo inactiva
+                    if time.monotonic() - idle_since >= self.health_check_interval:
+                        self._condition.release()
+                        try:
+                            healthy = self._is_healthy(raw)
+                        finally:
+                            self._condition.acquire()
+                        if not healthy:
+                            self.stats["fallos_salud"] += 1
+                            self._discard_locked(raw)
+                            continue
+                    self.stats["reutilizadas"] += 1
+                    return PooledConnection(self, raw)
+
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("Tiempo de espera agotado esperando una conexión libre del pool")
+                    return None
+                self.stats["esperas"] += 1
+                self._condition.wait(remaining)
+
+        # Abrir la conexión fuera del candado para no bloquear a los demás hilos
+        raw = self._open()
+        if raw is None:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            return None
+        return PooledConnection(self, raw)
+
+    def release(self, raw, discard=False):
+        """Devuelve una conexión al pool (o la cierra si está marcada como rota)"""
+        with self._condition:
+            if discard or self._closed:
+                self._discard_locked(raw)
+            else:
+                self._in_use -= 1
+                self._idle.append((raw, time.monotonic()))
+            self._condition.notify()
+
+    def connection(self):
+        """
+        Uso como gestor de contexto:
+
+            with pool.connection() as conn:
+                ...
+        """
+        conn = self.acquire()
+        if conn is None:
+            raise ConnectionError("No fue posible obtener una conexión del pool")
+        return conn
+
+    def close_all(self):
+        """Cierra las conexiones libres y rechaza nuevas solicitudes"""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                raw, _ = self._idle.pop()
+                self._close_raw(raw)
+            self._condition.notify_all()
+
+    def get_stats(self):
+        """Devuelve las estadísticas del pool, incluidas las conexiones evitadas"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats["conexiones_evitadas"] = stats["reutilizadas"]
+            stats["en_uso"] = self._in_use
+            stats["libres"] = len(self._idle)
+            stats["max_size"] = self.max_size
+            return stats
+
+    def _open(self):
+        attempts = self.connect_retries + 1
+        for attempt in range(attempts):
+            try:
+                raw = self.factory()
+                with self._condition:
+                    self.stats["conexiones_creadas"] += 1
+                return raw
+            except Exception as e:
+                with self._condition:
+                    self.stats["fallos_conexion"] += 1
+                print(f"Error de conexión a la base de datos (intento {attempt + 1}/{attempts}): {e}")
+                if attempt + 1 < attempts:
+                    time.sleep(0.2 * (2 ** attempt))
+        return None
+
+    def _is_healthy(self, raw):
+        if not self.health_query:
+            return True
+        cursor = None
+        try:
+            cursor = raw.cursor()
+            cursor.execute(self.health_query)
+            cursor.fetchone()
+            return True
+        except Exception:
+            return False
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def _evict_idle_locked(self):
+        if not self._idle:
+            return
+        now = time.monotonic()
+        keep = []
+        for raw, idle_since in self._idle:
+            if now - idle_since > self.idle_timeout:
+                self.stats["expulsadas_inactivas"] += 1
+                self._close_raw(raw)
+            else:
+                keep.append((raw, idle_since))
+        self._idle = keep
+
+    def _discard_locked(self, raw):
+        self._in_use -= 1
+        self.stats["descartadas"] += 1
+        self._close_raw(raw)
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+# Un pool por cadena de conexión, compartido por todos los gestores
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(conn_str, factory=None, **options):
+    """
+    Devuelve el pool compartido para una cadena de conexión, creándolo si no existe.
+
+    Args:
+        conn_str: Cadena de conexión (también sirve como clave del registro)
+        factory: Función que abre la conexión. Por defecto usa pyodbc.connect(conn_str)
+        **options: Parámetros adicionales para ConnectionPool
+
+    Returns:
+        ConnectionPool compartido
+    """
+    with _pools_lock:
+        pool = _pools.get(conn_str)
+        if pool is None:
+            if factory is None:
+                def factory():
+                    import pyodbc
+                    return pyodbc.connect(conn_str)
+            pool = ConnectionPool(factory, **options)
+            _pools[conn_str] = pool
+        return pool
+
+
+def get_all_pool_stats():
+    """Estadísticas de todos los pools registrados, por cadena de conexión"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {conn_str: pool.get_stats() for conn_str, pool in pools.items()}
+
+
+class SQLiteConnectionFactory:
+    """
+    Doble de pruebas del origen Access respaldado por SQLite.
+
+    Permite ejercitar el pool (reutilización, expulsión, reconexión) sin el
+    controlador de Access. Cuenta las conexiones abiertas y puede simular una
+    caída del recurso compartido con fail_next.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.connects = 0
+        self.fail_next = 0
+
+    def __call__(self):
+        import sqlite3
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise sqlite3.OperationalError("08S01 recurso compartido no disponible")
+        self.connects += 1
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+
+if __name__ == "__main__":
+    # Demostración del pool con el doble SQLite
+    factory = SQLiteConnectionFactory()
+    pool = ConnectionPool(factory, max_size=2, health_query="SELECT 1", connect_retries=1)
+
+    for _ in range(100):
+        conn = pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+    print("Conexiones abiertas:", factory.connects)
+    print("Estadísticas:", pool.get_stats())
@@ -0,0 +1,297 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class DataLoader:
+    """
+    Carga los datos de un folio en un hilo de trabajo para no bloquear la UI.
+
+    Cada solicitud recibe un número de generación. Si llega una solicitud más
+    nueva (por ejemplo, el usuario cambia otra vez la fecha) las anteriores
+    quedan obsoletas: su consulta termina en segundo plano pero el resultado se
+    descarta y sólo el más reciente se aplica a la tabla y a las tarjetas.
+
+    lock protege a vehicle_data: todo lo que lo lee o lo modifica (cargas, búsquedas del FilterManager, recarga de un vehículo) pasa
+    por él. Es reentrante porque on_loaded se llama con el candado tomado y
+    vuelve a filtrar.
+    """
+
+    def __init__(self, vehicle_data, max_workers=None, on_fetched=None, range_ui_interval=0.5):
+        self.vehicle_data = vehicle_data
+        # Se llama (con el candado tomado) al llegar una consulta de fetch_async
+        self.on_fetched = on_fetched
+        # Consultas simultáneas de un rango: por defecto, las conexiones del pool
+        if max_workers is None:
+            max_workers = getattr(getattr(vehicle_data.db_manager, 'pool', None), 'max_size', 4)
+        self.max_workers = max_workers
+        # Segundos mínimos entre actualizaciones de la UI durante un rango
+        self.range_ui_interval = range_ui_interval
+        # Páginas y conteos del modo server_side (ver fetch_async)
+        self._fetch_executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        # Serializa los cambios y lecturas de vehicle_data y la UI
+        self.lock = threading.RLock()
+
+        self.metrics = {
+            "cargas_iniciadas": 0,
+            "cargas_aplicadas": 0,
+            "cargas_descartadas": 0,
+            "ultimo_tiempo_primera_fila_ms": None,
+            "ultimo_tiempo_total_ms": None,
+            "ultimo_rango_folios": 0,
+            "ultimo_rango_primer_folio_ms": None,
+        }
+
+    def load(self, fecha_numerica_excel, on_loaded, incremental=True, from_source=False):
+        """
+        Inicia la carga del folio en segundo plano.
+
+        Args:
+            fecha_numerica_excel: Folio a cargar
+            on_loaded: Función sin argumentos que actualiza la UI; se llama
+                       desde el hilo de trabajo sólo si esta carga sigue
+                       siendo la más reciente
+            incremental: Se pasa a VehicleData.apply_rows
+            from_source: Se pasa a VehicleData.fetch_rows (leer de Access
+                         aunque haya réplica local)
+        """
+        with self._generation_lock:
+            self._generation += 1
+            generation = self._generation
+            self.metrics["cargas_iniciadas"] += 1
+
+        thread = threading.Thread(
+            target=self._run,
+            args=(generation, fecha_numerica_excel, on_loaded, incremental, from_source),
+            daemon=True,
+        )
+        thread.start()
+        return generation
+
+    def load_range(self, folio_desde, folio_hasta, on_loaded, from_source=False):
+        """
+        Inicia la carga de varios folios (una semana, un mes...) en segundo plano.
+
+        Cada folio se consulta por separado en un ThreadPoolExecutor de
+        max_workers hilos, así que nunca se piden más conexiones que las del
+        pool. A medida que llega cada folio se agrega a vehicle_data
+        (VehicleData.merge_folio), y la tabla muestra resultados parciales
+        sin esperar al último folio: on_loaded se llama con el primer folio
+        y luego como mucho cada range_ui_interval segundos, más una vez al
+        final, en lugar de reconstruir la tabla por cada folio. Una carga
+        posterior descarta ésta igual que en load().
+
+        Args:
+            folio_desde: Primer folio del rango
+            folio_hasta: Último folio del rango (incluido)
+            on_loaded: Función sin argumentos que actualiza la UI
+            from_source: Se pasa a VehicleData.fetch_rows
+        """
+        with self._generation_lock:
+            self._generation += 1
+            generation = self._generation
+            self.metrics["cargas_iniciadas"] += 1
+
+        thread = threading.Thread(
+            target=self._run_range,
+            args=(generation, folio_desde, folio_hasta, on_loaded, from_source),
+            daemon=True,
+        )
+        thread.start()
+        return generation
+
+    def refresh_vehicle(self, vehicle_id, on_refreshed, vehicle=None):
+        """
+        Recarga un vehículo (VehicleData.refresh_vehicle) en segundo plano.
+
+        Args:
+            vehicle_id: ID del vehículo editado
+            on_refreshed: Función que recibe True si el vehículo estaba cargado
+                          y se actualizó; se llama desde el hilo de trabajo
+            vehicle: Cambios que quedaron en la bandeja local (opcional)
+        """
+        thread = threading.Thread(
+            target=self._run_refresh, args=(vehicle_id, on_refreshed, vehicle), daemon=True
+        )
+        thread.start()
+
+    def fetch_async(self, fetch, apply):
+        """
+        Consulta de apoyo (una página, un conteo...) en segundo plano.
+
+        fetch() corre en un hilo de trabajo sin el candado; con el resultado
+        se toma el candado, se llama a apply(resultado) y luego a on_fetched
+        para volver a pintar. Si fetch() falla se llama a apply(None).
+
+        Args:
+            fetch: Función sin argumentos que hace la consulta
+            apply: Función que guarda el resultado
+        """
+        self._fetch_executor.submit(self._run_fetch, fetch, apply)
+
+    def cancel(self, wait=False):
+        """
+        Marca como obsoletas todas las cargas en curso.
+
+        Con wait=True espera además a que termine un resultado que ya se
+        estaba aplicando, de modo que al volver vehicle_data no cambia más.
+        """
+        with self._generation_lock:
+            self._generation += 1
+        if wait:
+            with self.lock:
+                pass
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def get_metrics(self):
+        return dict(self.metrics)
+
+    def _run(self, generation, fecha_numerica_excel, on_loaded, incremental, from_source):
+        start = time.perf_counter()
+        first_row = []
+
+        def on_first_row():
+            first_row.append(time.perf_counter())
+
+        try:
+            rows = self.vehicle_data.fetch_rows(fecha_numerica_excel, on_first_row, from_source)
+        except Exception as e:
+            print(f"Error cargando datos del folio {fecha_numerica_excel}: {e}")
+            rows = []
+
+        fetched = time.perf_counter()
+
+        with self.lock:
+            if not self.is_current(generation):
+                self.metrics["cargas_descartadas"] += 1
+                return
+
+            self.vehicle_data.apply_rows(fecha_numerica_excel, rows, incremental)
+
+            ttfr_ms = ((first_row[0] if first_row else fetched) - start) * 1000
+            total_ms = (time.perf_counter() - start) * 1000
+            self.metrics["cargas_aplicadas"] += 1
+            self.metrics["ultimo_tiempo_primera_fila_ms"] = round(ttfr_ms, 1)
+            self.metrics["ultimo_tiempo_total_ms"] = round(total_ms, 1)
+            print(f"Folio {fecha_numerica_excel}: primera fila en {ttfr_ms:.0f} ms, "
+                  f"{len(rows)} filas en {total_ms:.0f} ms")
+
+            try:
+                on_loaded()
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+
+    def _run_fetch(self, fetch, apply):
+        try:
+            result = fetch()
+        except Exception as e:
+            print(f"Error consultando filas: {e}")
+            result = None
+
+        with self.lock:
+            apply(result)
+            if result is None or not self.on_fetched:
+                return
+            try:
+                self.on_fetched()
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+
+    def _run_refresh(self, vehicle_id, on_refreshed, vehicle):
+        # La consulta a Access va sin el candado; sólo el cambio en
+        # vehicle_data y la UI lo toman
+        refresh = None
+        if vehicle is None:
+            try:
+                refresh = self.vehicle_data.fetch_vehicle_refresh(vehicle_id)
+            except Exception as e:
+                print(f"Error recargando el vehículo {vehicle_id}: {e}")
+
+        with self.lock:
+            try:
+                if vehicle is not None:
+                    refreshed = self.vehicle_data.refresh_vehicle(vehicle_id, vehicle)
+                else:
+                    refreshed = self.vehicle_data.apply_vehicle_refresh(vehicle_id, refresh)
+            except Exception as e:
+                print(f"Error recargando el vehículo {vehicle_id}: {e}")
+                refreshed = False
+
+            try:
+                on_refreshed(refreshed)
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+
+    def _notify(self, on_loaded):
+        try:
+            on_loaded()
+        except Exception as e:
+            print(f"Error actualizando la interfaz: {e}")
+
+    def _run_range(self, generation, folio_desde, folio_hasta, on_loaded, from_source):
+        start = time.perf_counter()
+        folios = list(range(folio_desde, folio_hasta + 1))
+
+        with self.lock:
+            if not self.is_current(generation):
+                self.metrics["cargas_descartadas"] += 1
+                return
+            self.vehicle_data.begin_range(folio_desde, folio_hasta)
+
+        def fetch(folio):
+            try:
+                return self.vehicle_data.fetch_rows(folio, from_source=from_source)
+            except Exception as e:
+                print(f"Error cargando datos del folio {folio}: {e}")
+                return []
+
+        first_folio_ms = None
+        total_rows = 0
+        last_ui = None
+        ui_pending = False
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(folios))))
+        try:
+            # Se envían en orden: los primeros días suelen llegar primero y se agregan al final
+            futures = {executor.submit(fetch, folio): folio for folio in folios}
+            for future in as_completed(futures):
+                rows = future.result()
+                with self.lock:
+                    if not self.is_current(generation):
+                        self.metrics["cargas_descartadas"] += 1
+                        return
+
+                    self.vehicle_data.merge_folio(futures[future], rows)
+                    total_rows += len(rows)
+                    if first_folio_ms is None:
+                        first_folio_ms = (time.perf_counter() - start) * 1000
+
+                    now = time.monotonic()
+                    if last_ui is not None and now - last_ui < self.range_ui_interval:
+                        ui_pending = True
+                        continue
+                    last_ui = now
+                    ui_pending = False
+                    self._notify(on_loaded)
+        finally:
+            # Una carga descartada no espera a las consultas que aún no empezaron
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if ui_pending:
+            # Los folios que llegaron después de la última actualización
+            with self.lock:
+                if not self.is_current(generation):
+                    self.metrics["cargas_descartadas"] += 1
+                    return
+                self._notify(on_loaded)
+
+        total_ms = (time.perf_counter() - start) * 1000
+        self.metrics["cargas_aplicadas"] += 1
+        self.metrics["ultimo_rango_folios"] = len(folios)
+        self.metrics["ultimo_rango_primer_folio_ms"] = round(first_folio_ms or 0, 1)
+        self.metrics["ultimo_tiempo_total_ms"] = round(total_ms, 1)
+        print(f"Folios {folio_desde}-{folio_hasta}: primer folio en {first_folio_ms or 0:.0f} ms, "
+              f"{total_rows} filas de {len(folios)} folios en {total_ms:.0f} ms")
@@ -1,17 +1,40 @@
 import pyodbc
 import flet as ft
 from datetime import datetime
+from common.connection_pool import get_pool, is_connection_error
+from common.outbox import has_pending, queue_write
+from common.row_mapper import get_mapper
 
 class DatabaseManager:
+    # Consulta de fetch_vehicle_summary; el tablero web la usa cuando la
+    # réplica local no está al día, así que ambos ven los mismos vehículos
+    VEHICLE_SUMMARY_QUERY = """
+        SELECT ID, Cedula, NombreConductor, Placa, Remolque, GrupoProducto,
+        Producto, Proceso, Cliente, Origen, Destino, Estado, Ejes, TipoEmbalaje
+        FROM BDEnturne 
+        WHERE EstadoRegistro = 'Activo' AND Folio = ? 
+        ORDER BY Consecutivo, ID"""
+    # Resultado de update_vehicle cuando la actualización quedó en la bandeja
+    # local: Access todavía no la tiene, así que no se debe volver a leer de allí
+    QUEUED = "bandeja"
+
     def __init__(self):
         self.conn_str = r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=\\ttrafejt2k02\Shared\Safety Program\CEV 2021\BaseDatos\EnturneVehiculosSPITB2.mdb'
+        # Pool compartido por todos los gestores que usan esta base de datos
+        self.pool = get_pool(self.conn_str, health_query="SELECT TOP 1 ID FROM BDEnturne")
     
     def connect(self):
-        try:
-            return pyodbc.connect(self.conn_str)
-        except pyodbc.Error as e:
-            print(f"Error de conexión a la base de datos: {e}")
-            return None
+        """
+        Obtiene una conexión del pool compartido.
+        
+        La conexión devuelta se usa igual que la de pyodbc; close() la regresa
+        al pool en lugar de cerrarla.
+        """
+        return self.pool.acquire()
+    
+    def get_pool_stats(self):
+        """Estadísticas del pool (conexiones creadas, reutilizadas, evitadas...)"""
+        return self.pool.get_stats()
     
     def fetch_vehicle_data(self, fecha_numerica_excel):
         conn = self.connect()
@@ -35,11 +58,237 @@ class DatabaseManager:
             return rows
         except pyodbc.Error as e:
             print(f"Error al consultar datos: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def fetch_vehicle_summary(self, fecha_numerica_excel, on_first_row=None):
+        """
+        Versión reducida de fetch_vehicle_data con sólo las columnas que usa
+        la tabla de vehículos. Se usa para las recargas incrementales, donde
+        cada fila se compara contra la versión ya cargada.
+        
+        Args:
+            fecha_numerica_excel: Folio a consultar
+            on_first_row: Función opcional que se llama cuando llega el primer
+                          lote de filas (para medir el tiempo a primera fila)
+            
+        Returns:
+            Lista de filas ordenadas por Consecutivo (ver VEHICLE_SUMMARY_QUERY)
+        """
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute(self.VEHICLE_SUMMARY_QUERY, (fecha_numerica_excel,))
+            rows = cursor.fetchmany(50)
+            if on_first_row:
+                on_first_row()
+            rows.extend(cursor.fetchall())
+            return rows
+        except pyodbc.Error as e:
+            print(f"Error al consultar resumen de datos: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    
+    # Columnas de la tabla de vehículos y campos donde busca el texto
+    # (los mismos que SearchIndex.FIELDS)
+    SUMMARY_COLUMNS = (
+        "ID, Cedula, NombreConductor, Placa, Remolque, GrupoProducto, "
+        "Producto, Proceso, Cliente, Origen, Destino, Estado, Ejes, TipoEmbalaje"
+    )
+    SEARCH_COLUMNS = (
+        "Cedula", "NombreConductor", "Placa", "Remolque", "GrupoProducto",
+        "Producto", "Proceso", "Cliente", "Origen", "Ejes", "Destino",
+        "Estado", "TipoEmbalaje",
+    )
+    
+    def _vehicle_conditions(self, folio_desde, folio_hasta=None, estados=None,
+                            excluir_estados=None, search_text=None):
+        """
+        Condición WHERE y parámetros comunes a las consultas paginadas.
+        
+        Args:
+            folio_desde: Primer folio del rango
+            folio_hasta: Último folio del rango (None para un solo folio)
+            estados: Lista de estados a incluir (opcional)
+            excluir_estados: Lista de estados a excluir; los nulos se incluyen
+            search_text: Texto a buscar en cualquiera de SEARCH_COLUMNS
+            
+        Returns:
+            Tupla (condición SQL, lista de parámetros)
+        """
+        conditions = ["EstadoRegistro = 'Activo'"]
+        params = []
+        
+        if folio_hasta is None or folio_hasta == folio_desde:
+            conditions.append("Folio = ?")
+            params.append(folio_desde)
+        else:
+            conditions.append("Folio BETWEEN ? AND ?")
+            params.extend((folio_desde, folio_hasta))
+        
+        if estados:
+            conditions.append(f"Estado IN ({', '.join('?' for _ in estados)})")
+            params.extend(estados)
+        if excluir_estados:
+            conditions.append(
+                f"(Estado IS NULL OR Estado NOT IN ({', '.join('?' for _ in excluir_estados)}))"
+            )
+            params.extend(excluir_estados)
+        
+        if search_text:
+            # (Campo & '') convierte nulos y números en texto; LIKE no distingue mayúsculas
+            pattern = self._like_pattern(search_text)
+            conditions.append(
+                "(" + " OR ".join(f"({column} & '') LIKE ?" for column in self.SEARCH_COLUMNS) + ")"
+            )
+            params.extend(pattern for _ in self.SEARCH_COLUMNS)
+        
+        return " AND ".join(conditions), params
+    
+    @staticmethod
+    def _like_pattern(text):
+        """Patrón LIKE 'contiene' escapando los comodines de Access"""
+        escaped = (
+            text.replace("[", "[[]")
+                .replace("%", "[%]")
+                .replace("_", "[_]")
+        )
+        return f"%{escaped}%"
+    
+    def count_vehicles(self, folio_desde, folio_hasta=None, estados=None,
+                       excluir_estados=None, search_text=None):
+        """
+        Número de vehículos que cumplen el filtro, sin traer las filas.
+        
+        Returns:
+            Número de filas o 0 si falla la consulta
+        """
+        conn = self.connect()
+        if not conn:
+            return 0
+        
+        where, params = self._vehicle_conditions(
+            folio_desde, folio_hasta, estados, excluir_estados, search_text
+        )
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM BDEnturne WHERE {where}", params)
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        except pyodbc.Error as e:
+            print(f"Error al contar vehículos: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+            return 0
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def count_vehicles_by_estado(self, folio_desde, folio_hasta=None, search_text=None):
+        """
+        Conteo de vehículos por estado (para las tarjetas estadísticas).
+        
+        Returns:
+            Lista de filas (Estado, Total)
+        """
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        where, params = self._vehicle_conditions(folio_desde, folio_hasta, search_text=search_text)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT Estado, COUNT(*) AS Total FROM BDEnturne WHERE {where} GROUP BY Estado",
+                params,
+            )
+            return cursor.fetchall()
+        except pyodbc.Error as e:
+            print(f"Error al contar vehículos por estado: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+            return []
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def fetch_vehicle_page(self, folio_desde, offset, limit, total, folio_hasta=None,
+                           estados=None, excluir_estados=None, search_text=None):
+        """
+        Una ventana de filas ordenadas por Consecutivo.
+        
+        Access no tiene OFFSET, así que se usan dos TOP anidados: el interno
+        toma las primeras offset + limit filas y el externo, en orden inverso,
+        las últimas de ellas. El total (de count_vehicles) recorta la última
+        página para que no repita filas de la anterior. ID desempata el orden,
+        porque TOP de Access devuelve todos los empates del último valor.
+        
+        Args:
+            folio_desde: Primer folio del rango
+            offset: Posición de la primera fila
+            limit: Número máximo de filas
+            total: Número total de filas del filtro
+            
+        Returns:
+            Lista de filas con las columnas de SUMMARY_COLUMNS
+        """
+        limit = min(int(limit), int(total) - int(offset))
+        if limit <= 0:
+            return []
+        
+        conn = self.connect()
+        if not conn:
+            return []
+        
+        where, params = self._vehicle_conditions(
+            folio_desde, folio_hasta, estados, excluir_estados, search_text
+        )
+        # TOP no admite parámetros; los valores son enteros calculados aquí
+        query = f"""
+            SELECT * FROM (
+                SELECT TOP {limit} * FROM (
+                    SELECT TOP {int(offset) + limit} {self.SUMMARY_COLUMNS}, Consecutivo
+                    FROM BDEnturne
+                    WHERE {where}
+                    ORDER BY Consecutivo, ID
+                ) AS Ventana
+                ORDER BY Consecutivo DESC, ID DESC
+            ) AS Pagina
+            ORDER BY Consecutivo, ID"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        except pyodbc.Error as e:
+            print(f"Error al consultar página de vehículos: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
             return []
         finally:
             cursor.close()
             conn.close()
     
+    # Campos del diccionario de get_vehicle_by_id (None si la consulta no los trae)
+    VEHICLE_FIELDS = (
+        "ID", "Consecutivo", "FechaEnturne", "HoraEnturne", "Cedula", "NombreConductor",
+        "Placa", "Remolque", "GrupoProducto", "Producto", "Proceso", "Cliente", "Origen",
+        "Destino", "Estado", "Transportador", "Folio", "FechaBasculaEntrada",
+        "HoraBasculaEntrada", "FechaBasculaSalida", "HoraBasculaSalida", "Manifiesto", "GUT",
+        "Ejes", "BasculaOUT", "BasculaIN", "PesoEntrada", "Tara", "PesoSalida", "FechaEnvio",
+        "HoraEnvio", "Precalentamiento", "DobleCiclo", "TipoEmbalaje",
+    )
+    
     def get_vehicle_by_id(self, vehicle_id):
         conn = self.connect()
         if not conn:
@@ -59,55 +308,40 @@ class DatabaseManager:
                 (vehicle_id,))
             row = cursor.fetchone()
             if row:
-                return {
-                    "ID": row.ID,
-                    "Consecutivo": row.Consecutivo if hasattr(row, 'Consecutivo') else None,
-                    "FechaEnturne": row.FechaEnturne if hasattr(row, 'FechaEnturne') else None,
-                    "HoraEnturne": row.HoraEnturne if hasattr(row, 'HoraEnturne') else None,
-                    "Cedula": row.Cedula,
-                    "NombreConductor": row.NombreConductor,
-                    "Placa": row.Placa,
-                    "Remolque": row.Remolque,
-                    "GrupoProducto": row.GrupoProducto,
-                    "Producto": row.Producto,
-                    "Proceso": row.Proceso,
-                    "Cliente": row.Cliente,
-                    "Origen": row.Origen if hasattr(row, 'Origen') else None,
-                    "Destino": row.Destino if hasattr(row, 'Destino') else None,
-                    "Estado": row.Estado,
-                    "Transportador": row.Transportador if hasattr(row, 'Transportador') else None,
-                    "Folio": row.Folio if hasattr(row, 'Folio') else None,
-                    "FechaBasculaEntrada": row.FechaBasculaEntrada if hasattr(row, 'FechaBasculaEntrada') else None,
-                    "HoraBasculaEntrada": row.HoraBasculaEntrada if hasattr(row, 'HoraBasculaEntrada') else None,
-                    "FechaBasculaSalida": row.FechaBasculaSalida if hasattr(row, 'FechaBasculaSalida') else None,
-                    "HoraBasculaSalida": row.HoraBasculaSalida if hasattr(row, 'HoraBasculaSalida') else None,
-                    "Manifiesto": row.Manifiesto if hasattr(row, 'Manifiesto') else None,
-                    "GUT": row.GUT if hasattr(row, 'GUT') else None,
-                    "Ejes": row.Ejes if hasattr(row, 'Ejes') else None,
-                    "BasculaOUT": row.BasculaOUT if hasattr(row, 'BasculaOUT') else None,
-                    "BasculaIN": row.BasculaIN if hasattr(row, 'BasculaIN') else None,
-                    "PesoEntrada": row.PesoEntrada if hasattr(row, 'PesoEntrada') else None,
-                    "Tara": row.Tara if hasattr(row, 'Tara') else None,
-                    "PesoSalida": row.PesoSalida if hasattr(row, 'PesoSalida') else None,
-                    "FechaEnvio": row.FechaEnvio if hasattr(row, 'FechaEnvio') else None,
-                    "HoraEnvio": row.HoraEnvio if hasattr(row, 'HoraEnvio') else None,
-                    "Precalentamiento": row.Precalentamiento if hasattr(row, 'Precalentamiento') else None,
-                    "DobleCiclo": row.DobleCiclo if hasattr(row, 'DobleCiclo') else None,
-                    "TipoEmbalaje": row.TipoEmbalaje if hasattr(row, 'TipoEmbalaje') else None
-                    
-                }
+                return get_mapper(cursor.description, self.VEHICLE_FIELDS).to_dict(row)
             return None
         except pyodbc.Error as e:
             print(f"Error al consultar vehículo: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
             return None
         finally:
             cursor.close()
             conn.close()
     
-    def update_vehicle(self, vehicle_data):
+    def update_vehicle(self, vehicle_data, use_outbox=True):
+        """
+        Actualiza un vehículo en BDEnturne.
+        
+        Si Access no responde, la actualización se guarda en la bandeja local
+        (common.outbox) y se envía cuando vuelva el recurso compartido. Mientras
+        haya actualizaciones pendientes, las nuevas también pasan por la
+        bandeja para que se apliquen en el orden en que se hicieron.
+        
+        Args:
+            vehicle_data: Diccionario con los campos del vehículo (incluido ID)
+            use_outbox: False para escribir sólo en Access (lo usa la bandeja)
+            
+        Returns:
+            True si se actualizó en Access, QUEUED si quedó en la bandeja,
+            False si falló
+        """
+        if use_outbox and has_pending():
+            return self._queue_vehicle_update(vehicle_data)
+        
         conn = self.connect()
         if not conn:
-            return False
+            return self._queue_vehicle_update(vehicle_data) if use_outbox else False
         
         cursor = conn.cursor()
         try:
@@ -175,11 +409,20 @@ class DatabaseManager:
             return True
         except pyodbc.Error as e:
             print(f"Error al actualizar vehículo: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+                if use_outbox:
+                    return self._queue_vehicle_update(vehicle_data)
             return False
         finally:
             cursor.close()
             conn.close()
             
+    def _queue_vehicle_update(self, vehicle_data):
+        queue_write("update_vehicle", vehicle_data)
+        print(f"Actualización del vehículo {vehicle_data.get('ID')} guardada en la bandeja local")
+        return self.QUEUED
+    
     def execute_query_with_condition(self, folio_actual):
         """
         Ejecuta una consulta similar a la de VBA con condiciones específicas.
@@ -213,6 +456,8 @@ class DatabaseManager:
             return rows
         except pyodbc.Error as e:
             print(f"Error al ejecutar la consulta: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
             return []
         finally:
             cursor.close()
@@ -224,15 +469,13 @@ class PesajesManager:
     
     def __init__(self):
         self.conn_str = r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=\\ttrafejt2k02\Shared\Safety Program\CEV 2021\BaseDatos\DBIsotanques1\Isotanques.mdb'
+        self.pool = get_pool(self.conn_str, health_query="SELECT TOP 1 id FROM TablaPesajes2")
         self.fecha_seleccionada = datetime.now()
         self.fecha_numerica_excel = (self.fecha_seleccionada - datetime(1900, 1, 1)).days + 2
 
     def connect(self):
-        try:
-            return pyodbc.connect(self.conn_str)
-        except pyodbc.Error as e:
-            print(f"Error de conexión a la base de datos: {e}")
-            return None
+        """Obtiene una conexión del pool compartido"""
+        return self.pool.acquire()
 
     def get_pesajes_by_folio(self, folio=None):
         """
@@ -265,15 +508,11 @@ class PesajesManager:
             """
             cursor.execute(query, (folio,))
             rows = cursor.fetchall()
-            columns = [column[0] for column in cursor.description]
-
-            result = []
-            for row in rows:
-                result.append({col: getattr(row, col) for col in columns})
-
-            return result
+            return get_mapper(cursor.description).to_dicts(rows)
         except pyodbc.Error as e:
             print(f"Error al consultar datos en TablaPesajes2: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
             return []
         finally:
             cursor.close()
@@ -329,6 +568,8 @@ class PesajesManager:
             
         except pyodbc.Error as e:
             print(f"Error al consultar datos en la Tabla_Pesajes2: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
             return []
         finally:
             cursor.close()
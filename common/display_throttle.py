@@ -0,0 +1,88 @@
+import threading
+import time
+
+
+class DisplayThrottle:
+    """
+    Limita la frecuencia con la que un flujo de lecturas llega a la interfaz.
+
+    push() sólo guarda el último valor recibido, sin tocar la UI, y puede
+    llamarse desde el hilo del puerto serie tantas veces por segundo como
+    transmita el indicador. Un hilo aparte entrega a on_flush el valor más
+    reciente como máximo rate_hz veces por segundo; los valores intermedios se
+    descartan. Si no llegan datos el hilo queda en espera sin consumir CPU.
+
+    Args:
+        on_flush: Función (valor) que actualiza la UI; se llama desde el hilo
+                  del temporizador
+        rate_hz: Actualizaciones máximas por segundo
+    """
+
+    def __init__(self, on_flush, rate_hz=10):
+        self.on_flush = on_flush
+        self.rate_hz = rate_hz
+        self._latest = None
+        self._pending = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._running = False
+
+        self.stats = {
+            "recibidos": 0,
+            "publicados": 0,
+            "descartados": 0,
+        }
+
+    def push(self, value):
+        """Registrar una lectura nueva (reemplaza a la pendiente, si la hay)"""
+        with self._lock:
+            if self._pending:
+                self.stats["descartados"] += 1
+            self._latest = value
+            self._pending = True
+            self.stats["recibidos"] += 1
+        if not self._running:
+            self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _run(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            if not self._running:
+                break
+
+            with self._lock:
+                if not self._pending:
+                    continue
+                value = self._latest
+                self._pending = False
+                self.stats["publicados"] += 1
+
+            started = time.monotonic()
+            try:
+                self.on_flush(value)
+            except Exception as e:
+                print(f"Error actualizando la lectura en pantalla: {e}")
+
+            # Lo que llegue durante este intervalo se agrupa en el siguiente tick
+            remaining = 1.0 / self.rate_hz - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
@@ -0,0 +1,191 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+class HubClient:
+    """
+    Suscriptor de un EventHub (una pestaña del navegador).
+
+    Cada cliente tiene su propia cola acotada: si el navegador no lee a
+    tiempo se descartan sus eventos más antiguos, sin frenar al productor ni
+    a los demás clientes. Los eventos con clave (por ejemplo el último peso
+    de cada báscula) se reemplazan en la cola en lugar de acumularse.
+    """
+
+    def __init__(self, hub, max_events):
+        self.hub = hub
+        self.max_events = max_events
+        self._events = deque()
+        self._keyed = {}  # clave -> evento pendiente en la cola
+        self._condition = threading.Condition()
+        self.closed = False
+        self.perdidos = 0
+
+    def put(self, event):
+        with self._condition:
+            if self.closed:
+                return
+            key = event.get("clave")
+            if key is not None and key in self._keyed:
+                # Sólo interesa el valor más reciente
+                pending = self._keyed[key]
+                pending.update(event)
+                return
+            if len(self._events) >= self.max_events:
+                dropped = self._events.popleft()
+                self._keyed.pop(dropped.get("clave"), None)
+                self.perdidos += 1
+            self._events.append(event)
+            if key is not None:
+                self._keyed[key] = event
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+
+    def events(self, heartbeat=15):
+        """
+        Generador de eventos; entrega None cada `heartbeat` segundos sin
+        eventos para que el servidor pueda mantener viva la conexión.
+        """
+        while True:
+            with self._condition:
+                if not self._events and not self.closed:
+                    self._condition.wait(heartbeat)
+                if self.closed:
+                    return
+                if not self._events:
+                    event = None
+                else:
+                    event = self._events.popleft()
+                    self._keyed.pop(event.get("clave"), None)
+                    # Copia: un put posterior con la misma clave no debe modificarlo
+                    event = dict(event)
+            yield event
+
+
+class EventHub:
+    """
+    Difusión de eventos de un productor a muchos clientes.
+
+    publish() copia el evento a la cola de cada cliente conectado y guarda
+    los últimos `history_size` eventos, para que un navegador que se
+    reconecta con Last-Event-ID reciba lo que se perdió.
+
+    Args:
+        client_queue_size: Eventos máximos en espera por cliente
+        history_size: Eventos recientes que se guardan para reconexiones
+    """
+
+    def __init__(self, client_queue_size=100, history_size=200):
+        self.client_queue_size = client_queue_size
+        self._clients = set()
+        self._history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "publicados": 0,
+            "clientes_totales": 0,
+        }
+
+    def subscribe(self, last_event_id=None):
+        """
+        Conectar un cliente.
+
+        Args:
+            last_event_id: Último evento que recibió el cliente antes de
+                           reconectarse (cabecera Last-Event-ID)
+
+        Returns:
+            HubClient
+        """
+        client = HubClient(self, self.client_queue_size)
+        with self._lock:
+            self._clients.add(client)
+            self.stats["clientes_totales"] += 1
+            if last_event_id is not None:
+                for event in self._history:
+                    if event["id"] > last_event_id:
+                        client.put(dict(event))
+        return client
+
+    def unsubscribe(self, client):
+        client.close()
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, tipo, datos, clave=None, historial=True):
+        """
+        Enviar un evento a todos los clientes.
+
+        Args:
+            tipo: Nombre del evento ('estado', 'totales', 'peso'...)
+            datos: Objeto serializable a JSON
+            clave: Si se indica, un evento pendiente con la misma clave se
+                   reemplaza por éste en cada cola
+            historial: False para eventos que no vale la pena repetir en una
+                       reconexión (lecturas en vivo)
+        """
+        with self._lock:
+            event = {"id": next(self._ids), "tipo": tipo, "datos": datos, "clave": clave}
+            if historial:
+                self._history.append(event)
+            clients = list(self._clients)
+            self.stats["publicados"] += 1
+        for client in clients:
+            client.put(dict(event))
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["clientes"] = len(self._clients)
+            stats["perdidos"] = sum(client.perdidos for client in self._clients)
+            return stats
+
+
+def format_sse(event):
+    """Evento en formato text/event-stream (None produce un comentario de latido)"""
+    if event is None:
+        return ": latido\n\n"
+    data = json.dumps(event["datos"], default=str, ensure_ascii=False, separators=(",", ":"))
+    if event.get("id") is None:
+        # Instantánea inicial: no cambia el Last-Event-ID del navegador
+        return f"event: {event['tipo']}\ndata: {data}\n\n"
+    return f"id: {event['id']}\nevent: {event['tipo']}\ndata: {data}\n\n"
+
+
+if __name__ == "__main__":
+    # Un productor rápido, un cliente que lee al día y otro lento
+    hub = EventHub(client_queue_size=50)
+    fast = hub.subscribe()
+    slow = hub.subscribe()
+    received = {"rapido": 0, "lento": 0}
+
+    def consume(client, name, delay):
+        for event in client.events(heartbeat=0.5):
+            if event is not None:
+                received[name] += 1
+            time.sleep(delay)
+
+    threading.Thread(target=consume, args=(fast, "rapido", 0), daemon=True).start()
+    threading.Thread(target=consume, args=(slow, "lento", 0.01), daemon=True).start()
+
+    started = time.perf_counter()
+    for i in range(5000):
+        hub.publish("estado", {"ID": i % 300, "Estado": "En proceso"})
+        if i % 10 == 0:
+            hub.publish("peso", {"bascula": "Báscula 1", "peso": 30000 + i}, clave="peso:Báscula 1", historial=False)
+        time.sleep(0.0002)
+    elapsed = time.perf_counter() - started
+    time.sleep(0.6)
+    print(f"5500 eventos publicados en {elapsed:.2f} s; recibidos {received}; {hub.get_stats()}")
@@ -0,0 +1,166 @@
+import os
+import threading
+from array import array
+from collections import deque
+
+
+class RingLog:
+    """
+    Registro de capacidad fija enlazado a un ListView.
+
+    Cada entrada nueva crea un único control y, si se supera la capacidad,
+    elimina sólo el más antiguo; la lista nunca se reconstruye. Las
+    actualizaciones de la página se agrupan: varias entradas seguidas
+    producen un solo page.update() al cabo de flush_delay segundos.
+
+    Args:
+        list_view: ListView donde se muestran las entradas
+        capacity: Número máximo de entradas visibles
+        make_control: Función (entrada) que crea el control de una entrada
+        page: Página a actualizar (None para no actualizar nunca)
+        flush_delay: Segundos que se esperan para agrupar actualizaciones
+        archive: LogArchive opcional donde se guarda cada entrada en disco
+        archive_text: Función (entrada) que da el texto a guardar en disco
+    """
+
+    def __init__(self, list_view, capacity, make_control, page=None, flush_delay=0.1,
+                 archive=None, archive_text=str):
+        self.list_view = list_view
+        self.capacity = capacity
+        self.make_control = make_control
+        self.page = page
+        self.flush_delay = flush_delay
+        self.archive = archive
+        self.archive_text = archive_text
+
+        self.entries = deque(maxlen=capacity)
+        self._flush_timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def append(self, entry, update=True):
+        """
+        Añadir una entrada.
+
+        Args:
+            entry: Entrada a mostrar
+            update: True para programar una actualización agrupada de la página;
+                    False si quien llama hará page.update() por su cuenta
+        """
+        if self.archive is not None:
+            self.archive.append(self.archive_text(entry))
+
+        control = self.make_control(entry)
+        with self._lock:
+            controls = self.list_view.controls
+            if len(self.entries) == self.capacity and controls:
+                controls.pop(0)
+            self.entries.append(entry)
+            controls.append(control)
+
+        if update:
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        """Programar un page.update() que agrupe las entradas de los próximos flush_delay segundos"""
+        if self.page is None:
+            return
+        with self._lock:
+            if self._flush_timer is not None:
+                return
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        if self.page is not None:
+            self.page.update()
+
+
+class LogArchive:
+    """
+    Historial en disco de un registro, con acceso por posición.
+
+    Las líneas se agregan al final de un archivo de texto y se mantiene en
+    memoria sólo el desplazamiento de cada línea (8 bytes por línea), así que
+    el historial puede crecer mucho más que lo que se muestra en pantalla.
+    Admite len(), índices y rebanadas, como las demás secuencias que pagina
+    PaginationManager; cada rebanada lee sólo sus líneas del archivo.
+
+    Args:
+        path: Archivo donde se guarda el historial
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = array('Q')
+        self._lock = threading.Lock()
+        self._index()
+
+    def _index(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    self._offsets.append(offset)
+                    offset += len(line)
+        except OSError as e:
+            print(f"Error al leer el historial {self.path}: {e}")
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __bool__(self):
+        return len(self._offsets) > 0
+
+    def append(self, text):
+        """Agregar una línea al historial"""
+        data = (text.replace('\n', ' ') + '\n').encode('utf-8')
+        with self._lock:
+            try:
+                with open(self.path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(data)
+                self._offsets.append(offset)
+            except OSError as e:
+                print(f"Error al escribir en el historial {self.path}: {e}")
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._offsets))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._read(start, stop)
+
+        if index < 0:
+            index += len(self._offsets)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError("índice fuera de rango")
+        return self._read(index, index + 1)[0]
+
+    def _read(self, start, stop):
+        if start >= stop:
+            return []
+        with self._lock:
+            begin = self._offsets[start]
+            end = self._offsets[stop] if stop < len(self._offsets) else None
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(begin)
+                data = f.read() if end is None else f.read(end - begin)
+        except OSError as e:
+            print(f"Error al leer el historial {self.path}: {e}")
+            return []
+        lines = data.decode('utf-8', errors='replace').split('\n')
+        return lines[:stop - start]
@@ -1,13 +1,26 @@
 import flet as ft
+import threading
 
 class FilterManager:
-    def __init__(self, page, vehicle_data, on_filter_change):
+    def __init__(self, page, vehicle_data, on_filter_change, search_delay=0.3, data_lock=None):
         self.page = page
         self.vehicle_data = vehicle_data
+        # Candado de vehicle_data compartido con las cargas (DataLoader.lock)
+        self.data_lock = data_lock or threading.RLock()
         self.on_filter_change = on_filter_change
         self.current_filter = "todos"
         self.search_text = ""
         
+        # Búsqueda con retardo: se espera search_delay segundos sin teclear
+        # antes de filtrar (0 para filtrar en cada tecla)
+        self.search_delay = search_delay
+        self._search_timer = None
+        self._search_generation = 0
+        self._search_lock = threading.Lock()
+        # Última búsqueda aplicada, para refinar en lugar de recorrer todo
+        self._last_query = None
+        self._last_results = None
+        
         # Añadir el botón de limpieza
         self.clear_button = ft.IconButton(
             icon=ft.Icons.CLEAR,
@@ -46,21 +59,84 @@ class FilterManager:
     
     def on_search_change(self, e):
         self.search_text = e.control.value
-        self.apply_filter_and_search()
+        
+        # Cancelar la búsqueda pendiente y programar una nueva
+        generation = self._next_search_generation()
+        if self.search_delay <= 0:
+            self._run_search(generation)
+            return
+        
+        self._search_timer = threading.Timer(self.search_delay, self._run_search, args=(generation,))
+        self._search_timer.daemon = True
+        self._search_timer.start()
+    
+    def _next_search_generation(self):
+        with self._search_lock:
+            self._search_generation += 1
+            if self._search_timer:
+                self._search_timer.cancel()
+                self._search_timer = None
+            return self._search_generation
+    
+    def _run_search(self, generation):
+        """Ejecutar una búsqueda programada si no ha sido reemplazada por otra más nueva"""
+        # El candado sólo protege el estado de la búsqueda; el filtrado corre
+        # sin él para no bloquear on_search_change (hilo de la interfaz)
+        with self._search_lock:
+            if generation != self._search_generation:
+                return
+            query = (self.search_text or "").lower()
+            last_query = self._last_query
+            last_results = self._last_results
+        
+        if query == last_query:
+            # Mismo resultado que el ya mostrado: no volver a pintar
+            return
+        
+        with self.data_lock:
+            # Una carga aplicada mientras se esperaba el candado vuelve a
+            # filtrar (nueva generación) y deja obsoletos los resultados anteriores
+            if generation != self._search_generation:
+                return
+            if query and last_query and last_query in query:
+                # El nuevo texto contiene al anterior: basta con refinar sus resultados
+                filtered_data = self.vehicle_data.search_data(query, base=last_results)
+            elif query:
+                filtered_data = self.vehicle_data.search_data(query)
+            else:
+                filtered_data = self.vehicle_data.filtered_data
+        
+        with self._search_lock:
+            # Si llegó otra tecla mientras se filtraba, descartar este resultado
+            if generation != self._search_generation:
+                return
+            self._last_query = query
+            self._last_results = filtered_data
+            
+        # Notificar el cambio
+        self.on_filter_change(filtered_data)
         
     def apply_filter(self, filter_name):
         self.current_filter = filter_name
         self.apply_filter_and_search()
             
     def apply_filter_and_search(self):
-        # Primero aplicar el filtro
-        self.vehicle_data.apply_filter(self.current_filter)
+        # Cualquier búsqueda pendiente queda reemplazada por esta
+        self._next_search_generation()
+        
+        with self.data_lock:
+            # Primero aplicar el filtro
+            self.vehicle_data.apply_filter(self.current_filter)
+            
+            # Luego aplicar la búsqueda si hay texto
+            if self.search_text:
+                filtered_data = self.vehicle_data.search_data(self.search_text)
+            else:
+                filtered_data = self.vehicle_data.filtered_data
         
-        # Luego aplicar la búsqueda si hay texto
-        if self.search_text:
-            filtered_data = self.vehicle_data.search_data(self.search_text)
-        else:
-            filtered_data = self.vehicle_data.filtered_data
+        with self._search_lock:
+            self._last_query = (self.search_text or "").lower()
+            self._last_results = filtered_data
             
         # Notificar el cambio
         self.on_filter_change(filtered_data)
\ No newline at end of file
@@ -0,0 +1,334 @@
+import threading
+import time
+from collections import deque
+
+from common.serial_manager import SerialManager
+from common.scale_protocols import get_parser
+from common.weight_stability import StabilityDetector
+
+
+class EventBus:
+    """
+    Bus de eventos de todas las básculas.
+
+    publish() sólo encola el evento y puede llamarse desde cualquier hilo de
+    lectura; un único hilo despachador entrega los eventos a los suscriptores
+    en el orden en que llegaron. Las lecturas ('lectura') de una báscula que
+    aún esperan en la cola se reemplazan por la más reciente, así que una
+    ráfaga de tramas ocupa un solo lugar por báscula. Si la cola llega a
+    max_events se descartan lecturas nuevas para no frenar los puertos; los
+    demás eventos ('estable', 'conexion', 'mensaje'...) nunca se descartan.
+
+    Args:
+        max_events: Eventos máximos en espera
+    """
+
+    def __init__(self, max_events=1000):
+        self.max_events = max_events
+        self._events = deque()  # [evento] (lista para reemplazar lecturas en su lugar)
+        self._lecturas = {}  # bascula -> entrada de su lectura en espera
+        self._condition = threading.Condition()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.stats = {
+            "publicados": 0,
+            "entregados": 0,
+            "combinados": 0,
+            "descartados": 0,
+        }
+
+    def subscribe(self, callback, tipos=None):
+        """
+        Registrar un suscriptor.
+
+        Args:
+            callback: Función (evento) llamada desde el hilo despachador
+            tipos: Tipos de evento que interesan ('lectura', 'estable',
+                   'mensaje'...) o None para todos
+        """
+        with self._lock:
+            self._subscribers.append((callback, set(tipos) if tipos else None))
+        self.start()
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] != callback]
+
+    def publish(self, event):
+        """Encolar un evento (dict con al menos 'tipo' y 'bascula')"""
+        with self._condition:
+            if event["tipo"] == "lectura":
+                pending = self._lecturas.get(event["bascula"])
+                if pending is not None:
+                    # La lectura anterior aún no se entregó: sólo importa la última
+                    pending[0] = event
+                    self.stats["combinados"] += 1
+                    return
+                if len(self._events) >= self.max_events:
+                    self.stats["descartados"] += 1
+                    return
+                entry = [event]
+                self._lecturas[event["bascula"]] = entry
+            else:
+                # Las lecturas posteriores no deben adelantarse a este evento
+                self._lecturas.pop(event.get("bascula"), None)
+                entry = [event]
+            self._events.append(entry)
+            self.stats["publicados"] += 1
+            self._condition.notify()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._events.append([None])
+            self._condition.notify()
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self.stats)
+            stats["en_cola"] = len(self._events)
+        return stats
+
+    def _next_event(self):
+        with self._condition:
+            while not self._events:
+                self._condition.wait()
+            entry = self._events.popleft()
+            event = entry[0]
+            if event is not None and event["tipo"] == "lectura" \
+                    and self._lecturas.get(event["bascula"]) is entry:
+                del self._lecturas[event["bascula"]]
+            return event
+
+    def _run(self):
+        while True:
+            event = self._next_event()
+            if event is None:
+                break
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for callback, tipos in subscribers:
+                if tipos is not None and event["tipo"] not in tipos:
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Error entregando evento de báscula: {e}")
+            with self._condition:
+                self.stats["entregados"] += 1
+        with self._lock:
+            self._thread = None
+
+
+class ScaleChannel:
+    """
+    Una báscula: su puerto, su intérprete de tramas y su detector de estabilidad.
+
+    Cada canal lee en su propio hilo (el de su SerialManager, con lecturas
+    bloqueantes), así que un puerto lento o caído no retrasa a los demás. Las
+    tramas se interpretan y se pasan por el detector en ese hilo, y el
+    resultado se publica en el bus compartido.
+
+    Args:
+        name: Nombre de la báscula en los eventos
+        bus: EventBus donde se publican los eventos
+        serial_manager: SerialManager existente (se crea uno si es None)
+        port: Puerto para conectar (opcional)
+        **stability: Parámetros de StabilityDetector (tolerance, dwell_time...)
+    """
+
+    def __init__(self, name, bus, serial_manager=None, port=None, **stability):
+        self.name = name
+        self.bus = bus
+        self.serial_manager = serial_manager or SerialManager()
+        self.port = port
+        self.detector = StabilityDetector(**stability)
+        self.last_reading = None
+
+        self.stats = {
+            "tramas": 0,
+            "lecturas": 0,
+            "mensajes": 0,
+            "estables": 0,
+        }
+        self.serial_manager.set_data_callback(self.on_frame)
+
+    @property
+    def is_connected(self):
+        return self.serial_manager.is_connected
+
+    def connect(self, port=None):
+        if port:
+            self.port = port
+        connected = self.serial_manager.connect(self.port)
+        self._publish("conexion", conectado=connected, puerto=self.port)
+        return connected
+
+    def disconnect(self):
+        self.serial_manager.disconnect()
+        self._publish("conexion", conectado=False, puerto=self.port)
+
+    def on_frame(self, data):
+        """Callback del SerialManager (hilo de lectura de este puerto)"""
+        self.stats["tramas"] += 1
+        # El protocolo se consulta en cada trama: puede cambiarse en la configuración
+        reading = get_parser(self.serial_manager.protocol)(data)
+        if reading is None:
+            self.stats["mensajes"] += 1
+            self._publish("mensaje", texto=data)
+            return
+
+        self.stats["lecturas"] += 1
+        self.last_reading = reading
+        if reading.estable is False:
+            # El propio indicador informa movimiento: la meseta empieza de nuevo
+            self.detector.reset()
+        stable_event = self.detector.add(reading.peso)
+
+        self._publish("lectura", texto=data, lectura=reading)
+        if stable_event:
+            self.stats["estables"] += 1
+            self._publish("estable", estable=stable_event)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["conectado"] = self.is_connected
+        stats["puerto"] = self.port
+        stats.update(self.serial_manager.get_frame_stats())
+        return stats
+
+    def _publish(self, tipo, **data):
+        event = {"tipo": tipo, "bascula": self.name, "instante": time.monotonic()}
+        event.update(data)
+        self.bus.publish(event)
+
+
+class MultiScaleManager:
+    """
+    Adquisición simultánea de varias básculas.
+
+    Cada báscula es un ScaleChannel con su propio hilo de lectura; todos
+    publican en un único EventBus al que se suscribe la vista.
+
+    Args:
+        bus: EventBus compartido (se crea uno si es None)
+    """
+
+    def __init__(self, bus=None):
+        self.bus = bus or EventBus()
+        self.scales = {}
+
+    def add_scale(self, name, port=None, serial_manager=None, protocol=None, terminator=None,
+                  baudrate=None, **stability):
+        """
+        Agregar una báscula.
+
+        Args:
+            name: Nombre único de la báscula
+            port: Puerto serie o URL de pyserial
+            serial_manager: SerialManager existente (opcional)
+            protocol: Intérprete de tramas (ver scale_protocols.PARSERS)
+            terminator: Fin de trama (ver FrameAccumulator)
+            baudrate: Velocidad del puerto
+            **stability: Parámetros de StabilityDetector
+
+        Returns:
+            ScaleChannel creado
+        """
+        if name in self.scales:
+            raise ValueError(f"Ya existe una báscula llamada {name}")
+        channel = ScaleChannel(name, self.bus, serial_manager=serial_manager, port=port, **stability)
+        manager = channel.serial_manager
+        if protocol:
+            manager.protocol = protocol
+        if terminator:
+            manager.terminator = terminator
+        if baudrate:
+            manager.baudrate = baudrate
+        self.scales[name] = channel
+        return channel
+
+    def remove_scale(self, name):
+        channel = self.scales.pop(name, None)
+        if channel is not None and channel.is_connected:
+            channel.disconnect()
+
+    def connect_all(self):
+        """Conectar las básculas con puerto; devuelve {nombre: conectada}"""
+        return {
+            name: channel.connect()
+            for name, channel in self.scales.items()
+            if channel.port and not channel.is_connected
+        }
+
+    def disconnect_all(self):
+        for channel in self.scales.values():
+            if channel.is_connected:
+                channel.disconnect()
+
+    def subscribe(self, callback, tipos=None):
+        self.bus.subscribe(callback, tipos)
+
+    def get_stats(self):
+        stats = {name: channel.get_stats() for name, channel in self.scales.items()}
+        stats["bus"] = self.bus.get_stats()
+        return stats
+
+
+if __name__ == "__main__":
+    # Prueba con terminales virtuales (sólo POSIX): cuatro básculas simuladas,
+    # una de ellas lenta y con tramas partidas
+    import os
+    import random
+
+    def simulate(fd, weight, interval, chunked, stop):
+        rng = random.Random(fd)
+        while not stop.is_set():
+            frame = f"ST,GS,+{weight + rng.randint(-2, 2):07d}kg\r\n".encode()
+            if chunked:
+                for i in range(0, len(frame), 3):
+                    os.write(fd, frame[i:i + 3])
+                    time.sleep(interval / 4)
+            else:
+                os.write(fd, frame)
+            time.sleep(interval)
+
+    manager = MultiScaleManager()
+    events = {}
+    first_stable = {}
+    started = time.monotonic()
+
+    def on_event(event):
+        counts = events.setdefault(event["bascula"], {})
+        counts[event["tipo"]] = counts.get(event["tipo"], 0) + 1
+        if event["tipo"] == "estable" and event["bascula"] not in first_stable:
+            first_stable[event["bascula"]] = event["instante"] - started
+
+    manager.subscribe(on_event)
+    stop = threading.Event()
+    scales = [("Báscula 1", 32000, 0.01, False), ("Báscula 2", 18500, 0.02, False),
+              ("Báscula 3", 41000, 0.05, False), ("Báscula lenta", 9000, 0.3, True)]
+    for name, weight, interval, chunked in scales:
+        master, slave = os.openpty()
+        manager.add_scale(name, port=os.ttyname(slave), protocol="continuo_estado", dwell_time=1.0)
+        threading.Thread(target=simulate, args=(master, weight, interval, chunked, stop), daemon=True).start()
+
+    print(manager.connect_all())
+    time.sleep(5)
+    stop.set()
+    manager.disconnect_all()
+    time.sleep(0.2)
+
+    for name, *_ in scales:
+        stats = manager.scales[name].get_stats()
+        print(f"{name:14s} tramas={stats['tramas']:5d} eventos={events.get(name)} "
+              f"primer estable={first_stable.get(name, 0):.2f} s latencia p95={stats['latencia_p95_ms']} ms")
+    print(manager.get_stats()["bus"])
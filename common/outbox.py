@@ -0,0 +1,296 @@
+import threading
+import time
+
+from DatabaseConnections import LocalOutbox
+from common.connection_pool import is_connection_error
+
+
+# Bandeja local de escrituras pendientes (junto a replica.db)
+OUTBOX_PATH = 'outbox.db'
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+class OutboxReplayer:
+    """
+    Envía a Access las escrituras guardadas en la bandeja local.
+
+    Cada ronda comprueba primero que el recurso compartido responde (probe);
+    si no responde, no se cuenta como intento de ninguna escritura. Con el
+    recurso disponible se envían las pendientes en el orden en que se
+    guardaron, y la ronda se detiene en el primer fallo para no adelantar una
+    escritura posterior a una anterior del mismo registro. Entre rondas
+    fallidas la espera se duplica hasta max_backoff.
+
+    Una escritura que falla max_intentos veces con el recurso disponible
+    (por ejemplo, datos que Access rechaza) pasa a estado 'error' y deja de
+    bloquear a las demás; queda en la bandeja para revisarla. Un error de
+    conexión del propio envío (ConnectionError o SQLSTATE 08) no cuenta como
+    intento: la ronda se detiene como si el recurso no respondiera.
+
+    Una vez por purge_interval se borran las escrituras enviadas hace más de
+    una semana (LocalOutbox.purge_sent) para que la bandeja no crezca sin fin.
+
+    Args:
+        outbox: LocalOutbox
+        handlers: {operacion: función (datos, clave) -> bool}
+        probe: Función sin argumentos; True si Access responde
+        interval: Segundos entre rondas cuando todo va bien
+        max_backoff: Segundos máximos entre rondas fallidas
+        max_intentos: Fallos antes de apartar una escritura
+        purge_interval: Segundos entre limpiezas de las escrituras enviadas
+    """
+
+    def __init__(self, outbox, handlers, probe, interval=5, max_backoff=60, max_intentos=5,
+                 purge_interval=24 * 3600):
+        self.outbox = outbox
+        self.handlers = handlers
+        self.probe = probe
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.max_intentos = max_intentos
+        self.purge_interval = purge_interval
+
+        self.last_error = None
+        self._last_purge = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "rondas": 0,
+            "enviadas": 0,
+            "fallos": 0,
+            "sin_conexion": 0,
+            "apartadas": 0,
+            "purgadas": 0,
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_replay(self):
+        """Adelantar la próxima ronda (p. ej. al agregar una escritura)"""
+        self._wake.set()
+
+    def replay(self, limit=100):
+        """
+        Una ronda de envío.
+
+        Returns:
+            True si la bandeja quedó sin pendientes, False si algo falló
+        """
+        self.stats["rondas"] += 1
+        entries = self.outbox.pending(limit)
+        if not entries:
+            return True
+        if not self.probe():
+            self.stats["sin_conexion"] += 1
+            return False
+
+        for entry in entries:
+            handler = self.handlers.get(entry.operacion)
+            try:
+                if handler is None:
+                    raise ValueError(f"Operación desconocida: {entry.operacion}")
+                sent = handler(entry.datos, entry.clave)
+                error = None if sent else "Access rechazó la escritura"
+            except Exception as e:
+                if isinstance(e, ConnectionError) or is_connection_error(e):
+                    self.last_error = e
+                    self.stats["sin_conexion"] += 1
+                    return False
+                sent = False
+                error = e
+
+            if sent:
+                self.outbox.mark_sent(entry.clave)
+                self.stats["enviadas"] += 1
+                continue
+
+            self.last_error = error
+            self.stats["fallos"] += 1
+            give_up = entry.intentos + 1 >= self.max_intentos
+            self.outbox.mark_failed(entry.clave, error, give_up=give_up)
+            if give_up:
+                self.stats["apartadas"] += 1
+                print(f"Escritura {entry.clave} ({entry.operacion}) apartada tras {self.max_intentos} intentos: {error}")
+            return False
+
+        return len(entries) < limit or self.replay(limit)
+
+    def purge(self):
+        """Borrar las escrituras enviadas antiguas si ya toca (una vez por purge_interval)"""
+        now = time.monotonic()
+        if self._last_purge is not None and now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        self.stats["purgadas"] += self.outbox.purge_sent()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats.update(self.outbox.get_stats())
+        stats["ultimo_error"] = str(self.last_error) if self.last_error else None
+        return stats
+
+    def _run(self):
+        backoff = self.interval
+        while not self._stop.is_set():
+            try:
+                done = self.replay()
+            except Exception as e:
+                print(f"Error enviando la bandeja local: {e}")
+                done = False
+            try:
+                self.purge()
+            except Exception as e:
+                print(f"Error limpiando la bandeja local: {e}")
+            backoff = self.interval if done else min(backoff * 2, self.max_backoff)
+            self._wake.wait(backoff)
+            self._wake.clear()
+
+
+def _update_vehicle(datos, clave):
+    from common.database_manager import DatabaseManager
+    return DatabaseManager().update_vehicle(datos, use_outbox=False)
+
+
+def _save_weight(datos, clave):
+    from common.scale_protocols import WeightRecord
+    from common.weight_database import WeightDatabaseManager
+    record = WeightRecord.from_dict(datos)
+    weight_db = WeightDatabaseManager()
+    if record.id:
+        return weight_db.save_weight_record(record, use_outbox=False)[0]
+    # La clave evita duplicar el pesaje si el envío anterior sí llegó a Access;
+    # con raise_errors una caída (o la falta de la columna Clave) no cuenta
+    # como intento
+    return bool(weight_db.insert_weight_records([record], claves=[clave], raise_errors=True)[0])
+
+
+HANDLERS = {
+    "update_vehicle": _update_vehicle,
+    "save_weight": _save_weight,
+}
+
+
+def _access_available():
+    from common.database_manager import DatabaseManager
+    conn = DatabaseManager().connect()
+    if not conn:
+        return False
+    conn.close()
+    return True
+
+
+def get_outbox():
+    """
+    Bandeja local compartida, con su OutboxReplayer ya en marcha.
+
+    Returns:
+        LocalOutbox (outbox.replayer es el hilo que la envía)
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            outbox = LocalOutbox(OUTBOX_PATH)
+            outbox.replayer = OutboxReplayer(outbox, HANDLERS, _access_available)
+            outbox.replayer.start()
+            _outbox = outbox
+        return _outbox
+
+
+def queue_write(operacion, datos, clave=None):
+    """
+    Guardar una escritura en la bandeja local para enviarla cuando Access responda.
+
+    Args:
+        operacion: Una de las claves de HANDLERS
+        datos: Datos serializables a JSON
+        clave: Clave de idempotencia (opcional)
+
+    Returns:
+        Clave de la escritura
+    """
+    outbox = get_outbox()
+    clave = outbox.add(operacion, datos, clave)
+    outbox.replayer.request_replay()
+    return clave
+
+
+def set_aside(operacion, datos, clave, error):
+    """
+    Guardar en la bandeja, ya en estado 'error', una escritura que Access
+    rechazó en otra cola (queda para revisarla y no se reenvía sola).
+
+    Args:
+        operacion: Una de las claves de HANDLERS
+        datos: Datos serializables a JSON
+        clave: Clave de idempotencia
+        error: Último error recibido
+    """
+    get_outbox().add(operacion, datos, clave, estado=LocalOutbox.FAILED, error=error)
+
+
+def pending_vehicle_updates():
+    """
+    Ediciones de vehículos que siguen en la bandeja (sin crearla si no existe).
+
+    Returns:
+        {ID: campos editados}; con varias ediciones del mismo vehículo se
+        combinan en orden, así que gana la última
+    """
+    if _outbox is None:
+        return {}
+    updates = {}
+    for entry in _outbox.pending(limit=-1):  # -1: sin límite en SQLite
+        if entry.operacion == "update_vehicle":
+            updates.setdefault(entry.datos.get("ID"), {}).update(entry.datos)
+    return updates
+
+
+def has_pending():
+    """True si hay escrituras esperando en la bandeja (sin crearla si no existe)"""
+    return _outbox is not None and _outbox.pending_count() > 0
+
+
+if __name__ == "__main__":
+    # Simulación: Access cae durante 2 s mientras se guardan 200 escrituras
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    outbox = LocalOutbox(path)
+    online = {"valor": False}
+    applied = []
+
+    def apply(datos, clave):
+        if not online["valor"]:
+            return False
+        applied.append(clave)
+        return True
+
+    replayer = OutboxReplayer(outbox, {"prueba": apply}, lambda: online["valor"], interval=0.1, max_backoff=1)
+    replayer.start()
+
+    started = time.perf_counter()
+    for i in range(200):
+        outbox.add("prueba", {"i": i}, clave=f"k{i}")
+        outbox.add("prueba", {"i": i}, clave=f"k{i}")  # repetida: se ignora
+    added = time.perf_counter() - started
+    time.sleep(2)
+    online["valor"] = True
+    replayer.request_replay()
+    while outbox.pending_count():
+        time.sleep(0.05)
+    print(f"400 add() en {added * 1000:.0f} ms; enviadas {len(applied)} "
+          f"(únicas {len(set(applied))}, en orden {applied == [f'k{i}' for i in range(200)]})")
+    print(replayer.get_stats())
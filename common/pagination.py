@@ -30,9 +30,17 @@ class PaginationManager:
     def set_page_change_callback(self, callback):
         self.on_page_change_callback = callback
         
-    def update_data(self, new_data):
+    def update_data(self, new_data, keep_page=False):
+        """
+        Mostrar otros datos. Con keep_page se conserva la página actual
+        (recortada al nuevo total), por ejemplo mientras llegan los folios
+        de un rango o tras una recarga; si no, se vuelve a la primera.
+        """
         self.data = new_data
-        self.current_page = 1
+        if keep_page:
+            self.current_page = min(self.current_page, self.get_total_pages())
+        else:
+            self.current_page = 1
         self.update_ui()
         if self.on_page_change_callback:
             self.on_page_change_callback()
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """Carga en curso de una clave; los demás hilos esperan su resultado"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.loaded_at = None
+
+
+class QueryCache:
+    """
+    Caché de resultados de consultas con expiración y carga única.
+
+    Cada clave guarda el resultado durante `ttl` segundos. Si varios hilos
+    piden a la vez una clave que no está (o venció), sólo el primero ejecuta
+    la consulta y los demás esperan ese mismo resultado: N peticiones
+    idénticas simultáneas producen una sola consulta a la base de datos.
+
+    Args:
+        ttl: Segundos que un resultado se considera vigente
+        max_entries: Claves máximas; se descartan las menos usadas
+    """
+
+    def __init__(self, ttl=10, max_entries=128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clave -> (instante de carga, valor)
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "aciertos": 0,
+            "cargas": 0,
+            "coalescidas": 0,
+            "errores": 0,
+            "invalidaciones": 0,
+        }
+
+    def get(self, key, loader):
+        """
+        Resultado de `key`, ejecutando loader() sólo si hace falta.
+
+        Args:
+            key: Clave hashable (por ejemplo, una tupla con la consulta y sus filtros)
+            loader: Función sin argumentos que hace la consulta
+
+        Returns:
+            El valor guardado o el que devuelva loader; si loader lanza una
+            excepción se propaga a todos los que esperaban y no se guarda nada
+        """
+        return self.get_entry(key, loader)[1]
+
+    def get_entry(self, key, loader):
+        """
+        Como get(), pero devuelve (instante de carga, valor).
+
+        El instante (time.monotonic()) identifica la carga: sirve para
+        reutilizar lo que se derive del valor mientras no se vuelva a cargar.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["aciertos"] += 1
+                return entry
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["coalescidas"] += 1
+                owner = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                generation = self._generation
+                self.stats["cargas"] += 1
+                owner = True
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.loaded_at, flight.value
+
+        try:
+            flight.value = loader()
+            flight.loaded_at = time.monotonic()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.stats["errores"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                # Un resultado leído antes de una invalidación ya no se guarda
+                if flight.error is None and generation == self._generation:
+                    self._entries[key] = (flight.loaded_at, flight.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.loaded_at, flight.value
+
+    def invalidate(self, match=None):
+        """
+        Descartar resultados guardados.
+
+        Args:
+            match: None para descartar todo, o el primer elemento de las
+                   claves (tuplas) a descartar, p. ej. 'bdenturne'
+
+        Returns:
+            Número de claves descartadas
+        """
+        with self._lock:
+            if match is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [k for k in self._entries if isinstance(k, tuple) and k and k[0] == match]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self._generation += 1
+            self.stats["invalidaciones"] += 1
+            return removed
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["claves"] = len(self._entries)
+            stats["ttl"] = self.ttl
+            return stats
+
+
+if __name__ == "__main__":
+    # 50 peticiones simultáneas de la misma clave: una sola consulta
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = QueryCache(ttl=5)
+    calls = []
+
+    def slow_query():
+        calls.append(1)
+        time.sleep(0.3)
+        return list(range(1000))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        results = list(executor.map(lambda _: cache.get(("bdenturne", 45000), slow_query), range(50)))
+    elapsed = time.perf_counter() - started
+    print(f"50 peticiones en {elapsed:.2f} s con {len(calls)} consulta(s); {cache.get_stats()}")
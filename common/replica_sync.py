@@ -0,0 +1,249 @@
+import threading
+import time
+
+from common.connection_pool import get_pool
+
+
+# Isotanques.accdb (tabla Taras), la misma base que consulta app.py
+TARAS_CONN_STR = r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=\\TTRAFEJT2K02\User$\Manuel.Rodriguez\enturne\Isotanques1\Isotanques.accdb'
+
+
+class ReplicaSync:
+    """
+    Mantiene la réplica local (DatabaseConnections.LocalReplica) al día con
+    las bases Access del recurso compartido.
+
+    Un hilo en segundo plano copia cada `interval` segundos el folio vigilado
+    (BDEnturne y TablaPesajes2) y cada `taras_interval` segundos la tabla
+    Taras. Las lecturas de las vistas van a la réplica; si un folio todavía no
+    se ha copiado se copia en ese momento (lectura a través de la réplica).
+
+    Args:
+        replica: LocalReplica donde se guardan las copias
+        enturne_pool: Pool de EnturneVehiculosSPITB2.mdb
+        pesajes_pool: Pool de Isotanques.mdb (opcional)
+        taras_pool: Pool de Isotanques.accdb (opcional)
+        interval: Segundos entre copias del folio vigilado
+        taras_interval: Segundos entre copias de Taras
+        on_sync: Función (tablas_cambiadas, folio) llamada tras cada ciclo
+                 desde el hilo de sincronización
+    """
+
+    def __init__(self, replica, enturne_pool, pesajes_pool=None, taras_pool=None,
+                 interval=60, taras_interval=300, on_sync=None):
+        self.replica = replica
+        self.enturne_pool = enturne_pool
+        self.pesajes_pool = pesajes_pool
+        self.taras_pool = taras_pool
+        self.interval = interval
+        self.taras_interval = taras_interval
+        self.on_sync = on_sync
+
+        self.folio = None
+        self.last_error = None
+        self._last_taras = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Evita copiar la misma tabla dos veces a la vez (hilo y lectura a través)
+        self._sync_lock = threading.Lock()
+
+        self.stats = {
+            "sincronizaciones": 0,
+            "filas_copiadas": 0,
+            "lecturas_replica": 0,
+            "lecturas_a_traves": 0,
+            "errores": 0,
+        }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def watch(self, folio):
+        """
+        Cambiar el folio que se mantiene al día. La primera copia la hace la
+        lectura a través (read_vehicles); el hilo lo refresca en cada ciclo.
+        """
+        self.folio = folio
+
+    def request_sync(self):
+        """Adelantar la próxima copia"""
+        self._wake.set()
+
+    def read_vehicles(self, folio, on_first_row=None, from_source=False):
+        """
+        Filas de BDEnturne del folio desde la réplica.
+
+        Si el folio nunca se ha copiado, o from_source es True, se copia
+        primero desde Access. Si Access no responde se devuelven las filas que
+        haya en la réplica.
+        """
+        if from_source or self.replica.last_sync('bdenturne', folio) is None:
+            self.stats["lecturas_a_traves"] += 1
+            self.sync_vehicles(folio)
+        else:
+            self.stats["lecturas_replica"] += 1
+        rows = self.replica.fetch_vehicle_summary(folio)
+        if on_first_row:
+            on_first_row()
+        return rows
+
+    def read_pesajes_resumen(self, folio):
+        """Resumen de pesajes del folio desde la réplica (ver read_vehicles)"""
+        if self.pesajes_pool is not None and self.replica.last_sync('tabla_pesajes2', folio) is None:
+            self.stats["lecturas_a_traves"] += 1
+            self.sync_pesajes(folio)
+        else:
+            self.stats["lecturas_replica"] += 1
+        return self.replica.get_pesajes_resumen(folio)
+
+    def staleness(self, folio):
+        """Segundos desde la última copia del folio, o None si nunca se copió"""
+        return self.replica.staleness('bdenturne', folio)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["ultimo_error"] = str(self.last_error) if self.last_error else None
+        return stats
+
+    def sync_vehicles(self, folio):
+        """Copiar el folio de BDEnturne; devuelve True si cambió, None si falló"""
+        rows = self._read_source(
+            self.enturne_pool,
+            """
+                SELECT ID, Folio, Consecutivo, Cedula, NombreConductor, Placa, Remolque,
+                GrupoProducto, Producto, Proceso, Cliente, Origen, Destino, Estado,
+                Ejes, TipoEmbalaje
+                FROM BDEnturne
+                WHERE EstadoRegistro = 'Activo' AND Folio = ?
+                ORDER BY Consecutivo, ID""",
+            (folio,),
+        )
+        if rows is None:
+            return None
+        rows = self._with_pending_updates(rows)
+        with self._sync_lock:
+            return self.replica.replace_vehicles(folio, rows)
+
+    def _with_pending_updates(self, rows):
+        """
+        Filas de Access con las ediciones que siguen en la bandeja local
+        aplicadas encima, para que la copia no deshaga un cambio que Access
+        todavía no ha recibido.
+        """
+        from common.outbox import pending_vehicle_updates
+        updates = pending_vehicle_updates()
+        if not updates:
+            return rows
+        columns = self.replica.VEHICLE_COLUMNS
+        patched = []
+        for row in rows:
+            vehicle = updates.get(row[0])
+            if vehicle is not None:
+                row = tuple(vehicle.get(column, value) for column, value in zip(columns, row))
+            patched.append(row)
+        return patched
+
+    def sync_pesajes(self, folio):
+        """Copiar los pesajes del folio; devuelve True si cambiaron, None si falló"""
+        rows = self._read_source(
+            self.pesajes_pool,
+            """
+                SELECT Id, Folio, Proceso, IdentificacionPlaca, Terminaltractor,
+                PesoInicial, PesoFinal, PesoBruto
+                FROM TablaPesajes2
+                WHERE Folio = ?
+                ORDER BY Id""",
+            (folio,),
+        )
+        if rows is None:
+            return None
+        with self._sync_lock:
+            return self.replica.replace_pesajes(folio, rows)
+
+    def sync_taras(self):
+        """Copiar la tabla Taras; devuelve True si cambió, None si falló"""
+        rows = self._read_source(self.taras_pool, "SELECT VEHICULO, PESO, FECHA FROM Taras", ())
+        if rows is None:
+            return None
+        with self._sync_lock:
+            return self.replica.replace_taras(rows)
+
+    def _read_source(self, pool, query, params):
+        # A diferencia de los gestores, aquí un error no se confunde con "sin
+        # filas": una copia fallida no debe vaciar la réplica
+        try:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            self.last_error = None
+            self.stats["filas_copiadas"] += len(rows)
+            return rows
+        except Exception as e:
+            self.last_error = e
+            self.stats["errores"] += 1
+            print(f"Error sincronizando la réplica local: {e}")
+            return None
+
+    def _sync_step(self, sync, *args):
+        """Un paso del ciclo; un error se registra sin detener el hilo de sincronización"""
+        try:
+            return sync(*args)
+        except Exception as e:
+            self.last_error = e
+            self.stats["errores"] += 1
+            print(f"Error actualizando la réplica local: {e}")
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            folio = self.folio
+            changed = []
+            if folio is not None:
+                if self._sync_step(self.sync_vehicles, folio):
+                    changed.append('bdenturne')
+                if self.pesajes_pool is not None and self._sync_step(self.sync_pesajes, folio):
+                    changed.append('tabla_pesajes2')
+            if self.taras_pool is not None and (
+                    self._last_taras is None or time.monotonic() - self._last_taras >= self.taras_interval):
+                result = self._sync_step(self.sync_taras)
+                if result is not None:
+                    self._last_taras = time.monotonic()
+                if result:
+                    changed.append('taras')
+            self.stats["sincronizaciones"] += 1
+
+            if self.on_sync:
+                try:
+                    self.on_sync(changed, folio)
+                except Exception as e:
+                    print(f"Error notificando la sincronización: {e}")
+
+
+def create_replica_sync(replica, **options):
+    """ReplicaSync con los pools compartidos de las tres bases Access"""
+    from common.database_manager import DatabaseManager, PesajesManager
+    return ReplicaSync(
+        replica,
+        enturne_pool=DatabaseManager().pool,
+        pesajes_pool=PesajesManager().pool,
+        taras_pool=get_pool(TARAS_CONN_STR, health_query="SELECT TOP 1 VEHICULO FROM Taras"),
+        **options,
+    )
@@ -0,0 +1,138 @@
+import threading
+
+
+# Mapeadores ya compilados por (columnas de la consulta, campos pedidos)
+_mappers = {}
+_mappers_lock = threading.Lock()
+MAX_MAPPERS = 64
+
+
+class RowMapper:
+    """
+    Conversión de filas a diccionarios o tuplas por posición.
+
+    Las posiciones de las columnas se resuelven una sola vez a partir de
+    cursor.description y se compila una función que lee la fila por índice,
+    así que convertir una fila no hace ninguna búsqueda por nombre
+    (getattr/hasattr por campo). Los campos pedidos que la consulta no
+    trae quedan en None, igual que con hasattr.
+
+    Args:
+        columns: Nombres de las columnas de la consulta, en orden
+        fields: Campos del resultado (por defecto, todas las columnas)
+    """
+
+    def __init__(self, columns, fields=None):
+        self.columns = tuple(columns)
+        self.fields = tuple(fields) if fields is not None else self.columns
+        positions = {}
+        for index, column in enumerate(self.columns):
+            # Access devuelve los nombres como se escribieron en la consulta
+            # (Id, id, ID...); se comparan sin distinguir mayúsculas
+            positions.setdefault(column.lower(), index)
+        self.positions = tuple(positions.get(field.lower()) for field in self.fields)
+
+        cells = ["None" if p is None else f"row[{p}]" for p in self.positions]
+        self.to_dict = self._compile(
+            "{" + ", ".join(f"{field!r}: {cell}" for field, cell in zip(self.fields, cells)) + "}"
+        )
+        self.values = self._compile("(" + "".join(f"{cell}, " for cell in cells) + ")")
+
+    @staticmethod
+    def _compile(expression):
+        namespace = {}
+        exec(f"def mapper(row):\n    return {expression}\n", namespace)
+        return namespace["mapper"]
+
+    def to_dicts(self, rows):
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
+
+
+def get_mapper(description, fields=None):
+    """
+    RowMapper compartido para las columnas de una consulta.
+
+    Args:
+        description: cursor.description, o una secuencia de nombres
+        fields: Campos del resultado (opcional)
+
+    Returns:
+        RowMapper (el mismo objeto para la misma consulta y los mismos campos)
+    """
+    columns = tuple(c if isinstance(c, str) else c[0] for c in description)
+    key = (columns, tuple(fields) if fields is not None else None)
+    mapper = _mappers.get(key)
+    if mapper is not None:
+        return mapper
+    mapper = RowMapper(columns, fields)
+    with _mappers_lock:
+        if len(_mappers) >= MAX_MAPPERS:
+            _mappers.clear()
+        return _mappers.setdefault(key, mapper)
+
+
+def mapper_for_rows(rows, fields=None):
+    """
+    RowMapper a partir de las propias filas (sin el cursor).
+
+    Sirve para filas de pyodbc (cursor_description) y para las namedtuple
+    de la réplica local (_fields).
+
+    Returns:
+        RowMapper, o None si no hay filas
+    """
+    if not rows:
+        return None
+    row = rows[0]
+    description = getattr(row, 'cursor_description', None)
+    if description is None:
+        description = row._fields
+    return get_mapper(description, fields)
+
+
+if __name__ == "__main__":
+    # Costo por fila: hasattr/getattr por campo (como get_vehicle_by_id y
+    # get_pesajes_by_folio) contra el mapeador posicional
+    import time
+    from collections import namedtuple
+
+    COLUMNS = (
+        "ID", "Consecutivo", "FechaEnturne", "HoraEnturne", "Cedula", "NombreConductor",
+        "Placa", "Remolque", "GrupoProducto", "Producto", "Proceso", "Cliente", "Origen",
+        "Destino", "Estado", "Transportador", "Folio", "FechaBasculaEntrada",
+        "HoraBasculaEntrada", "FechaBasculaSalida", "HoraBasculaSalida", "Manifiesto", "GUT",
+        "Ejes", "BasculaOUT", "BasculaIN", "PesoEntrada", "Tara", "PesoSalida", "FechaEnvio",
+        "HoraEnvio", "Precalentamiento", "DobleCiclo", "TipoEmbalaje",
+    )
+
+    class Row(namedtuple("Row", COLUMNS)):
+        # Como pyodbc.Row: la fila conoce la descripción de su cursor
+        __slots__ = ()
+        cursor_description = tuple((name, str, None, None, None, None, True) for name in COLUMNS)
+
+    rows = [Row(*(f"{column}-{i}" for column in COLUMNS)) for i in range(100_000)]
+
+    def with_hasattr(row):
+        return {column: getattr(row, column) if hasattr(row, column) else None for column in COLUMNS}
+
+    def with_getattr(row):
+        return {column: getattr(row, column) for column in COLUMNS}
+
+    def best_of(function, repeat=3):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    hasattr_s = best_of(lambda: [with_hasattr(row) for row in rows])
+    getattr_s = best_of(lambda: [with_getattr(row) for row in rows])
+    mapper_s = best_of(lambda: mapper_for_rows(rows).to_dicts(rows))
+    assert mapper_for_rows(rows).to_dicts(rows[:10]) == [with_hasattr(row) for row in rows[:10]]
+
+    for name, seconds in (("hasattr+getattr", hasattr_s), ("getattr", getattr_s), ("RowMapper", mapper_s)):
+        print(f"{name:16s} {len(rows)} filas de {len(COLUMNS)} columnas: "
+              f"{seconds * 1000:7.1f} ms ({seconds / len(rows) * 1e6:.2f} µs por fila)")
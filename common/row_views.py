@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+
+
+class RowView:
+    """
+    Vista de sólo lectura sobre un subconjunto de filas.
+
+    Guarda una referencia a la lista completa y a la lista de posiciones del
+    subconjunto, así que crearla no copia filas. Admite len(), iteración,
+    índices y rebanadas (lo que usan PaginationManager y la búsqueda).
+    """
+
+    __slots__ = ("_data", "_positions")
+
+    def __init__(self, data, positions):
+        self._data = data
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __bool__(self):
+        return bool(self._positions)
+
+    def __iter__(self):
+        data = self._data
+        for position in self._positions:
+            yield data[position]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            data = self._data
+            return [data[position] for position in self._positions[index]]
+        return self._data[self._positions[index]]
+
+    @property
+    def positions(self):
+        return self._positions
+
+
+class ServerSideRows:
+    """
+    Secuencia perezosa de filas que se consultan por páginas a la base de datos.
+
+    len() sale de un COUNT(*) y cada índice o rebanada pide sólo las páginas
+    que necesita, así que PaginationManager y la tabla virtual pueden recorrer
+    miles de filas sin traer la tabla completa. Las últimas páginas leídas se
+    guardan en memoria.
+
+    Con fetcher (DataLoader.fetch_async) las consultas no se hacen en el hilo
+    que lee la secuencia: una rebanada devuelve sólo las filas de las páginas
+    ya recibidas y pide las que faltan (y el conteo, si aún no se conoce) a
+    un hilo de trabajo; al llegar se guardan y se avisa a la interfaz para
+    que vuelva a pintar. Mientras tanto len() es 0 si falta el conteo. Sin
+    fetcher, o al iterar, las consultas se hacen en el momento.
+
+    Args:
+        fetch_page: Función (offset, limit) que devuelve la lista de filas
+        total: Número total de filas, o None para consultarlo con count
+        page_size: Filas por consulta
+        cache_pages: Número de páginas que se guardan en memoria
+        count: Función sin argumentos que devuelve el total (si total es None)
+        fetcher: Función (consulta, aplicar) que ejecuta consulta() en segundo
+                 plano y luego aplicar(resultado), o aplicar(None) si la
+                 consulta falló (opcional)
+    """
+
+    def __init__(self, fetch_page, total=None, page_size=100, cache_pages=8, count=None,
+                 fetcher=None):
+        self._fetch_page = fetch_page
+        self._total = total
+        self._count = count
+        self._fetcher = fetcher
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self._pages = OrderedDict()
+        self._requested = set()  # páginas (y 'total') pedidas al fetcher
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._get_total()
+
+    def __bool__(self):
+        return self._get_total() > 0
+
+    def __iter__(self):
+        total = self._get_total(wait=True)
+        for page_number in range((total + self.page_size - 1) // self.page_size):
+            yield from self._page(page_number, wait=True)
+
+    def __getitem__(self, index):
+        total = self._get_total()
+        if isinstance(index, slice):
+            start, stop, step = index.indices(total)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            result = []
+            position = start
+            while position < stop:
+                page_number, offset = divmod(position, self.page_size)
+                page = self._page(page_number)
+                if page is None or offset >= len(page):
+                    # Página todavía en camino: se muestra lo que ya hay
+                    break
+                chunk = page[offset:offset + stop - position]
+                result.extend(chunk)
+                position += len(chunk)
+            return result
+
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("índice fuera de rango")
+        page_number, offset = divmod(index, self.page_size)
+        page = self._page(page_number, wait=True)
+        if offset >= len(page):
+            raise IndexError("índice fuera de rango")
+        return page[offset]
+
+    def invalidate(self):
+        """Olvidar las páginas leídas (por ejemplo, tras editar un vehículo)"""
+        with self._lock:
+            self._pages.clear()
+            self._requested &= {'total'}
+
+    def _get_total(self, wait=False):
+        if self._total is not None:
+            return self._total
+        if self._fetcher is None or wait:
+            self._total = self._count()
+            return self._total
+        self._request('total', self._count, self._store_total)
+        return 0
+
+    def _store_total(self, total):
+        with self._lock:
+            self._requested.discard('total')
+        if total is not None:
+            self._total = total
+
+    def _page(self, page_number, wait=False):
+        with self._lock:
+            page = self._pages.get(page_number)
+            if page is not None:
+                self._pages.move_to_end(page_number)
+                return page
+
+        def fetch():
+            return self._fetch_page(page_number * self.page_size, self.page_size)
+
+        if self._fetcher is None or wait:
+            page = fetch()
+            self._store_page(page_number, page)
+            return page
+        self._request(page_number, fetch, lambda page: self._store_page(page_number, page))
+        return None
+
+    def _request(self, key, fetch, store):
+        with self._lock:
+            if key in self._requested:
+                return
+            self._requested.add(key)
+        self._fetcher(fetch, store)
+
+    def _store_page(self, page_number, page):
+        with self._lock:
+            self._requested.discard(page_number)
+            if page is None:
+                return
+            self._pages[page_number] = page
+            while len(self._pages) > self.cache_pages:
+                self._pages.popitem(last=False)
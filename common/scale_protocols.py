@@ -0,0 +1,225 @@
+import re
+from collections import namedtuple
+from datetime import datetime
+
+
+class WeightRecord:
+    """
+    Registro de un pesaje tal como se guarda en BDPesajes.
+
+    Args:
+        placa: Placa del vehículo
+        peso: Peso registrado
+        unidad: Unidad del peso
+        proceso: Proceso de báscula (Repesaje Cisterna, Tara Verificada...)
+        fecha: Fecha y hora del pesaje (por defecto, ahora)
+        estable: True si el peso se capturó con la lectura estable
+        conductor: Nombre del conductor (opcional)
+        origen: Origen (opcional)
+        destino: Destino (opcional)
+    """
+
+    def __init__(self, placa, peso, unidad="kg", proceso=None, fecha=None, estable=False,
+                 conductor=None, origen=None, destino=None):
+        self.id = None
+        self.placa = placa
+        self.peso = peso
+        self.unidad = unidad
+        self.proceso = proceso
+        self.fecha = fecha or datetime.now()
+        self.estable = estable
+        self.conductor = conductor
+        self.origen = origen
+        self.destino = destino
+
+    def to_dict(self):
+        """Campos del registro en tipos JSON (la fecha en ISO 8601)"""
+        return {
+            "id": self.id,
+            "placa": self.placa,
+            "peso": self.peso,
+            "unidad": self.unidad,
+            "proceso": self.proceso,
+            "fecha": self.fecha.isoformat() if self.fecha else None,
+            "estable": self.estable,
+            "conductor": self.conductor,
+            "origen": self.origen,
+            "destino": self.destino,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Registro a partir de to_dict() (con su ID, si ya estaba guardado)"""
+        fields = dict(data)
+        record_id = fields.pop("id", None)
+        if fields.get("fecha"):
+            fields["fecha"] = datetime.fromisoformat(fields["fecha"])
+        record = cls(**fields)
+        record.id = record_id
+        return record
+
+    def __repr__(self):
+        estado = "estable" if self.estable else "inestable"
+        return f"WeightRecord({self.placa}, {self.peso} {self.unidad}, {estado})"
+
+
+# Lectura interpretada de una trama del indicador.
+#   peso: valor con signo y decimales
+#   unidad: 'kg', 'lb'... (la que informe el indicador, o 'kg')
+#   estable: True/False si el protocolo informa movimiento, None si no
+#   neto: True si el indicador muestra peso neto
+ScaleReading = namedtuple("ScaleReading", "peso unidad estable neto")
+
+# Registro de intérpretes: nombre -> (descripción, función(texto) -> ScaleReading o None)
+PARSERS = {}
+DEFAULT_PROTOCOL = "numero"
+
+
+def register_parser(name, description):
+    """Decorador que agrega un intérprete de tramas al registro"""
+    def decorator(func):
+        PARSERS[name] = (description, func)
+        return func
+    return decorator
+
+
+def get_parser(name):
+    """Función del intérprete `name` (o la del protocolo por defecto si no existe)"""
+    entry = PARSERS.get(name) or PARSERS[DEFAULT_PROTOCOL]
+    return entry[1]
+
+
+def parser_options():
+    """Lista de (nombre, descripción) para mostrar en la configuración"""
+    return [(name, entry[0]) for name, entry in PARSERS.items()]
+
+
+def _number(text):
+    return float(text.replace(",", "."))
+
+
+@register_parser("numero", "Sólo el número (ej. 12345.6)")
+def parse_number(text):
+    try:
+        return ScaleReading(_number(text), "kg", None, False)
+    except ValueError:
+        return None
+
+
+# Primer número de la trama, con signo opcional y unidad opcional detrás
+_GENERIC_RE = re.compile(r"([+-])?\s*(\d+(?:[.,]\d*)?|[.,]\d+)\s*(kg|lb|t|g)?", re.IGNORECASE)
+
+
+@register_parser("generico", "Primer número de la trama, con signo y unidad")
+def parse_generic(text):
+    match = _GENERIC_RE.search(text)
+    if match is None:
+        return None
+    sign, digits, unit = match.groups()
+    value = _number(digits)
+    if sign == "-":
+        value = -value
+    return ScaleReading(value, unit.lower() if unit else "kg", None, False)
+
+
+# Salida continua con estado, p. ej. "ST,GS,+0012345.5kg" o "US,NT,-   120 kg"
+#   ST estable, US en movimiento, OL sobrecarga; GS bruto, NT neto
+_STATUS_RE = re.compile(
+    r"(ST|US|OL)\s*,\s*(?:(GS|NT|TR)\s*,)?\s*([+-])?\s*(\d+(?:[.,]\d*)?)\s*([a-z]*)",
+    re.IGNORECASE,
+)
+
+
+@register_parser("continuo_estado", "Continuo con estado (ST/US,GS/NT,+peso unidad)")
+def parse_status(text):
+    match = _STATUS_RE.search(text)
+    if match is None:
+        return None
+    status, mode, sign, digits, unit = match.groups()
+    status = status.upper()
+    if status == "OL":
+        # Sobrecarga: no hay peso válido
+        return None
+    value = _number(digits)
+    if sign == "-":
+        value = -value
+    return ScaleReading(
+        value,
+        unit.lower() if unit else "kg",
+        status == "ST",
+        mode is not None and mode.upper() == "NT",
+    )
+
+
+_STX = "\x02"
+
+
+@register_parser("toledo", "Toledo continuo (STX, 3 bytes de estado, peso y tara)")
+def parse_toledo(text):
+    # STX SWA SWB SWC + 6 dígitos de peso + 6 de tara; el checksum que sigue
+    # al CR puede quedar al inicio de la trama siguiente
+    start = text.find(_STX)
+    if start >= 0:
+        text = text[start + 1:]
+    if len(text) < 9:
+        return None
+    digits = text[3:9]
+    if not digits.isdigit():
+        return None
+
+    swa = ord(text[0])
+    swb = ord(text[1])
+    if swb & 0x04:
+        # Fuera de rango
+        return None
+
+    value = int(digits)
+    decimals = swa & 0x07
+    # 0 -> XXXX00, 1 -> XXXXX0, 2 -> XXXXXX, 3 -> XXXXX.X ... 7 -> X.XXXXX
+    if decimals < 2:
+        value *= 100 if decimals == 0 else 10
+    elif decimals > 2:
+        value /= 10 ** (decimals - 2)
+    if swb & 0x02:
+        value = -value
+    return ScaleReading(
+        float(value),
+        "kg" if swb & 0x10 else "lb",
+        not swb & 0x08,
+        bool(swb & 0x01),
+    )
+
+
+if __name__ == "__main__":
+    # Rendimiento de cada intérprete sobre tramas grabadas (sintéticas)
+    import random
+    import sys
+    import time
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(7)
+
+    def toledo_frame(weight, motion):
+        swb = 0x20 | 0x10 | (0x08 if motion else 0)
+        return f"{_STX}{chr(0x2A)}{chr(swb)}{chr(0x20)}{weight:06d}000000"
+
+    samples = {
+        "numero": lambda w, m: f"{w:.1f}",
+        "generico": lambda w, m: f"  {w:08.1f} kg",
+        "continuo_estado": lambda w, m: f"{'US' if m else 'ST'},GS,+{w:09.1f}kg",
+        "toledo": lambda w, m: toledo_frame(int(w), m),
+    }
+
+    for name, make in samples.items():
+        # 1000 tramas distintas repetidas hasta completar `total`
+        recorded = [make(rng.uniform(0, 60000), rng.random() < 0.3) for _ in range(1000)]
+        frames = recorded * (total // len(recorded))
+        parse = get_parser(name)
+        started = time.perf_counter()
+        parsed = 0
+        for frame in frames:
+            if parse(frame) is not None:
+                parsed += 1
+        elapsed = time.perf_counter() - started
+        print(f"{name:16s} {len(frames):>9d} tramas en {elapsed:6.2f} s "
+              f"({len(frames) / elapsed / 1e6:.2f} M tramas/s, {parsed} válidas)")
@@ -0,0 +1,252 @@
+import time
+
+
+# Separador entre campos; no aparece en el texto que escribe el usuario, así
+# que una búsqueda nunca puede coincidir "a caballo" entre dos campos.
+FIELD_SEPARATOR = "\x00"
+
+
+def field_text(value):
+    """
+    Texto buscable de un campo, con las mismas reglas que usaba la búsqueda
+    lineal: None no coincide, los números se convierten con str() y el resto
+    se pasa a minúsculas.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return value.lower()
+    return str(value).lower()
+
+
+class SearchIndex:
+    """
+    Índice invertido de trigramas sobre los campos buscables de cada fila.
+
+    Cada fila se guarda como un único texto con los campos unidos por
+    FIELD_SEPARATOR y cada trigrama apunta al conjunto de posiciones de fila que
+    lo contienen. Una búsqueda de 3 o más caracteres intersecta las listas de
+    sus trigramas y verifica sólo esos candidatos; las búsquedas más cortas
+    recorren los textos ya preparados, sin conversiones por campo.
+
+    Las posiciones corresponden al orden de la lista indexada, de modo que los
+    resultados se devuelven en ese mismo orden.
+    """
+
+    FIELDS = (
+        "Cedula", "NombreConductor", "Placa", "Remolque", "GrupoProducto",
+        "Producto", "Proceso", "Cliente", "Origen", "Ejes", "Destino",
+        "Estado", "TipoEmbalaje",
+    )
+    FIELD_CACHE_SIZE = 50_000
+
+    def __init__(self, fields=None):
+        self.fields = fields or self.FIELDS
+        self._haystacks = []
+        self._postings = {}
+        self._field_trigrams = {}
+
+    def __len__(self):
+        return len(self._haystacks)
+
+    def build(self, items):
+        """Reconstruye el índice completo a partir de una lista de filas"""
+        self._haystacks = []
+        self._postings = {}
+        self._field_trigrams = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """Añade una fila al final del índice y devuelve su posición"""
+        position = len(self._haystacks)
+        haystack = self._haystack(item)
+        self._haystacks.append(haystack)
+        postings = self._postings
+        for trigram in self._row_trigrams(haystack):
+            bucket = postings.get(trigram)
+            if bucket is None:
+                postings[trigram] = {position}
+            else:
+                bucket.add(position)
+        return position
+
+    def update(self, position, item):
+        """Actualiza la fila en la posición indicada (por ejemplo, tras una edición)"""
+        old_haystack = self._haystacks[position]
+        new_haystack = self._haystack(item)
+        if old_haystack == new_haystack:
+            return
+        old_trigrams = self._row_trigrams(old_haystack)
+        new_trigrams = self._row_trigrams(new_haystack)
+        postings = self._postings
+        for trigram in old_trigrams - new_trigrams:
+            bucket = postings.get(trigram)
+            if bucket is not None:
+                bucket.discard(position)
+                if not bucket:
+                    del postings[trigram]
+        for trigram in new_trigrams - old_trigrams:
+            postings.setdefault(trigram, set()).add(position)
+        self._haystacks[position] = new_haystack
+
+    def search(self, text, candidates=None):
+        """
+        Busca el texto (ya en minúsculas) en cualquiera de los campos.
+
+        Args:
+            text: Texto a buscar
+            candidates: Posiciones opcionales a las que restringir la búsqueda
+
+        Returns:
+            Lista ordenada de posiciones que coinciden
+        """
+        haystacks = self._haystacks
+        if FIELD_SEPARATOR in text:
+            return []
+
+        if len(text) < 3:
+            if candidates is None:
+                return [i for i, h in enumerate(haystacks) if text in h]
+            return [i for i in candidates if text in haystacks[i]]
+
+        postings = self._postings
+        sets = []
+        for trigram in self._trigrams(text):
+            bucket = postings.get(trigram)
+            if not bucket:
+                return []
+            sets.append(bucket)
+        sets.sort(key=len)
+
+        matches = set(sets[0])
+        for bucket in sets[1:]:
+            matches &= bucket
+            if not matches:
+                return []
+        if candidates is not None:
+            matches.intersection_update(candidates)
+
+        return sorted(i for i in matches if text in haystacks[i])
+
+    def _haystack(self, item):
+        texts = []
+        for field in self.fields:
+            text = field_text(item.get(field))
+            if text is not None:
+                texts.append(text)
+        return FIELD_SEPARATOR.join(texts)
+
+    def _row_trigrams(self, haystack):
+        # Un texto de búsqueda nunca contiene el separador, así que basta con
+        # los trigramas de cada campo; los valores repetidos (Cliente,
+        # Producto, Estado...) se calculan una sola vez.
+        cache = self._field_trigrams
+        trigrams = set()
+        for text in haystack.split(FIELD_SEPARATOR):
+            field_trigrams = cache.get(text)
+            if field_trigrams is None:
+                field_trigrams = self._trigrams(text)
+                if len(cache) < self.FIELD_CACHE_SIZE:
+                    cache[text] = field_trigrams
+            trigrams |= field_trigrams
+        return trigrams
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _linear_search(items, search_text):
+    """Búsqueda lineal original de VehicleData.search_data, para comparar"""
+    search_text = search_text.lower()
+
+    def safe_search(value):
+        if value is None:
+            return False
+        if isinstance(value, (int, float)):
+            value_str = str(value)
+        elif isinstance(value, str):
+            value_str = value.lower()
+        else:
+            value_str = str(value).lower()
+        return search_text in value_str
+
+    result = []
+    for item in items:
+        if (safe_search(item['Cedula']) or
+            safe_search(item['NombreConductor']) or
+            safe_search(item['Placa']) or
+            safe_search(item['Remolque']) or
+            safe_search(item['GrupoProducto']) or
+            safe_search(item['Producto']) or
+            safe_search(item['Proceso']) or
+            safe_search(item['Cliente']) or
+            safe_search(item['Origen']) or
+            safe_search(item['Ejes']) or
+            safe_search(item['Destino']) or
+            safe_search(item['Estado'])or
+            safe_search(item['TipoEmbalaje'])):
+            result.append(item)
+    return result
+
+
+def _synthetic_rows(count, seed=7):
+    import random
+    rng = random.Random(seed)
+    nombres = ["JUAN", "CARLOS", "LUIS", "ANDRES", "JORGE", "MARIA", "PEDRO", "JOSE"]
+    apellidos = ["PEREZ", "GOMEZ", "RODRIGUEZ", "MARTINEZ", "LOPEZ", "DIAZ", "TORRES"]
+    clientes = ["ECOPETROL", "BRENNTAG", "QUIMPAC", "MONOMEROS", "PROPILCO", "ESENTTIA"]
+    productos = ["SODA CAUSTICA", "ACIDO SULFURICO", "GLP", "DIESEL", "ALCOHOL", "RESINA"]
+    procesos = ["Cargue", "Descargue", "Trasiego", "Repesaje"]
+    estados = ["Enturnado", "Anunciado", "Autorizado", "En inspeccion", "Transito entrando",
+               "En proceso", "Finalizado"]
+    rows = []
+    for i in range(count):
+        letras = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+        rows.append({
+            "ID": i,
+            "Cedula": float(rng.randint(1000000, 1999999999)),
+            "NombreConductor": f"{rng.choice(nombres)} {rng.choice(apellidos)} {rng.choice(apellidos)}",
+            "Placa": f"{letras}{rng.randint(100, 999)}",
+            "Remolque": f"R{rng.randint(10000, 99999)}",
+            "GrupoProducto": "QUIMICOS",
+            "Producto": rng.choice(productos),
+            "Proceso": rng.choice(procesos),
+            "Cliente": rng.choice(clientes),
+            "Origen": "CARTAGENA",
+            "Destino": rng.choice(["BOGOTA", "MEDELLIN", "CALI", "BARRANQUILLA"]),
+            "Estado": rng.choice(estados),
+            "Ejes": rng.choice(["2", "3", "3S2", "3S3"]),
+            "TipoEmbalaje": rng.choice(["Camión", "TractoCamión", "Furgón"]),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    # Benchmark: búsqueda lineal vs. índice de trigramas sobre filas sintéticas
+    queries = ["k", "ab", "abc", "perez", "brenntag", "3s2", "xqz999", "finalizado", "12345"]
+
+    for count in (10_000, 50_000, 100_000):
+        rows = _synthetic_rows(count)
+
+        start = time.perf_counter()
+        index = SearchIndex()
+        index.build(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"\n{count} filas - construcción del índice: {build_ms:.0f} ms")
+        print(f"{'búsqueda':>12} {'lineal ms':>10} {'índice ms':>10} {'filas':>7}")
+
+        for query in queries:
+            start = time.perf_counter()
+            expected = _linear_search(rows, query)
+            linear_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            found = [rows[i] for i in index.search(query.lower())]
+            index_ms = (time.perf_counter() - start) * 1000
+
+            assert found == expected, f"Resultados distintos para {query!r}"
+            print(f"{query:>12} {linear_ms:>10.2f} {index_ms:>10.3f} {len(found):>7}")
@@ -3,6 +3,126 @@ import serial
 import serial.tools.list_ports
 import threading
 import time
+from collections import deque
+
+
+class FrameAccumulator:
+    """
+    Reensambla tramas a partir de los bytes que llegan del puerto serie.
+
+    Los bytes llegan en trozos arbitrarios (una trama puede venir partida en
+    varias lecturas o varias tramas en una sola), así que se acumulan hasta
+    encontrar el terminador. Para cada trama se guarda el instante en que
+    llegó su primer byte, para medir la latencia hasta el callback.
+
+    Args:
+        terminator: 'line' (CR, LF o CRLF), 'cr', 'lf', 'crlf', 'stx_etx'
+                    (trama entre STX 0x02 y ETX 0x03) o bytes con un
+                    terminador propio
+        max_frame: Bytes máximos de una trama; si se superan sin encontrar el
+                   terminador, lo acumulado se descarta
+    """
+
+    STX = b"\x02"
+    ETX = b"\x03"
+    TERMINATORS = {
+        "cr": b"\r",
+        "lf": b"\n",
+        "crlf": b"\r\n",
+    }
+
+    def __init__(self, terminator="line", max_frame=256):
+        self.terminator = terminator
+        self.max_frame = max_frame
+        self._buffer = bytearray()
+        self._first_byte_at = None
+        self.discarded = 0
+
+    def reset(self):
+        self._buffer.clear()
+        self._first_byte_at = None
+
+    def feed(self, data, received_at=None):
+        """
+        Añade bytes recibidos.
+
+        Args:
+            data: Bytes leídos del puerto
+            received_at: Instante (time.perf_counter) de la lectura
+
+        Returns:
+            Lista de (trama sin terminador, instante del primer byte)
+        """
+        if not data:
+            return []
+        if received_at is None:
+            received_at = time.perf_counter()
+
+        if self.terminator == "stx_etx":
+            return self._feed_stx_etx(data, received_at)
+
+        if not self._buffer:
+            self._first_byte_at = received_at
+        self._buffer.extend(data)
+
+        frames = []
+        if self.terminator == "line":
+            # Cualquier CR o LF cierra la trama; las vacías (el LF de un CRLF) se ignoran
+            while True:
+                cr = self._buffer.find(b"\r")
+                lf = self._buffer.find(b"\n")
+                ends = [i for i in (cr, lf) if i >= 0]
+                if not ends:
+                    break
+                end = min(ends)
+                frame = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                if frame:
+                    frames.append((frame, self._first_byte_at))
+                self._first_byte_at = received_at
+        else:
+            terminator = self.TERMINATORS.get(self.terminator, self.terminator)
+            while True:
+                end = self._buffer.find(terminator)
+                if end < 0:
+                    break
+                frame = bytes(self._buffer[:end])
+                del self._buffer[:end + len(terminator)]
+                if frame:
+                    frames.append((frame, self._first_byte_at))
+                self._first_byte_at = received_at
+
+        self._check_overflow()
+        return frames
+
+    def _feed_stx_etx(self, data, received_at):
+        frames = []
+        for start in range(len(data)):
+            byte = data[start:start + 1]
+            if byte == self.STX:
+                # Un STX sin ETX previo abandona la trama incompleta
+                if self._buffer:
+                    self.discarded += 1
+                self._buffer = bytearray(self.STX)
+                self._first_byte_at = received_at
+            elif not self._buffer:
+                # Ruido fuera de una trama
+                continue
+            elif byte == self.ETX:
+                frame = bytes(self._buffer[1:])
+                self._buffer.clear()
+                if frame:
+                    frames.append((frame, self._first_byte_at))
+            else:
+                self._buffer.extend(byte)
+        self._check_overflow()
+        return frames
+
+    def _check_overflow(self):
+        if len(self._buffer) > self.max_frame:
+            self.discarded += 1
+            self.reset()
+
 
 class SerialManager:
     def __init__(self):
@@ -17,10 +137,29 @@ class SerialManager:
         self.stopbits = serial.STOPBITS_ONE if 'serial' in globals() else 1
         self.timeout = 1
         
+        # Terminador de trama de la báscula (ver FrameAccumulator)
+        self.terminator = "line"
+        
+        # Protocolo del indicador: intérprete de common.scale_protocols.PARSERS
+        self.protocol = "numero"
+        
         # Para manejar callbacks de datos
         self.data_callback = None
         self.read_thread = None
         self.reading_active = False
+        
+        # Grabación opcional de los bytes recibidos (ver common.serial_replay)
+        self.recorder = None
+        
+        # Latencia por trama: desde el primer byte hasta la llamada al callback
+        self._latencies = deque(maxlen=500)
+        self.frame_stats = {
+            "tramas": 0,
+            "tramas_descartadas": 0,
+            "errores_lectura": 0,
+            "latencia_ultima_ms": None,
+            "latencia_max_ms": None,
+        }
     
     def get_available_ports(self):
         """Devuelve una lista de puertos COM disponibles"""
@@ -52,6 +191,12 @@ class SerialManager:
     def stop_reading(self):
         """Detiene el hilo de lectura"""
         self.reading_active = False
+        # Despertar una lectura bloqueada (no todos los backends lo admiten)
+        if self.serial_connection is not None and hasattr(self.serial_connection, "cancel_read"):
+            try:
+                self.serial_connection.cancel_read()
+            except Exception:
+                pass
         if self.read_thread:
             # Esperar a que el hilo termine (con timeout)
             if self.read_thread.is_alive():
@@ -59,27 +204,90 @@ class SerialManager:
             self.read_thread = None
     
     def _read_loop(self):
-        """Bucle que se ejecuta en un hilo separado para leer datos"""
+        """
+        Bucle que se ejecuta en un hilo separado para leer datos.
+        
+        read() bloquea hasta que llega al menos un byte (o vence el timeout
+        del puerto), así que cada trama se entrega en cuanto llega su
+        terminador, sin esperas fijas entre consultas.
+        """
+        accumulator = FrameAccumulator(self.terminator)
+        backoff = 0.05
         while self.reading_active and self.is_connected:
             try:
-                if self.serial_connection.in_waiting > 0:
-                    # Hay datos disponibles para leer
-                    data = self.serial_connection.readline().decode('utf-8', errors='replace').strip()
-                    if data and self.data_callback:
+                if accumulator.terminator != self.terminator:
+                    # Se cambió el fin de trama desde la configuración
+                    accumulator = FrameAccumulator(self.terminator)
+                connection = self.serial_connection
+                data = connection.read(connection.in_waiting or 1)
+                if not data:
+                    continue
+                received_at = time.perf_counter()
+                # Lo que llegó junto con el primer byte
+                pending = connection.in_waiting
+                if pending:
+                    data += connection.read(pending)
+                if self.recorder is not None:
+                    self.recorder.record(data, received_at)
+                
+                for frame, first_byte_at in accumulator.feed(data, received_at):
+                    text = frame.decode('utf-8', errors='replace').strip()
+                    if text and self.data_callback:
+                        self._record_latency(first_byte_at)
                         # Llamar al callback con los datos recibidos
-                        self.data_callback(data)
-                else:
-                    # No hay datos, esperar un poco para no consumir CPU
-                    time.sleep(0.1)
+                        self.data_callback(text)
+                self.frame_stats["tramas_descartadas"] = accumulator.discarded
+                backoff = 0.05
             except Exception as e:
+                if not self.reading_active:
+                    break
+                self.frame_stats["errores_lectura"] += 1
                 print(f"Error reading from serial port: {e}")
-                time.sleep(1)  # Esperar un poco antes de intentar de nuevo
+                accumulator.reset()
+                # Reintentar pronto y espaciar los intentos si el error persiste
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 2.0)
+    
+    def start_recording(self, path):
+        """Grabar en `path` los bytes que lleguen, con su instante de llegada"""
+        from common.serial_replay import SerialRecorder
+        self.stop_recording()
+        self.recorder = SerialRecorder(path)
+        return self.recorder
+    
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+    
+    def _record_latency(self, first_byte_at):
+        latency_ms = (time.perf_counter() - first_byte_at) * 1000
+        self._latencies.append(latency_ms)
+        stats = self.frame_stats
+        stats["tramas"] += 1
+        stats["latencia_ultima_ms"] = round(latency_ms, 3)
+        if stats["latencia_max_ms"] is None or latency_ms > stats["latencia_max_ms"]:
+            stats["latencia_max_ms"] = round(latency_ms, 3)
+    
+    def get_frame_stats(self):
+        """Estadísticas de tramas y latencia (media y p95 de las últimas 500)"""
+        stats = dict(self.frame_stats)
+        latencies = sorted(self._latencies)
+        if latencies:
+            stats["latencia_media_ms"] = round(sum(latencies) / len(latencies), 3)
+            stats["latencia_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+        else:
+            stats["latencia_media_ms"] = None
+            stats["latencia_p95_ms"] = None
+        return stats
     
     def connect(self, port):
         """Conecta al puerto especificado"""
         try:
-            self.serial_connection = serial.Serial(
-                port=port,
+            # serial_for_url acepta nombres de puerto (COM3, /dev/ttyUSB0) y
+            # URLs de pyserial como loop:// para probar sin báscula
+            self.serial_connection = serial.serial_for_url(
+                port,
                 baudrate=self.baudrate,
                 bytesize=self.bytesize,
                 parity=self.parity,
@@ -103,6 +311,7 @@ class SerialManager:
         """Desconecta el puerto serial"""
         # Primero detener la lectura
         self.stop_reading()
+        self.stop_recording()
         
         # Luego cerrar la conexión
         if self.serial_connection and self.is_connected:
@@ -118,5 +327,7 @@ class SerialManager:
             "parity": self.parity,
             "stopbits": self.stopbits,
             "timeout": self.timeout,
+            "terminator": self.terminator,
+            "protocol": self.protocol,
             "is_connected": self.is_connected
         }
\ No newline at end of file
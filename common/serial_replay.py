@@ -0,0 +1,310 @@
+import os
+import struct
+import threading
+import time
+
+
+# Formato del archivo de grabación:
+#   cabecera: 'CMCR', versión (1 byte), instante de inicio (epoch, double)
+#   por cada lectura: microsegundos desde la anterior (uint32), largo (uint16), bytes
+MAGIC = b"CMCR"
+VERSION = 1
+_HEADER = struct.Struct("<4sBd")
+_CHUNK = struct.Struct("<IH")
+_MAX_CHUNK = 0xFFFF
+_MAX_DELTA_US = 0xFFFFFFFF
+
+
+class SerialRecorder:
+    """
+    Graba los bytes que llegan de un puerto serie con su instante de llegada.
+
+    Cada lectura ocupa 6 bytes de cabecera más sus datos, así que una sesión
+    de horas de una báscula cabe en pocos megabytes. Se usa desde el hilo de
+    lectura de SerialManager (ver SerialManager.start_recording).
+
+    Args:
+        path: Archivo donde se graba
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._last = None
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.bytes = 0
+
+    def record(self, data, received_at=None):
+        """
+        Grabar una lectura.
+
+        Args:
+            data: Bytes leídos
+            received_at: Instante de la lectura (time.perf_counter)
+        """
+        if received_at is None:
+            received_at = time.perf_counter()
+        with self._lock:
+            if self._file is None:
+                return
+            delta = 0 if self._last is None else int((received_at - self._last) * 1_000_000)
+            self._last = received_at
+            delta = max(0, min(delta, _MAX_DELTA_US))
+            try:
+                for start in range(0, len(data), _MAX_CHUNK):
+                    chunk = data[start:start + _MAX_CHUNK]
+                    self._file.write(_CHUNK.pack(delta, len(chunk)))
+                    self._file.write(chunk)
+                    delta = 0
+                    self.chunks += 1
+                self.bytes += len(data)
+            except OSError as e:
+                print(f"Error al grabar la lectura serial: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path):
+    """
+    Leer una grabación.
+
+    Returns:
+        Generador de (segundos desde el inicio, bytes)
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} no es una grabación serial")
+        magic, version, _ = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} no es una grabación serial (versión {version})")
+
+        elapsed_us = 0
+        while True:
+            head = f.read(_CHUNK.size)
+            if len(head) < _CHUNK.size:
+                break
+            delta, length = _CHUNK.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            elapsed_us += delta
+            yield elapsed_us / 1_000_000, data
+
+
+class SerialReplayer:
+    """
+    Reproduce una grabación escribiendo sus bytes en un puerto.
+
+    Args:
+        path: Grabación de SerialRecorder
+        write: Función (bytes) que entrega los datos (os.write sobre el
+               maestro de una pty, Serial.write, ...)
+        speed: 1.0 para el ritmo original, 2.0 el doble de rápido...; 0 sin esperas
+    """
+
+    def __init__(self, path, write, speed=1.0):
+        self.path = path
+        self.write = write
+        self.speed = speed
+        self.chunks = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def play(self):
+        """Reproducir la grabación completa en el hilo actual"""
+        started = time.perf_counter()
+        for offset, data in read_recording(self.path):
+            if self._stop.is_set():
+                break
+            if self.speed > 0:
+                remaining = offset / self.speed - (time.perf_counter() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+            self.write(data)
+            self.chunks += 1
+
+    def start(self):
+        """Reproducir en segundo plano"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.play, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def open_virtual_port():
+    """
+    Crear un puerto virtual (pty, sólo POSIX).
+
+    Returns:
+        (función write para el lado maestro, nombre del puerto esclavo)
+    """
+    master, slave = os.openpty()
+    return (lambda data: os.write(master, data)), os.ttyname(slave)
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentiles (en las mismas unidades que values) de una lista"""
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{p}": None for p in points}
+    return {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+
+
+def write_synthetic_recording(path, seconds=10, rate_hz=20, protocol="continuo_estado"):
+    """Grabación sintética: un vehículo que sube, se estabiliza y baja"""
+    import random
+    rng = random.Random(11)
+    with SerialRecorder(path) as recorder:
+        at = 0.0
+        for i in range(int(seconds * rate_hz)):
+            progress = i / (seconds * rate_hz)
+            weight = 32000 if 0.2 < progress < 0.8 else int(32000 * min(progress, 1 - progress) * 5)
+            weight += rng.randint(-3, 3)
+            if protocol == "continuo_estado":
+                frame = f"{'ST' if 0.3 < progress < 0.8 else 'US'},GS,+{weight:07d}kg\r\n"
+            else:
+                frame = f"{weight}\r\n"
+            recorder.record(frame.encode(), at)
+            at += 1 / rate_hz
+
+
+def benchmark_bascula_view(path, speed=1.0, protocol="continuo_estado"):
+    """
+    Latencia de punta a punta de BasculaView reproduciendo una grabación.
+
+    Para cada lectura que llega a la tarjeta de peso se mide:
+      lectura: primer byte en el puerto -> callback de SerialManager
+      proceso: callback -> show_reading (intérprete, detector, bus y limitador)
+      ui: show_reading -> tarjeta actualizada y page.update()
+    El limitador de BasculaView descarta a propósito las lecturas intermedias,
+    así que sólo se miden las que se muestran.
+
+    Returns:
+        dict con p50/p95/p99 en ms de cada tramo y del total
+    """
+    from views.bascula_view import BasculaView
+
+    class HeadlessPage:
+        # Página mínima para construir la vista sin abrir una ventana
+        def __init__(self):
+            self.overlay = []
+            self.controls = []
+            self.width = 1280
+            self.height = 800
+            self.snack_bar = None
+
+        def update(self, *controls):
+            pass
+
+    view = BasculaView(HeadlessPage(), "#8c4191", "#4df0dd")
+    manager = view.serial_manager
+    manager.protocol = protocol
+    arrived = {}
+    samples = []
+
+    on_frame = view.scale.on_frame
+
+    def timed_frame(data):
+        now = time.perf_counter()
+        first_byte = now - (manager.frame_stats["latencia_ultima_ms"] or 0) / 1000
+        arrived[id(data)] = (data, first_byte, now)
+        on_frame(data)
+
+    show_reading = view.show_reading
+
+    def timed_show(frame):
+        started = time.perf_counter()
+        show_reading(frame)
+        shown = time.perf_counter()
+        entry = arrived.pop(id(frame[0]), None)
+        if entry is not None:
+            _, first_byte, callback = entry
+            samples.append((callback - first_byte, started - callback, shown - started, shown - first_byte))
+        # Las lecturas descartadas por el limitador no llegan aquí
+        if len(arrived) > 1000:
+            arrived.clear()
+
+    manager.set_data_callback(timed_frame)
+    view.display_throttle.on_flush = timed_show
+
+    write, port = open_virtual_port()
+    if not manager.connect(port):
+        raise RuntimeError(f"No se pudo abrir el puerto virtual {port}")
+    replayer = SerialReplayer(path, write, speed)
+    replayer.play()
+    time.sleep(0.5)
+    manager.disconnect()
+
+    results = {"lecturas": replayer.chunks, "mostradas": len(samples)}
+    for index, name in enumerate(("lectura", "proceso", "ui", "total")):
+        results[name] = {
+            key: round(value * 1000, 3) if value is not None else None
+            for key, value in percentiles([s[index] for s in samples]).items()
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # python -m common.serial_replay record PUERTO ARCHIVO [segundos]
+    # python -m common.serial_replay replay ARCHIVO [velocidad]   (a una pty)
+    # python -m common.serial_replay bench [ARCHIVO] [velocidad]
+    import sys
+
+    from common.serial_manager import SerialManager
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "bench"
+
+    if command == "record":
+        port, path = sys.argv[2], sys.argv[3]
+        seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 60
+        manager = SerialManager()
+        manager.set_data_callback(lambda text: None)
+        if not manager.connect(port):
+            sys.exit(1)
+        recorder = manager.start_recording(path)
+        time.sleep(seconds)
+        manager.disconnect()
+        print(f"{recorder.chunks} lecturas, {recorder.bytes} bytes grabados en {path}")
+
+    elif command == "replay":
+        path = sys.argv[2]
+        speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        write, port = open_virtual_port()
+        print(f"Conecte la aplicación a {port}; reproduciendo {path} a x{speed}")
+        time.sleep(5)
+        replayer = SerialReplayer(path, write, speed)
+        replayer.play()
+        print(f"{replayer.chunks} lecturas reproducidas")
+
+    else:
+        if len(sys.argv) > 2:
+            path = sys.argv[2]
+        else:
+            path = "bascula_sintetica.cmcr"
+            write_synthetic_recording(path)
+        speed = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        results = benchmark_bascula_view(path, speed)
+        print(f"{results['lecturas']} lecturas reproducidas, {results['mostradas']} mostradas")
+        for name in ("lectura", "proceso", "ui", "total"):
+            values = results[name]
+            print(f"{name:8s} p50={values['p50']} ms  p95={values['p95']} ms  p99={values['p99']} ms")
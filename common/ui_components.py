@@ -14,6 +14,17 @@ class UIComponents:
         self.color_secundario = "#f1ffff"
         self.fecha_button = None  # Referencia al botón de fecha
         self.on_edit_click = None  # Callback para el evento de edición
+        
+        # Filas ya construidas por tabla, por ID de vehículo, para reutilizarlas
+        self._row_cache = {}
+        # Instrumentación del último render de update_data_table
+        self.render_stats = {}
+        self.render_totals = {
+            'renders': 0,
+            'controles_creados': 0,
+            'celdas_actualizadas': 0,
+            'bytes_estimados': 0,
+        }
     
     def set_edit_callback(self, callback):
         self.on_edit_click = callback
@@ -79,67 +90,162 @@ class UIComponents:
             data_row_max_height=35,
         )
     
+    # Controles que crea cada fila nueva: DataRow, 9 DataCell, 8 Text, Container e IconButton
+    CONTROLES_POR_FILA = 20
+    # Máximo de filas guardadas por tabla para reutilizar
+    MAX_FILAS_CACHE = 400
+    
+    def get_estado_text_color(self, estado):
+        return (
+            ft.Colors.GREEN_600 if estado in ["Transito entrando"]
+            else ft.Colors.RED_700 if estado == "En inspeccion"
+            else ft.Colors.YELLOW_900 if estado == "Autorizado"
+            else ft.Colors.BLACK87 if estado in ["En proceso", "Autorizado"]
+            else ft.Colors.WHITE
+        )
+    
+    def _row_values(self, item, row_number):
+        """Valores visibles de una fila, en el orden de las columnas"""
+        return (
+            str(row_number),
+            item['NombreConductor'],
+            item['Placa'],
+            item['Producto'],
+            item['Ejes'],
+            item['Proceso'],
+            item['Cliente'],
+            item['Estado'],
+        )
+    
+    def _create_row(self, item, values):
+        estado = values[7]
+        
+        # Obtener el ID del vehículo
+        vehicle_id = item['ID']
+        
+        edit_button = ft.IconButton(
+            icon=ft.Icons.EDIT_NOTE,  # Icono de edición de notas, más sutil
+            icon_color=self.color_principal,
+            tooltip="Editar vehículo.",
+            icon_size=20,  # Tamaño más pequeño
+            on_click=lambda e, id=vehicle_id: self.on_edit_click(id) if self.on_edit_click else None
+        )
+        
+        return ft.DataRow(
+            cells=[
+                # Celda de numeración
+                ft.DataCell(ft.Text(values[0], size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.DEEP_PURPLE_900)),
+                ft.DataCell(ft.Text(values[1], size=11)),
+                ft.DataCell(ft.Text(values[2], size=12, weight=ft.FontWeight.BOLD, color=self.color_principal)),
+                ft.DataCell(ft.Text(values[3], size=11)),
+                ft.DataCell(ft.Text(values[4], size=11)),
+                ft.DataCell(ft.Text(values[5], size=11)),
+                ft.DataCell(ft.Text(values[6], size=11)),
+                ft.DataCell(
+                    ft.Container(
+                        content=ft.Text(estado,
+                            weight=ft.FontWeight.BOLD,
+                            color=self.get_estado_text_color(estado),
+                        size=11),
+                        bgcolor=self.get_estado_color(estado),
+                        border_radius=6,
+                        padding=1,
+                        height=25,
+                        width=120,
+                        alignment=ft.alignment.center
+                    )
+                ),
+                ft.DataCell(edit_button),
+            ]
+        )
+    
+    def _patch_row(self, row, old_values, values):
+        """
+        Actualizar sólo las celdas cuyo valor cambió.
+        
+        Returns:
+            (celdas actualizadas, bytes estimados del cambio)
+        """
+        changed = 0
+        size = 0
+        for column, (old, new) in enumerate(zip(old_values, values)):
+            if old == new:
+                continue
+            changed += 1
+            if column == 7:
+                # Estado: texto, color del texto y color de fondo
+                container = row.cells[7].content
+                container.content.value = new
+                container.content.color = self.get_estado_text_color(new)
+                container.bgcolor = self.get_estado_color(new)
+                size += self._estimate_bytes(new) + self._estimate_bytes(container.content.color) + self._estimate_bytes(container.bgcolor)
+            else:
+                row.cells[column].content.value = new
+                size += self._estimate_bytes(new)
+        return changed, size
+    
+    @staticmethod
+    def _estimate_bytes(value):
+        # Valor más la envoltura aproximada del mensaje (id del control y nombre del atributo)
+        return len(str(value).encode('utf-8')) + 24
+    
     def update_data_table(self, data_table, data, start_index=1):
-        # Limpiar la tabla actual
-        data_table.rows.clear()
+        """
+        Mostrar en la tabla las filas indicadas.
         
-        # Agregar las filas con los datos
+        Las filas se identifican por el ID del vehículo: si una fila ya existe
+        se reutiliza y sólo se modifican las celdas que cambiaron, de modo que
+        Flet envía al cliente únicamente esas propiedades (y los movimientos de
+        filas) en lugar de la tabla completa.
+        """
+        cache = self._row_cache.setdefault(id(data_table), {})
+        stats = {
+            'filas': 0,
+            'filas_reutilizadas': 0,
+            'controles_creados': 0,
+            'celdas_actualizadas': 0,
+            'bytes_estimados': 0,
+        }
+        
+        rows = []
         for i, item in enumerate(data):
             # Calcular el número de fila teniendo en cuenta la paginación
             row_number = start_index + i
+            values = self._row_values(item, row_number)
             
-            estado = item['Estado']
-            color_estado = self.get_estado_color(estado)
-            
-            # Obtener el ID del vehículo
-            vehicle_id = item['ID']
+            entry = cache.pop(item['ID'], None)
+            if entry is None:
+                row = self._create_row(item, values)
+                stats['controles_creados'] += self.CONTROLES_POR_FILA
+                stats['bytes_estimados'] += sum(self._estimate_bytes(value) for value in values) + 40 * self.CONTROLES_POR_FILA
+            else:
+                row, old_values = entry
+                changed, size = self._patch_row(row, old_values, values)
+                stats['filas_reutilizadas'] += 1
+                stats['celdas_actualizadas'] += changed
+                stats['bytes_estimados'] += size
             
-            edit_button = ft.IconButton(
-                icon=ft.Icons.EDIT_NOTE,  # Icono de edición de notas, más sutil
-                icon_color=self.color_principal,
-                tooltip="Editar vehículo.",
-                icon_size=20,  # Tamaño más pequeño
-                on_click=lambda e, id=vehicle_id: self.on_edit_click(id) if self.on_edit_click else None
-            )
-            
-            data_table.rows.append(
-                ft.DataRow(
-                    cells=[
-                        # Celda de numeración
-                        ft.DataCell(ft.Text(str(row_number), size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.DEEP_PURPLE_900)),
-                        ft.DataCell(ft.Text(item['NombreConductor'], size=11)),
-                        ft.DataCell(ft.Text(item['Placa'], size=12, weight=ft.FontWeight.BOLD, color=self.color_principal)),
-                        ft.DataCell(ft.Text(item['Producto'], size=11)),
-                        ft.DataCell(ft.Text(item['Ejes'], size=11)),
-                        ft.DataCell(ft.Text(item['Proceso'], size=11)),
-                        ft.DataCell(ft.Text(item['Cliente'], size=11)),
-                        ft.DataCell(
-                            ft.Container(
-                                content=ft.Text(estado,
-                                    weight=ft.FontWeight.BOLD,
-                                    color = (
-                                        ft.Colors.GREEN_600 if estado in ["Transito entrando"]
-                                        else ft.Colors.RED_700 if estado == "En inspeccion"
-                                        else ft.Colors.YELLOW_900 if estado == "Autorizado"
-                                        else ft.Colors.BLACK87 if estado in ["En proceso", "Autorizado"]
-                                        else ft.Colors.WHITE
-                                    ),
-                                size=11),
-                                bgcolor=color_estado,
-                                border_radius=6,
-                                padding=1,
-                                height=25,
-                                width=120,
-                                alignment=ft.alignment.center
-                            )
-                        ),
-                        ft.DataCell(edit_button),
-                    ]
-                )
-            )
+            # Reinsertar al final: el orden del diccionario queda de menos a más reciente
+            cache[item['ID']] = (row, values)
+            rows.append(row)
+        
+        # Descartar las filas más antiguas si la caché crece demasiado
+        while len(cache) > self.MAX_FILAS_CACHE:
+            del cache[next(iter(cache))]
+        
+        stats['filas'] = len(rows)
+        if len(rows) != len(data_table.rows) or any(a is not b for a, b in zip(rows, data_table.rows)):
+            data_table.rows = rows
+        
+        self.render_stats = stats
+        self.render_totals['renders'] += 1
+        for key in ('controles_creados', 'celdas_actualizadas', 'bytes_estimados'):
+            self.render_totals[key] += stats[key]
+        
         self.page.update()
 
-    def create_navigation_rail(self, on_date_change, fecha_seleccionada, on_navigation_change=None):
+    def create_navigation_rail(self, on_date_change, fecha_seleccionada, on_navigation_change=None,
+                               on_range_change=None):
         # Crear el botón de fecha
         self.fecha_button = ft.ElevatedButton(
             text=f"{fecha_seleccionada.strftime('%d/%m/%Y')}",
@@ -150,6 +256,22 @@ class UIComponents:
             ),
         )
         
+        # Rango de folios que se carga, terminando en la fecha seleccionada
+        self.rango_dropdown = ft.Dropdown(
+            options=[
+                ft.dropdown.Option("dia", "Día"),
+                ft.dropdown.Option("semana", "Últimos 7 días"),
+                ft.dropdown.Option("mes", "Últimos 30 días"),
+            ],
+            value="dia",
+            dense=True,
+            width=180,
+            text_size=13,
+            color=self.color_secundario,
+            border_color=self.color_secundario,
+            on_change=on_range_change,
+        )
+        
         # Crear el menú de navegación
         nav_rail = ft.NavigationRail(
             selected_index=0,
@@ -172,6 +294,10 @@ class UIComponents:
                         content=self.fecha_button,
                         padding=ft.padding.only(top=10),
                     ),
+                    ft.Container(
+                        content=self.rango_dropdown,
+                        padding=ft.padding.only(top=5),
+                    ),
                 ]),
                 padding=ft.padding.only(top=5, bottom=20 ,left=10, right=10),
                 alignment=ft.alignment.center,
@@ -222,9 +348,12 @@ class UIComponents:
         
         return nav_rail
     
-    def update_date_button(self, fecha):
+    def update_date_button(self, fecha, fecha_desde=None):
         if self.fecha_button:
-            self.fecha_button.text = f"{fecha.strftime('%d/%m/%Y')}"
+            if fecha_desde is not None and fecha_desde.date() != fecha.date():
+                self.fecha_button.text = f"{fecha_desde.strftime('%d/%m')} - {fecha.strftime('%d/%m/%Y')}"
+            else:
+                self.fecha_button.text = f"{fecha.strftime('%d/%m/%Y')}"
             self.page.update()
     
     def show_date_picker(self, e, on_date_change, fecha_actual):
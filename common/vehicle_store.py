@@ -0,0 +1,288 @@
+from operator import attrgetter
+
+from common.row_mapper import mapper_for_rows
+
+
+class StringDictionary:
+    """
+    Codificación por diccionario de valores repetidos.
+
+    share() devuelve siempre el mismo objeto para valores iguales, así que
+    las filas comparten un texto en lugar de tener cada una su copia (pyodbc
+    crea un str nuevo por celda). encode() asigna además un código entero
+    (0 es None) para filtrar y contar sin comparar textos.
+    """
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: 0}
+        self.shared = {}  # valor -> objeto compartido
+
+    def __len__(self):
+        return len(self.shared)
+
+    def encode(self, value):
+        """Código del valor, agregándolo si es nuevo"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(self.shared.setdefault(value, value))
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def share(self, value):
+        """Objeto compartido igual a value (el que se guarda en las filas)"""
+        return self.shared.setdefault(value, value)
+
+
+class VehicleRecord:
+    """
+    Vehículo de la tabla (una fila de BDEnturne) con __slots__.
+
+    Ocupa una fracción de un diccionario de 14 claves y se usa igual que
+    éste en las vistas: record['Placa'], record.get('Origen'),
+    record.update(otro). estado_code es el código de Estado en el
+    diccionario de VehicleStore; los filtros y conteos usan ese entero.
+    """
+
+    FIELDS = (
+        "ID", "Cedula", "NombreConductor", "Placa", "Remolque", "GrupoProducto",
+        "Producto", "Proceso", "Cliente", "Origen", "Destino", "Estado", "Ejes",
+        "TipoEmbalaje",
+    )
+
+    __slots__ = FIELDS + ("estado_code",)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.FIELDS]
+
+    def as_tuple(self):
+        """Valores en el orden de FIELDS (el de las consultas de resumen)"""
+        return _field_values(self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def update(self, other):
+        """Copiar los valores de otro VehicleRecord del mismo VehicleStore"""
+        for field in self.__slots__:
+            setattr(self, field, getattr(other, field))
+
+    def __repr__(self):
+        return f"VehicleRecord({self.to_dict()!r})"
+
+
+_field_values = attrgetter(*VehicleRecord.FIELDS)
+_FIELD_POSITIONS = tuple(range(len(VehicleRecord.FIELDS)))
+
+
+class VehicleStore:
+    """
+    Construye los VehicleRecord de VehicleData.
+
+    Los campos con pocos valores distintos (estado, cliente, producto...)
+    pasan por un StringDictionary por campo, así que miles de filas
+    comparten unos pocos textos. Los diccionarios se conservan entre folios:
+    un código no cambia mientras la aplicación esté abierta.
+    """
+
+    ENCODED_FIELDS = (
+        "GrupoProducto", "Producto", "Proceso", "Cliente", "Origen", "Destino",
+        "Estado", "Ejes", "TipoEmbalaje",
+    )
+
+    def __init__(self):
+        self.dictionaries = {field: StringDictionary() for field in self.ENCODED_FIELDS}
+        self.estados = self.dictionaries["Estado"]
+        self._share = {field: dictionary.shared.setdefault for field, dictionary in self.dictionaries.items()}
+
+    def build(self, row):
+        """VehicleRecord a partir de una fila de la consulta de resumen"""
+        return self.build_many((row,))[0]
+
+    def build_many(self, rows):
+        """
+        VehicleRecord de todas las filas de una consulta de resumen.
+
+        Es la parte caliente de la carga de un folio: las posiciones de las
+        columnas (RowMapper) y los métodos de los diccionarios se resuelven
+        una vez y no en cada fila. Si la consulta trae exactamente FIELDS en
+        ese orden (la de resumen y la réplica) las filas se desempaquetan
+        directamente, sin pasar por el mapeador.
+        """
+        share = self._share
+        grupo, producto, proceso, cliente = (
+            share["GrupoProducto"], share["Producto"], share["Proceso"], share["Cliente"]
+        )
+        origen, destino, ejes, embalaje = (
+            share["Origen"], share["Destino"], share["Ejes"], share["TipoEmbalaje"]
+        )
+        estado_code = self.estados._codes.get
+        encode_estado = self.estados.encode
+        estados = self.estados.values
+
+        mapper = mapper_for_rows(rows, VehicleRecord.FIELDS)
+        if mapper is None:
+            return []
+        if mapper.positions != _FIELD_POSITIONS or len(mapper.columns) != len(_FIELD_POSITIONS):
+            rows = map(mapper.values, rows)
+
+        new = VehicleRecord
+        records = []
+        append = records.append
+        # Asignaciones escritas una por una: es bastante más rápido que un
+        # bucle con setattr o un __init__ con 15 argumentos
+        for (vehicle_id, cedula, conductor, placa, remolque, grupo_v, producto_v, proceso_v,
+             cliente_v, origen_v, destino_v, estado_v, ejes_v, embalaje_v) in rows:
+            record = new()
+            record.ID = vehicle_id
+            record.Cedula = cedula
+            record.NombreConductor = conductor
+            record.Placa = placa
+            record.Remolque = remolque
+            # dict.setdefault(v, v) devuelve el objeto ya guardado si existe
+            record.GrupoProducto = grupo(grupo_v, grupo_v)
+            record.Producto = producto(producto_v, producto_v)
+            record.Proceso = proceso(proceso_v, proceso_v)
+            record.Cliente = cliente(cliente_v, cliente_v)
+            record.Origen = origen(origen_v, origen_v)
+            record.Destino = destino(destino_v, destino_v)
+            code = estado_code(estado_v)
+            if code is None:
+                code = encode_estado(estado_v)
+            record.estado_code = code
+            record.Estado = estados[code]
+            record.Ejes = ejes(ejes_v, ejes_v)
+            record.TipoEmbalaje = embalaje(embalaje_v, embalaje_v)
+            append(record)
+        return records
+
+    def build_from_dict(self, vehicle):
+        """VehicleRecord a partir de un diccionario (p. ej. de get_vehicle_by_id)"""
+        record = VehicleRecord()
+        for field in ("ID", "Cedula", "NombreConductor", "Placa", "Remolque"):
+            setattr(record, field, vehicle.get(field))
+        for field, dictionary in self.dictionaries.items():
+            setattr(record, field, dictionary.share(vehicle.get(field)))
+        record.estado_code = self.estados.encode(record.Estado)
+        return record
+
+    def count_by_estado(self, records):
+        """Conteo por código de estado: lista indexada por estado_code"""
+        counts = [0] * len(self.estados.values)
+        for record in records:
+            counts[record.estado_code] += 1
+        return counts
+
+    def get_stats(self):
+        return {field: len(dictionary) for field, dictionary in self.dictionaries.items()}
+
+
+if __name__ == "__main__":
+    # Un año sintético de folios: memoria por fila y tiempo de carga con
+    # diccionarios por fila (como antes) y con VehicleStore
+    import random
+    import time
+    import tracemalloc
+    from collections import namedtuple
+
+    Row = namedtuple("Row", VehicleRecord.FIELDS)
+    rng = random.Random(7)
+    estados = ["Enturnado", "No enturnado", "Anunciado", "Autorizado", "En inspeccion",
+               "Revision documental", "Transito entrando", "Ingresó", "En proceso", "Finalizado"]
+    clientes = [f"CLIENTE {i:03d} S.A.S." for i in range(60)]
+    productos = [f"PRODUCTO QUIMICO {i:02d}" for i in range(40)]
+    procesos = ["Importación", "Exportación", "Cabotaje", "Traslado"]
+    lugares = [f"CIUDAD {i:02d}" for i in range(30)]
+
+    def fresh(text):
+        # pyodbc crea un str nuevo por celda; se imita con una copia
+        return (text + " ")[:-1]
+
+    rows = []
+    for folio in range(365):
+        for i in range(rng.randint(120, 200)):
+            rows.append(Row(
+                len(rows) + 1, float(rng.randint(10_000_000, 99_999_999)), fresh(f"CONDUCTOR {rng.randint(0, 5000)}"),
+                fresh(f"ABC{rng.randint(100, 999)}"), fresh(f"R{rng.randint(10000, 99999)}"), fresh("GRANELES"),
+                fresh(rng.choice(productos)), fresh(rng.choice(procesos)), fresh(rng.choice(clientes)),
+                fresh(rng.choice(lugares)), fresh(rng.choice(lugares)), fresh(rng.choice(estados)),
+                fresh(str(rng.choice((2, 3, 5, 6)))), fresh(rng.choice(("Granel", "Isotanque", "Flexitanque"))),
+            ))
+
+    def build_dicts(source):
+        # Lo que hacía VehicleData: un diccionario y la tupla de la fila
+        # (firma para la recarga incremental) por vehículo
+        items = []
+        signatures = {}
+        for row in source:
+            item = {
+                "ID": row.ID, "Cedula": row.Cedula, "NombreConductor": row.NombreConductor,
+                "Placa": row.Placa, "Remolque": row.Remolque, "GrupoProducto": row.GrupoProducto,
+                "Producto": row.Producto, "Proceso": row.Proceso, "Cliente": row.Cliente,
+                "Origen": getattr(row, 'Origen', None), "Destino": getattr(row, 'Destino', None),
+                "Estado": row.Estado, "Ejes": getattr(row, 'Ejes', None),
+                "TipoEmbalaje": getattr(row, 'TipoEmbalaje', None),
+            }
+            items.append(item)
+            signatures[item["ID"]] = tuple(row)
+        return items, signatures
+
+    def copy_rows():
+        # Filas de una consulta nueva: textos sin compartir, como los de pyodbc
+        return [Row(*(fresh(v) if isinstance(v, str) else v for v in row)) for row in rows]
+
+    def measure(name, build):
+        elapsed = None
+        for _ in range(3):
+            source = copy_rows()
+            started = time.perf_counter()
+            build(source)
+            run = time.perf_counter() - started
+            elapsed = run if elapsed is None else min(elapsed, run)
+
+        # Memoria que queda retenida (incluidos los textos) una vez
+        # liberadas las filas de la consulta
+        tracemalloc.start()
+        source = copy_rows()
+        built = build(source)
+        del source
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{name:14s} {len(rows)} filas en {elapsed * 1000:6.0f} ms, "
+              f"{retained / len(rows):6.0f} bytes por fila")
+        return built
+
+    dicts, _ = measure("diccionarios", build_dicts)
+    store = VehicleStore()
+    records = measure("VehicleStore", store.build_many)
+
+    started = time.perf_counter()
+    by_text = {}
+    for item in dicts:
+        by_text[item["Estado"]] = by_text.get(item["Estado"], 0) + 1
+    text_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    by_code = store.count_by_estado(records)
+    code_elapsed = time.perf_counter() - started
+    assert {store.estados.decode(c): n for c, n in enumerate(by_code) if n} == by_text
+    print(f"conteo por estado: texto {text_elapsed * 1000:.1f} ms, código {code_elapsed * 1000:.1f} ms")
+    print(f"valores distintos por campo: {store.get_stats()}")
@@ -0,0 +1,209 @@
+import flet as ft
+
+
+class VirtualTable:
+    """
+    Tabla virtualizada para folios grandes.
+
+    Sólo se construyen las filas visibles más un margen (overscan) arriba y
+    abajo. Dos espaciadores ocupan la altura de las filas que no están
+    materializadas, así que la barra de desplazamiento corresponde al total de
+    filas. Al desplazarse, las mismas filas se reasignan a otros datos en lugar
+    de crear controles nuevos: la memoria y el número de controles son
+    constantes sin importar el tamaño del folio.
+
+    Los datos pueden ser una lista o cualquier secuencia con len() y rebanadas
+    (RowView, filas paginadas desde la base de datos...), de la que sólo se
+    piden las filas de la ventana visible.
+    """
+
+    # (título, ancho fijo o None para expandir, factor de expansión)
+    COLUMNS = [
+        ("#", 45, None),
+        ("CONDUCTOR", None, 3),
+        ("PLACA", 90, None),
+        ("PRODUCTO", None, 2),
+        ("EJES", 50, None),
+        ("PROCESO", None, 1),
+        ("CLIENTE", None, 2),
+        ("ESTADO", 125, None),
+        ("", 45, None),
+    ]
+
+    def __init__(self, page, ui_components, on_edit_click=None, row_height=32,
+                 viewport_height=690, overscan=10):
+        self.page = page
+        self.ui_components = ui_components
+        self.color_principal = ui_components.color_principal
+        self.on_edit_click = on_edit_click
+        self.row_height = row_height
+        self.viewport_height = viewport_height
+        self.overscan = overscan
+
+        self.data = []
+        self.window_start = 0
+
+        self.top_spacer = ft.Container(height=0)
+        self.bottom_spacer = ft.Container(height=0)
+        # Cada fila reutilizable: (contenedor, textos, celda de estado, texto de estado)
+        self.slots = [self._create_row() for _ in range(self._window_size())]
+        self.rows = [slot[0] for slot in self.slots]
+
+        self.list_view = ft.ListView(
+            controls=[self.top_spacer, *self.rows, self.bottom_spacer],
+            expand=True,
+            spacing=0,
+            on_scroll=self.on_scroll,
+            on_scroll_interval=30,
+        )
+        self.view = ft.Column(
+            [self._create_header(), self.list_view],
+            spacing=0,
+            expand=True,
+        )
+
+    def get_view(self):
+        return self.view
+
+    def set_data(self, data, reset=True):
+        """
+        Mostrar otra secuencia de filas.
+
+        Args:
+            data: Filas a mostrar
+            reset: True para volver al inicio (otro filtro u otro folio);
+                   False para conservar el desplazamiento, por ejemplo tras
+                   una recarga de la réplica, una edición o una búsqueda
+        """
+        self.data = data
+        if reset:
+            self.window_start = 0
+        else:
+            self.window_start = min(self.window_start, max(0, len(data) - len(self.rows)))
+        self._render()
+        if reset:
+            self.list_view.scroll_to(offset=0, duration=0)
+        self.page.update()
+
+    def refresh(self):
+        """Volver a pintar la ventana actual (por ejemplo, tras editar una fila)"""
+        self._render()
+        self.page.update()
+
+    def on_scroll(self, e):
+        if e.viewport_dimension:
+            self.viewport_height = e.viewport_dimension
+            self._ensure_capacity()
+
+        first_visible = int((e.pixels or 0) // self.row_height)
+        visible = int(self.viewport_height // self.row_height) + 1
+
+        # Mover la ventana sólo cuando lo visible se acerca a sus bordes
+        window_end = self.window_start + len(self.rows)
+        if (first_visible < self.window_start + self.overscan // 2 and self.window_start > 0) or \
+                first_visible + visible > window_end - self.overscan // 2:
+            new_start = max(0, first_visible - self.overscan)
+            new_start = min(new_start, max(0, len(self.data) - len(self.rows)))
+            if new_start != self.window_start:
+                self.window_start = new_start
+                self._render()
+                self.page.update()
+
+    def _window_size(self):
+        return int(self.viewport_height // self.row_height) + 1 + 2 * self.overscan
+
+    def _ensure_capacity(self):
+        missing = self._window_size() - len(self.rows)
+        if missing <= 0:
+            return
+        new_slots = [self._create_row() for _ in range(missing)]
+        self.slots.extend(new_slots)
+        self.rows.extend(slot[0] for slot in new_slots)
+        self.list_view.controls = [self.top_spacer, *self.rows, self.bottom_spacer]
+        self._render()
+
+    def _render(self):
+        total = len(self.data)
+        start = self.window_start
+        items = self.data[start:start + len(self.rows)]
+
+        self.top_spacer.height = start * self.row_height
+        self.bottom_spacer.height = max(0, total - start - len(items)) * self.row_height
+
+        for offset, slot in enumerate(self.slots):
+            if offset < len(items):
+                self._bind_row(slot, items[offset], start + offset + 1)
+            elif slot[0].visible:
+                slot[0].visible = False
+
+    def _create_header(self):
+        cells = []
+        for title, width, expand in self.COLUMNS:
+            cells.append(ft.Container(
+                content=ft.Text(title, size=13, weight=ft.FontWeight.BOLD, color=self.color_principal),
+                width=width,
+                expand=expand,
+            ))
+        return ft.Container(
+            content=ft.Row(cells, spacing=6),
+            height=30,
+            bgcolor=ft.Colors.BLUE_GREY_50,
+            border=ft.border.all(1, ft.Colors.GREY_200),
+            padding=ft.padding.only(left=6, right=6),
+        )
+
+    def _create_row(self):
+        texts = [
+            ft.Text("", size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.DEEP_PURPLE_900),
+            ft.Text("", size=11, no_wrap=True),
+            ft.Text("", size=12, weight=ft.FontWeight.BOLD, color=self.color_principal),
+            ft.Text("", size=11, no_wrap=True),
+            ft.Text("", size=11),
+            ft.Text("", size=11, no_wrap=True),
+            ft.Text("", size=11, no_wrap=True),
+        ]
+        estado_text = ft.Text("", size=11, weight=ft.FontWeight.BOLD)
+        estado = ft.Container(
+            content=estado_text,
+            border_radius=6,
+            padding=1,
+            height=25,
+            alignment=ft.alignment.center,
+        )
+        row = ft.Container(
+            height=self.row_height,
+            padding=ft.padding.only(left=6, right=6),
+            border=ft.border.only(bottom=ft.BorderSide(1, ft.Colors.GREY_200)),
+            visible=False,
+        )
+        edit_button = ft.IconButton(
+            icon=ft.Icons.EDIT_NOTE,
+            icon_color=self.color_principal,
+            tooltip="Editar vehículo.",
+            icon_size=20,
+            on_click=lambda e, row=row: self.on_edit_click(row.data) if self.on_edit_click else None,
+        )
+
+        cells = []
+        for (title, width, expand), content in zip(self.COLUMNS, [*texts, estado, edit_button]):
+            cells.append(ft.Container(content=content, width=width, expand=expand))
+        row.content = ft.Row(cells, spacing=6, vertical_alignment=ft.CrossAxisAlignment.CENTER)
+        return row, texts, estado, estado_text
+
+    def _bind_row(self, slot, item, row_number):
+        row, texts, estado_cell, estado_text = slot
+        values = self.ui_components._row_values(item, row_number)
+        # Sólo se asigna lo que cambia, para que la actualización envíe lo mínimo
+        for text, value in zip(texts, values):
+            if text.value != value:
+                text.value = value
+
+        estado = values[7]
+        if estado_text.value != estado:
+            estado_text.value = estado
+            estado_text.color = self.ui_components.get_estado_text_color(estado)
+            estado_cell.bgcolor = self.ui_components.get_estado_color(estado)
+
+        row.data = item['ID']
+        if not row.visible:
+            row.visible = True
@@ -1,10 +1,42 @@
 import pyodbc
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
 from datetime import datetime
 
+from common.connection_pool import is_connection_error
+
+# La existencia de BDPesajes se verifica una sola vez por proceso y base de datos
+_schema_checked = set()
+_schema_lock = threading.Lock()
+
+# Registros pendientes de escribir; sobrevive a un cierre inesperado
+JOURNAL_PATH = 'pesajes_pendientes.jsonl'
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+class SchemaNotReadyError(ConnectionError):
+    """
+    BDPesajes todavía no tiene la columna Clave (agregarla necesita la base
+    en uso exclusivo, y otras estaciones suelen tenerla abierta).
+
+    Se trata como una caída y no como un rechazo: los registros no tienen la
+    culpa y se reintentan más tarde.
+    """
+
+
 class WeightDatabaseManager:
     """
     Clase para gestionar registros de pesaje en la base de datos
     """
+    # Índice único de la clave de idempotencia (Access admite varios NULL,
+    # así que los registros anteriores a la clave no estorban)
+    CLAVE_INDEX = "IX_BDPesajes_Clave"
+    CLAVE_INDEX_QUERY = f"CREATE UNIQUE INDEX {CLAVE_INDEX} ON BDPesajes (Clave)"
+    
     def __init__(self, db_manager=None):
         """
         Inicializar el gestor de base de datos de pesaje
@@ -19,19 +51,26 @@ class WeightDatabaseManager:
             from common.database_manager import DatabaseManager
             self.db_manager = DatabaseManager()
     
-    def save_weight_record(self, weight_record):
+    def save_weight_record(self, weight_record, use_outbox=True):
         """
         Guardar un registro de pesaje en la base de datos
         
+        Si Access no responde, el registro se guarda en la bandeja local
+        (common.outbox) y se envía cuando vuelva el recurso compartido.
+        
         Args:
             weight_record: Instancia de WeightRecord con los datos a guardar
+            use_outbox: False para escribir sólo en Access (lo usa la bandeja)
             
         Returns:
-            bool: True si se guardó correctamente, False en caso contrario
-            int: ID del registro creado/actualizado, None si hubo error
+            bool: True si se guardó (o quedó en la bandeja), False en caso contrario
+            int: ID del registro creado/actualizado, None si hubo error o
+                 quedó en la bandeja
         """
         conn = self.db_manager.connect()
         if not conn:
+            if use_outbox:
+                return self._queue_weight_record(weight_record)
             return False, None
         
         cursor = conn.cursor()
@@ -67,7 +106,7 @@ class WeightDatabaseManager:
                 return True, weight_record.id
             else:
                 # Verificar si la tabla existe, y crearla si no
-                self.ensure_table_exists(cursor)
+                self.ensure_schema(cursor)
                 
                 # Insertar nuevo registro
                 cursor.execute("""
@@ -97,17 +136,179 @@ class WeightDatabaseManager:
                 return True, None
         except pyodbc.Error as e:
             print(f"Error al guardar registro de pesaje: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+                if use_outbox:
+                    return self._queue_weight_record(weight_record)
             return False, None
         finally:
             cursor.close()
             conn.close()
     
+    def insert_weight_records(self, weight_records, claves=None, raise_errors=False):
+        """
+        Insertar varios registros de pesaje en una sola transacción
+        
+        Args:
+            weight_records: Lista de WeightRecord nuevos (sin ID)
+            claves: Claves de idempotencia, una por registro (opcional). Los
+                    registros cuya clave ya está en BDPesajes no se insertan
+                    de nuevo y se devuelve el ID que ya tienen. Los que no
+                    traen clave reciben una nueva
+            raise_errors: Propagar el error en lugar de devolver False
+                          (ConnectionError si no hay conexión,
+                          SchemaNotReadyError si falta la columna Clave),
+                          para que quien llama distinga una caída de un rechazo
+            
+        Returns:
+            bool: True si se guardaron todos, False si no se guardó ninguno
+            list: IDs asignados (None si no se pudieron obtener)
+        """
+        if not weight_records:
+            return True, []
+        # Cada registro lleva una clave: con ella se leen después sus IDs
+        if claves is None:
+            claves = [None] * len(weight_records)
+        claves = [clave or uuid.uuid4().hex for clave in claves]
+        
+        conn = self.db_manager.connect()
+        if not conn:
+            if raise_errors:
+                raise ConnectionError("No fue posible conectar con la base de pesajes")
+            return False, []
+        
+        cursor = conn.cursor()
+        try:
+            if not self.ensure_schema(cursor):
+                # Sin la columna Clave no hay inserción idempotente ni IDs por clave
+                if raise_errors:
+                    raise SchemaNotReadyError("BDPesajes no tiene la columna Clave")
+                print("No se guardó el lote de pesajes: BDPesajes no tiene la columna Clave")
+                return False, []
+            
+            existing = self._ids_by_clave(cursor, claves)
+            new = [
+                (record, clave)
+                for record, clave in zip(weight_records, claves)
+                if clave not in existing
+            ]
+            
+            inserted = {}
+            if new:
+                cursor.executemany("""
+                    INSERT INTO BDPesajes 
+                    (Placa, Peso, Unidad, Proceso, Fecha, Estable, Conductor, Origen, Destino, Clave)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        record.placa,
+                        record.peso,
+                        record.unidad,
+                        record.proceso,
+                        record.fecha,
+                        record.estable,
+                        record.conductor,
+                        record.origen,
+                        record.destino,
+                        clave
+                    )
+                    for record, clave in new
+                ])
+                
+                # Los IDs se leen por clave: con otros equipos insertando a la
+                # vez, los de este lote no tienen por qué ser consecutivos
+                inserted = self._ids_by_clave(cursor, [clave for _, clave in new])
+            conn.commit()
+            
+            return True, [existing.get(clave, inserted.get(clave)) for clave in claves]
+        except pyodbc.Error as e:
+            print(f"Error al guardar el lote de pesajes: {e}")
+            if is_connection_error(e):
+                conn.invalidate()
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                pass
+            if raise_errors:
+                raise
+            return False, []
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _ids_by_clave(self, cursor, claves, chunk_size=100):
+        """IDs de BDPesajes por clave ({clave: ID}) para las claves dadas"""
+        ids = {}
+        for start in range(0, len(claves), chunk_size):
+            chunk = claves[start:start + chunk_size]
+            cursor.execute(
+                f"SELECT ID, Clave FROM BDPesajes WHERE Clave IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            ids.update((row.Clave, row.ID) for row in cursor.fetchall())
+        return ids
+    
+    def enqueue_weight_record(self, weight_record, on_saved=None):
+        """
+        Guardar un registro nuevo en segundo plano (ver WeightWriteQueue)
+        
+        Args:
+            weight_record: WeightRecord nuevo
+            on_saved: Función (id) llamada desde el hilo de escritura al guardarse
+            
+        Returns:
+            str: Clave del registro en el diario
+        """
+        return self.write_queue().put(weight_record, on_saved)
+    
+    def _queue_weight_record(self, weight_record):
+        from common.outbox import queue_write
+        queue_write("save_weight", weight_record.to_dict())
+        print(f"Pesaje de {weight_record.placa} guardado en la bandeja local")
+        return True, None
+    
+    def write_queue(self, journal_path=JOURNAL_PATH):
+        """Cola de escritura compartida para el diario journal_path"""
+        with _write_queues_lock:
+            queue = _write_queues.get(journal_path)
+            if queue is None:
+                queue = WeightWriteQueue(self, journal_path)
+                _write_queues[journal_path] = queue
+            return queue
+    
+    def ensure_schema(self, cursor):
+        """
+        ensure_table_exists una sola vez por proceso para esta base de datos
+        
+        Sólo se da por verificada cuando la columna Clave existe; si no se
+        pudo agregar, se vuelve a intentar en la siguiente llamada.
+        
+        Args:
+            cursor: Cursor de la conexión a la base de datos
+            
+        Returns:
+            bool: True si BDPesajes tiene la columna Clave
+        """
+        key = getattr(self.db_manager, 'conn_str', id(self.db_manager))
+        if key in _schema_checked:
+            return True
+        with _schema_lock:
+            if key in _schema_checked:
+                return True
+            if not self.ensure_table_exists(cursor):
+                return False
+            _schema_checked.add(key)
+            return True
+    
     def ensure_table_exists(self, cursor):
         """
         Asegurarse de que la tabla BDPesajes existe en la base de datos
         
         Args:
             cursor: Cursor de la conexión a la base de datos
+            
+        Returns:
+            bool: True si la tabla existe y tiene la columna Clave
         """
         try:
             # Verificar si la tabla existe
@@ -127,12 +328,49 @@ class WeightDatabaseManager:
                         Estable YESNO,
                         Conductor TEXT(100),
                         Origen TEXT(100),
-                        Destino TEXT(100)
+                        Destino TEXT(100),
+                        Clave TEXT(32)
                     )
                 """)
+                cursor.execute(self.CLAVE_INDEX_QUERY)
                 cursor.commit()
+                return True
             except pyodbc.Error as e:
                 print(f"Error al crear tabla BDPesajes: {e}")
+                return False
+        
+        # Tablas creadas antes de la clave de idempotencia
+        if any(column[0].lower() == 'clave' for column in cursor.description):
+            self._ensure_clave_index(cursor)
+            return True
+        try:
+            cursor.execute("ALTER TABLE BDPesajes ADD COLUMN Clave TEXT(32)")
+            cursor.execute(self.CLAVE_INDEX_QUERY)
+            cursor.commit()
+            return True
+        except pyodbc.Error as e:
+            print(f"Error al agregar la columna Clave a BDPesajes: {e}")
+            return False
+    
+    def _ensure_clave_index(self, cursor):
+        """
+        Crear el índice único de Clave en tablas que ya tenían la columna.
+        
+        Sin él, las búsquedas por clave de cada lote recorren toda la tabla.
+        Si no puede crearse (p. ej. claves duplicadas de versiones anteriores)
+        se avisa y se sigue sin índice.
+        """
+        try:
+            indexes = {
+                (row.index_name or '').lower()
+                for row in cursor.statistics('BDPesajes', unique=True)
+            }
+            if self.CLAVE_INDEX.lower() in indexes:
+                return
+            cursor.execute(self.CLAVE_INDEX_QUERY)
+            cursor.commit()
+        except pyodbc.Error as e:
+            print(f"Error al crear el índice {self.CLAVE_INDEX} de BDPesajes: {e}")
     
     def get_weight_records(self, fecha=None, placa=None, limite=100):
         """
@@ -277,4 +515,276 @@ class WeightDatabaseManager:
             }
         finally:
             cursor.close()
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+
+class WeightWriteQueue:
+    """
+    Cola de escritura diferida de registros de pesaje.
+
+    put() anota el registro en un diario local (una línea JSON, sincronizada
+    a disco) y vuelve de inmediato. Un hilo agrupa los registros que llegan
+    en flush_delay segundos y los inserta en una sola transacción con
+    executemany; al confirmarse, los marca como hechos en el diario. Si la
+    aplicación se cierra con registros pendientes, se vuelven a encolar al
+    iniciar. Un cierre justo entre el commit y la marca en el diario vuelve
+    a enviar ese lote, pero la clave de cada registro (columna Clave de
+    BDPesajes) evita que se inserte dos veces.
+
+    El diario sólo cubre el tiempo hasta el primer intento. Si Access no
+    responde, el lote pasa a la bandeja local (common.outbox), la misma que
+    usan las demás escrituras sin conexión, y sale de la cola; la bandeja lo
+    envía con la misma clave cuando Access vuelve. Si Access rechaza el lote
+    (datos inválidos), sus registros se envían de uno en uno para que los
+    demás se guarden; el que falla max_intentos veces se aparta en la
+    bandeja en estado 'error' y deja de bloquear la cola.
+
+    Args:
+        weight_db: WeightDatabaseManager que hace las inserciones
+        journal_path: Archivo del diario
+        batch_size: Registros máximos por transacción
+        flush_delay: Segundos que se esperan para agrupar registros
+        max_backoff: Segundos máximos entre reintentos
+        max_intentos: Rechazos de un registro antes de apartarlo
+    """
+
+    def __init__(self, weight_db, journal_path=JOURNAL_PATH, batch_size=100, flush_delay=0.5,
+                 max_backoff=30, max_intentos=5):
+        self.weight_db = weight_db
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.max_backoff = max_backoff
+        self.max_intentos = max_intentos
+
+        self._pending = deque()  # (clave, registro, on_saved)
+        self._condition = threading.Condition()
+        self._flush_now = False
+        # Registros que se envían de uno en uno tras un lote rechazado
+        self._isolate = 0
+        self._rejections = {}  # clave -> rechazos
+
+        self.stats = {
+            "encolados": 0,
+            "guardados": 0,
+            "lotes": 0,
+            "errores": 0,
+            "rechazos": 0,
+            "apartados": 0,
+            "a_bandeja": 0,
+            "recuperados": 0,
+        }
+
+        self._recover()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, weight_record, on_saved=None):
+        """Encolar un registro nuevo; devuelve su clave en el diario"""
+        key = uuid.uuid4().hex
+        with self._condition:
+            # Diario y cola bajo el mismo candado: la compactación nunca
+            # borra una línea cuyo registro todavía no está en la cola
+            self._write_journal({"op": "alta", "clave": key, "registro": weight_record.to_dict()})
+            self._pending.append((key, weight_record, on_saved))
+            self.stats["encolados"] += 1
+            self._condition.notify_all()
+        return key
+
+    def flush(self, timeout=10):
+        """Escribir ya lo pendiente y esperar (hasta timeout); True si quedó vacío"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._flush_now = True
+            self._condition.notify_all()
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self.stats)
+            stats["pendientes"] = len(self._pending)
+            return stats
+
+    def _run(self):
+        backoff = self.flush_delay
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Dar tiempo a que lleguen los demás registros del lote
+                deadline = time.monotonic() + self.flush_delay
+                while not self._flush_now and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                self._flush_now = False
+                size = 1 if self._isolate else self.batch_size
+                batch = [self._pending[i] for i in range(min(size, len(self._pending)))]
+
+            # Las claves del diario evitan duplicar un lote que ya se guardó
+            # si la aplicación se cerró antes de marcarlo como hecho
+            try:
+                _, ids = self.weight_db.insert_weight_records(
+                    [record for _, record, _ in batch],
+                    claves=[key for key, _, _ in batch],
+                    raise_errors=True,
+                )
+            except Exception as e:
+                with self._condition:
+                    self.stats["errores"] += 1
+                if isinstance(e, ConnectionError) or is_connection_error(e):
+                    # Access no responde: no es culpa de los registros
+                    if not self._to_outbox(batch):
+                        time.sleep(backoff)
+                        backoff = min(backoff * 2, self.max_backoff)
+                elif len(batch) > 1:
+                    # Buscar el registro rechazado enviándolos de uno en uno
+                    self._isolate = len(batch)
+                elif not self._reject(batch[0], e):
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.flush_delay
+            self._isolate = max(0, self._isolate - len(batch))
+
+            with self._condition:
+                self._write_journal({"op": "hecho", "claves": [key for key, _, _ in batch]})
+                for key, _, _ in batch:
+                    self._pending.popleft()
+                    self._rejections.pop(key, None)
+                self.stats["guardados"] += len(batch)
+                self.stats["lotes"] += 1
+                if not self._pending:
+                    self._compact_journal()
+                self._condition.notify_all()
+
+            for (_, record, on_saved), record_id in zip(batch, ids):
+                record.id = record_id
+                if on_saved:
+                    try:
+                        on_saved(record_id)
+                    except Exception as e:
+                        print(f"Error notificando el pesaje guardado: {e}")
+
+    def _to_outbox(self, batch):
+        """
+        Pasar el lote a la bandeja local mientras Access no responde.
+
+        Returns:
+            True si el lote quedó en la bandeja y salió de la cola
+        """
+        from common.outbox import queue_write
+        try:
+            for key, record, _ in batch:
+                queue_write("save_weight", record.to_dict(), clave=key)
+        except Exception as e:
+            # Sin bandeja, el lote sigue en la cola y se reintenta
+            print(f"Error al pasar pesajes a la bandeja local: {e}")
+            return False
+        print(f"{len(batch)} pesajes guardados en la bandeja local hasta que Access responda")
+
+        with self._condition:
+            self._write_journal({"op": "bandeja", "claves": [key for key, _, _ in batch]})
+            for key, _, _ in batch:
+                self._pending.popleft()
+                self._rejections.pop(key, None)
+            self._isolate = max(0, self._isolate - len(batch))
+            self.stats["a_bandeja"] += len(batch)
+            if not self._pending:
+                self._compact_journal()
+            self._condition.notify_all()
+        return True
+
+    def _reject(self, entry, error):
+        """
+        Contar un rechazo del registro; al llegar a max_intentos se aparta.
+
+        Returns:
+            True si el registro se apartó y salió de la cola
+        """
+        key, record, _ = entry
+        rejections = self._rejections.get(key, 0) + 1
+        self._rejections[key] = rejections
+        with self._condition:
+            self.stats["rechazos"] += 1
+        if rejections < self.max_intentos:
+            return False
+
+        from common.outbox import set_aside
+        try:
+            set_aside("save_weight", record.to_dict(), key, error)
+        except Exception as e:
+            # Sin bandeja donde apartarlo, el registro sigue en la cola
+            print(f"Error al apartar el pesaje {key}: {e}")
+            return False
+        print(f"Pesaje {key} ({record.placa}) apartado tras {rejections} rechazos: {error}")
+
+        with self._condition:
+            self._write_journal({"op": "apartado", "clave": key})
+            self._pending.popleft()
+            self._rejections.pop(key, None)
+            self._isolate = max(0, self._isolate - 1)
+            self.stats["apartados"] += 1
+            if not self._pending:
+                self._compact_journal()
+            self._condition.notify_all()
+        return True
+
+    def _write_journal(self, entry):
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Error al escribir el diario de pesajes: {e}")
+
+    def _compact_journal(self):
+        # Sin pendientes, el diario ya no tiene nada que recuperar
+        try:
+            open(self.journal_path, 'w').close()
+        except OSError as e:
+            print(f"Error al vaciar el diario de pesajes: {e}")
+
+    def _recover(self):
+        if not os.path.exists(self.journal_path):
+            return
+        pending = {}
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Última línea a medio escribir por un cierre inesperado
+                        continue
+                    if entry.get("op") == "alta":
+                        pending[entry["clave"]] = entry["registro"]
+                    elif entry.get("op") in ("hecho", "bandeja"):
+                        for key in entry.get("claves", []):
+                            pending.pop(key, None)
+                    elif entry.get("op") == "apartado":
+                        pending.pop(entry["clave"], None)
+        except OSError as e:
+            print(f"Error al leer el diario de pesajes: {e}")
+            return
+
+        from common.scale_protocols import WeightRecord
+        self._compact_journal()
+        for key, data in pending.items():
+            record = WeightRecord.from_dict(data)
+            self._write_journal({"op": "alta", "clave": key, "registro": data})
+            self._pending.append((key, record, None))
+        if pending:
+            self.stats["recuperados"] = len(pending)
+            print(f"Recuperados {len(pending)} pesajes pendientes del diario {self.journal_path}")
@@ -0,0 +1,132 @@
+import time
+from collections import deque
+
+
+class StabilityDetector:
+    """
+    Detecta cuándo la lectura de la báscula se estabiliza.
+
+    La lectura se considera estable cuando todas las muestras de los últimos
+    dwell_time segundos están dentro de `tolerance` (máximo - mínimo). La
+    ventana guarda las muestras en orden y dos colas monótonas con los
+    candidatos a mínimo y máximo, así que cada muestra entra y sale una sola
+    vez: O(1) amortizado por muestra, sin recorrer la ventana.
+
+    add() devuelve un evento de peso estable una sola vez por meseta; hace
+    falta que la lectura vuelva a moverse fuera de la tolerancia para emitir
+    otro.
+
+    Args:
+        tolerance: Variación máxima (en las unidades de la báscula)
+        dwell_time: Segundos que la lectura debe mantenerse dentro de la tolerancia
+        min_weight: Peso mínimo para emitir eventos (báscula vacía por debajo)
+        clock: Reloj usado cuando add() no recibe el instante
+    """
+
+    def __init__(self, tolerance=20, dwell_time=2.0, min_weight=100, clock=time.monotonic):
+        self.tolerance = tolerance
+        self.dwell_time = dwell_time
+        self.min_weight = min_weight
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self._samples = deque()  # (índice, instante, peso)
+        self._mins = deque()     # (índice, peso) con pesos crecientes
+        self._maxs = deque()     # (índice, peso) con pesos decrecientes
+        self._sum = 0.0
+        self._next_index = 0
+        self._emitted = False
+        self.is_stable = False
+
+    def add(self, weight, timestamp=None):
+        """
+        Añadir una muestra.
+
+        Args:
+            weight: Peso leído
+            timestamp: Instante de la muestra (por defecto, clock())
+
+        Returns:
+            dict con el evento de peso estable, o None
+        """
+        now = self.clock() if timestamp is None else timestamp
+        index = self._next_index
+        self._next_index += 1
+
+        self._samples.append((index, now, weight))
+        self._sum += weight
+        while self._mins and self._mins[-1][1] >= weight:
+            self._mins.pop()
+        self._mins.append((index, weight))
+        while self._maxs and self._maxs[-1][1] <= weight:
+            self._maxs.pop()
+        self._maxs.append((index, weight))
+
+        # Si la muestra nueva rompe la tolerancia, descartar las antiguas
+        # hasta que el rango vuelva a caber: empieza otra meseta
+        if self._maxs[0][1] - self._mins[0][1] > self.tolerance:
+            self._emitted = False
+            while self._maxs[0][1] - self._mins[0][1] > self.tolerance:
+                self._drop_oldest()
+
+        # Conservar sólo una muestra anterior al inicio de la ventana
+        boundary = now - self.dwell_time
+        while len(self._samples) > 1 and self._samples[1][1] <= boundary:
+            self._drop_oldest()
+
+        self.is_stable = self._samples[0][1] <= boundary
+        if not self.is_stable or self._emitted:
+            return None
+
+        mean = self._sum / len(self._samples)
+        if mean < self.min_weight:
+            return None
+
+        self._emitted = True
+        return {
+            "peso": mean,
+            "minimo": self._mins[0][1],
+            "maximo": self._maxs[0][1],
+            "muestras": len(self._samples),
+            "estable_desde": self._samples[0][1],
+            "instante": now,
+        }
+
+    def _drop_oldest(self):
+        index, _, weight = self._samples.popleft()
+        self._sum -= weight
+        if self._mins[0][0] == index:
+            self._mins.popleft()
+        if self._maxs[0][0] == index:
+            self._maxs.popleft()
+
+
+if __name__ == "__main__":
+    # Simulación: un camión sube a la báscula, oscila y se estabiliza
+    import random
+
+    rng = random.Random(3)
+    detector = StabilityDetector(tolerance=20, dwell_time=2.0)
+    t = 0.0
+    events = []
+    perfil = [(0, 3)] + [(w, 0.2) for w in range(0, 32000, 4000)] + [(32000, 6), (0, 3), (18500, 6)]
+    for objetivo, segundos in perfil:
+        pasos = int(segundos * 10)
+        for _ in range(max(1, pasos)):
+            ruido = rng.uniform(-150, 150) if t % 10 < 1 else rng.uniform(-5, 5)
+            evento = detector.add(objetivo + ruido, t)
+            if evento:
+                events.append(evento)
+            t += 0.1
+
+    for evento in events:
+        print(f"Peso estable {evento['peso']:.0f} kg a los {evento['instante']:.1f} s "
+              f"({evento['muestras']} muestras, rango {evento['maximo'] - evento['minimo']:.1f})")
+
+    start = time.perf_counter()
+    detector = StabilityDetector()
+    for i in range(200_000):
+        detector.add(30000 + (i % 7), i * 0.01)
+    elapsed = time.perf_counter() - start
+    print(f"200000 muestras en {elapsed * 1000:.0f} ms ({elapsed / 200_000 * 1e6:.2f} µs por muestra)")
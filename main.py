@@ -4,7 +4,7 @@ import subprocess
 import os
 import sys
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from common.database_manager import DatabaseManager
 from views.serial_config_modal import SerialConfigModal
 from EditVehicle_modal import EditVehicleModal
@@ -13,12 +13,19 @@ from common.pagination import PaginationManager
 from common.filter import FilterManager
 from common.ui_components import UIComponents
 from common.stat_card import StatCard
+from common.data_loader import DataLoader
+from common.replica_sync import create_replica_sync
+from DatabaseConnections import LocalReplica
+from common.outbox import get_outbox
 from views.cmc_view import CMCView
+from common.virtual_table import VirtualTable
 from views.enturne_view import EnturneView
 from views.bascula_view import BasculaView
 from views.Documentation import DocumentationView
 
 class ControlCargaApp:
+    # Días que abarca cada modo del selector de rango (terminan en la fecha elegida)
+    DIAS_POR_RANGO = {"dia": 1, "semana": 7, "mes": 30}
 
     def __init__(self, page):
         self.page = page
@@ -32,12 +39,22 @@ class ControlCargaApp:
         self.fecha_seleccionada = datetime.now()
         self.fecha_numerica_excel = (self.fecha_seleccionada - datetime(1900, 1, 1)).days + 2
         self.current_view = "cmc"  # Vista actual (cmc, enturne, bascula)
+        self.rango = "dia"  # Folios cargados: dia, semana o mes
+        self._view_key = None  # (folio_desde, folio_hasta, filtro, server_side) mostrado en la tabla
         
         # Inicializar componentes
         self.ui_components = UIComponents(page, self.color_principal)
         self.vehicle_data = VehicleData()
+        # Réplica local de las bases Access: las vistas leen de ella y un hilo
+        # la mantiene al día; las escrituras siguen yendo a Access
+        self.replica_sync = create_replica_sync(LocalReplica(), on_sync=self.on_replica_sync)
+        self.vehicle_data.replica_sync = self.replica_sync
+        self.data_loader = DataLoader(self.vehicle_data, on_fetched=self.on_rows_fetched)
+        self.vehicle_data.fetcher = self.data_loader.fetch_async
         self.pagination = PaginationManager(page)
-        self.filter_manager = FilterManager(page, self.vehicle_data, self.on_filter_change)
+        self.filter_manager = FilterManager(
+            page, self.vehicle_data, self.on_filter_change, data_lock=self.data_loader.lock
+        )
         
         # Crear el modal de edición
         self.edit_modal = EditVehicleModal(
@@ -54,7 +71,8 @@ class ControlCargaApp:
         self.menu_navegacion = self.ui_components.create_navigation_rail(
             self.handle_date_change, 
             self.fecha_seleccionada,
-            self.handle_navigation_change
+            self.handle_navigation_change,
+            self.handle_range_change,
         )
         self.top_bar = self.ui_components.create_top_bar(
             self.toggle_menu,
@@ -62,6 +80,8 @@ class ControlCargaApp:
             self.open_documentation  # Pasar el manejador de notificaciones
         )
         self.data_table = self.ui_components.create_data_table()
+        self.virtual_table = VirtualTable(page, self.ui_components, on_edit_click=self.show_edit_modal)
+        self.filtered_data = []
         self.stat_cards = self.create_stat_cards()
         
         # Inicializar vistas
@@ -72,6 +92,9 @@ class ControlCargaApp:
             self.data_table, 
             self.pagination,
             self.update_data,
+            virtual_table=self.virtual_table,
+            on_mode_change=self.on_table_mode_change,
+            on_source_change=self.on_source_change,
         )
         self.documentation_view = DocumentationView(page, self.color_principal, self.color_secundario)
         self.view_docs = self.documentation_view.get_view()
@@ -99,6 +122,9 @@ class ControlCargaApp:
         
         # Cargar datos iniciales
         self.refresh_data()
+        self.replica_sync.start()
+        # Enviar lo que quedó en la bandeja local de una sesión anterior
+        get_outbox()
     
     def setup_page(self):
         self.page.title = "Control de Movimientos de Carga"
@@ -168,26 +194,34 @@ class ControlCargaApp:
         self.filter_manager.search_field.value = ""
         self.filter_manager.search_text = ""
 
-        # Establecer el indicador como splash de la página
-        self.page.overlay.append(self.progress_container) 
-        self.page.update()
-        
-        # Limpiar los datos actuales
-        # Vaciar filas de data_table para que no se vean datos antiguos
-        self.data_table.rows.clear()
-        self.page.update()
-        
-        # Recargar datos desde la base de datos
-        self.vehicle_data.load_data(self.fecha_numerica_excel)
+        # Establecer el indicador como splash de la página (cubre los datos
+        # anteriores; la tabla no se vacía para que el renderizador reutilice las filas)
+        self.show_progress()
         
+        # Recargar datos desde Access (no desde la réplica) en segundo plano
+        self.load_vehicles(from_source=True)
+    
+    def on_data_loaded(self):
+        """Aplicar a la UI el resultado de la carga más reciente (se llama desde el hilo de carga)"""
         # Actualizar tarjetas estadísticas
         self.update_stat_cards()
         
         # Aplicar filtro actual y eso actualizará la tabla
         self.filter_manager.apply_filter(self.filter_manager.current_filter)
         
+        self.update_replica_status()
+        
         # Ocultar indicador de carga
-        self.page.overlay.remove(self.progress_container)
+        self.hide_progress()
+    
+    def show_progress(self):
+        if self.progress_container not in self.page.overlay:
+            self.page.overlay.append(self.progress_container)
+        self.page.update()
+    
+    def hide_progress(self):
+        if self.progress_container in self.page.overlay:
+            self.page.overlay.remove(self.progress_container)
         self.page.update()
     
     def handle_navigation_change(self, e):
@@ -282,17 +316,30 @@ class ControlCargaApp:
         )
     
     def refresh_data(self):
-        # Cargar datos desde la base de datos
-        self.page.overlay.append(self.progress_container)
-        self.page.update()
-
-        self.vehicle_data.load_data(self.fecha_numerica_excel)
-        # Aplicar filtro actual
-        self.filter_manager.apply_filter(self.filter_manager.current_filter)
-        # Actualizar tarjetas estadísticas
-        self.update_stat_cards()
-        self.page.overlay.remove(self.progress_container)
-        self.page.update()
+        # Cargar datos desde la base de datos sin bloquear la interfaz;
+        # una carga anterior aún en curso queda descartada
+        self.replica_sync.watch(self.fecha_numerica_excel)
+        self.show_progress()
+        self.load_vehicles()
+    
+    def folio_desde(self):
+        """Primer folio del rango seleccionado (el último es fecha_numerica_excel)"""
+        return self.fecha_numerica_excel - self.DIAS_POR_RANGO[self.rango] + 1
+    
+    def load_vehicles(self, from_source=False):
+        """Cargar el folio o el rango de folios seleccionado en segundo plano"""
+        folio_desde = self.folio_desde()
+        if self.vehicle_data.server_side:
+            # En SQL el rango es un solo Folio BETWEEN ? AND ?
+            self.vehicle_data.folio_hasta = (
+                self.fecha_numerica_excel if folio_desde != self.fecha_numerica_excel else None
+            )
+            self.data_loader.load(folio_desde, self.on_data_loaded, from_source=from_source)
+        elif folio_desde == self.fecha_numerica_excel:
+            self.data_loader.load(self.fecha_numerica_excel, self.on_data_loaded, from_source=from_source)
+        else:
+            # Un folio por consulta, en paralelo; la tabla se llena a medida que llegan
+            self.data_loader.load_range(folio_desde, self.fecha_numerica_excel, self.on_data_loaded, from_source)
 
     def toggle_menu(self, e):
         self.menu_navegacion.extended = not self.menu_navegacion.extended
@@ -304,21 +351,88 @@ class ControlCargaApp:
         self.fecha_numerica_excel = (self.fecha_seleccionada - datetime(1900, 1, 1)).days + 2
         
         # Actualizar el texto del botón con la nueva fecha
-        self.ui_components.update_date_button(self.fecha_seleccionada)
+        self.update_date_button()
         
         # Refrescar datos con la nueva fecha
         self.refresh_data()
     
+    def handle_range_change(self, e):
+        self.rango = e.control.value
+        self.update_date_button()
+        self.refresh_data()
+    
+    def update_date_button(self):
+        dias = self.DIAS_POR_RANGO[self.rango]
+        self.ui_components.update_date_button(
+            self.fecha_seleccionada, self.fecha_seleccionada - timedelta(days=dias - 1)
+        )
+    
     def on_filter_change(self, filtered_data):
-        # Actualizar la paginación con los datos filtrados
-        self.pagination.update_data(filtered_data)
-        # Actualizar la tabla con los datos de la página actual
-        self.update_data_table()
+        self.filtered_data = filtered_data
+        # Sólo otro filtro u otro folio (o rango) vuelven al inicio de la
+        # tabla; una recarga, una edición o una búsqueda conservan la posición
+        view_key = (
+            self.folio_desde(), self.fecha_numerica_excel, self.filter_manager.current_filter,
+            self.vehicle_data.server_side,
+        )
+        reset = view_key != self._view_key
+        self._view_key = view_key
+        if self.cmc_view.virtual_mode:
+            # La tabla virtual sólo construye las filas visibles
+            self.virtual_table.set_data(filtered_data, reset=reset)
+        else:
+            # Actualizar la paginación con los datos filtrados
+            self.pagination.update_data(filtered_data, keep_page=not reset)
+            # Actualizar la tabla con los datos de la página actual
+            self.update_data_table()
         # Actualizar estado visual de las tarjetas
         self.update_card_states()
         # Asegurar que la página se actualice
         self.page.update()
     
+    def on_rows_fetched(self):
+        """Volver a pintar al llegar una página o un conteo del modo server_side (hilo de carga)"""
+        # Se conserva la página o el desplazamiento actual
+        if self.cmc_view.virtual_mode:
+            self.virtual_table.refresh()
+        else:
+            self.pagination.update_ui()
+            self.update_data_table()
+    
+    def on_table_mode_change(self, virtual_mode):
+        """Mostrar los datos filtrados en la tabla que acaba de activarse"""
+        if virtual_mode:
+            self.virtual_table.set_data(self.filtered_data)
+        else:
+            self.pagination.update_data(self.filtered_data)
+    
+    def on_replica_sync(self, changed, folio):
+        """Tras cada copia de la réplica (se llama desde el hilo de sincronización)"""
+        # Con un rango cargado la copia no se aplica sola (recargaría sólo un
+        # folio); el botón Actualizar vuelve a consultar el rango completo
+        if ('bdenturne' in changed and folio == self.fecha_numerica_excel
+                and not self.vehicle_data.server_side and self.rango == "dia"):
+            # Aplicar los cambios leyendo de la réplica, sin cubrir la pantalla
+            self.data_loader.load(folio, self.on_data_loaded)
+        else:
+            self.update_replica_status()
+            self.page.update()
+    
+    def update_replica_status(self):
+        """Mostrar la antigüedad de la copia local del folio actual"""
+        staleness = None
+        if not self.vehicle_data.server_side:
+            staleness = self.replica_sync.staleness(self.fecha_numerica_excel)
+        self.cmc_view.set_replica_status(staleness, self.replica_sync.last_error)
+    
+    def on_source_change(self, server_side):
+        """Cambiar entre el folio en memoria y las consultas paginadas en SQL"""
+        # Una carga en curso del modo anterior no debe aplicarse sobre el nuevo
+        self.data_loader.cancel(wait=True)
+        with self.data_loader.lock:
+            self.vehicle_data.set_server_side(server_side)
+        self.refresh_data()
+    
     def update_data_table(self):
         """Obtener datos de la página actual"""
         current_page_data = self.pagination.get_current_page_data()
@@ -367,10 +481,24 @@ class ControlCargaApp:
         self.edit_modal.show(vehicle_id)
 
     
-    def on_vehicle_updated(self):
+    def on_vehicle_updated(self, queued_vehicle=None):
         """Callback para cuando un vehículo ha sido actualizado"""
-        # Refrescar los datos después de la actualización
-        self.refresh_data()
+        # Recargar sólo el vehículo editado, en segundo plano como las cargas;
+        # un cambio que quedó en la bandeja se aplica sin leer de Access
+        self.data_loader.refresh_vehicle(
+            self.edit_modal.vehicle_id, self.on_vehicle_refreshed, vehicle=queued_vehicle
+        )
+    
+    def on_vehicle_refreshed(self, refreshed):
+        """Tras recargar el vehículo editado (se llama desde el hilo de carga)"""
+        # Si no está en el folio cargado, recargar todo
+        if not refreshed:
+            self.refresh_data()
+            return
+        
+        self.filter_manager.apply_filter(self.filter_manager.current_filter)
+        self.update_stat_cards()
+        self.page.update()
 
     def open_documentation(self, e):
         """Cambia a la vista de documentación cuando se hace clic en el icono de notificaciones"""
@@ -1,37 +1,193 @@
-// Elimina la función que hace fetch porque ya no es necesario hacer una solicitud a la API
-async function cargarPesajes() {
-    try {
-        // Este código ya no es necesario
-        const response = await fetch("http://localhost:5001/api/pesajes");
-        const data = await response.json();
-
-        let tabla = document.querySelector(".recentOrders tbody");
-        tabla.innerHTML = "";  // Limpia la tabla antes de insertar nuevos datos
-
-        data.forEach(pesaje => {
-            let fila = document.createElement("tr");
-            fila.innerHTML = `
-                <td>${pesaje.Nombre || 'N/A'}</td>
-                <td>${pesaje.Placa || 'N/A'}</td>
-                <td>${pesaje.Producto || 'N/A'}</td>
-                <td><span class="status delivered">${pesaje.Status || 'N/A'}</span></td>
-            `;
-            tabla.appendChild(fila);
+// Tablero de enturnados: la página llega renderizada por el servidor y luego
+// se actualiza con las APIs JSON (/api/datos/...), que responden 304 cuando
+// nada cambió desde la última consulta. Los cambios llegan por el canal de
+// eventos /api/eventos; si no está disponible se consulta periódicamente.
+
+const INTERVALO_ACTUALIZACION = 15000;  // ms, sólo sin canal de eventos
+const ESPERA_RECARGA = 500;  // ms para agrupar varias transiciones seguidas
+const FILTROS = ['todos', 'en_proceso', 'finalizado', 'pendiente'];
+
+// Clase CSS de cada estado (la misma que usa la plantilla)
+const CLASES_ESTADO = {
+    'Finalizado': 'delivered',
+    'En proceso': 'pending',
+    'Enturnado': 'return',
+    'No enturnado': 'inProgress',
+    'Anunciado': 'anunciado',
+    'Autorizado': 'autorizado',
+    'En inspeccion': 'inspeccion',
+    'Revision documental': 'revision',
+    'Transito entrando': 'entrando',
+    'Transito saliendo': 'saliendo',
+    'Ingresó': 'ingreso',
+};
+
+// Último ETag y datos recibidos por URL
+const etags = {};
+const ultimosDatos = {};
+
+let filtroActivo = new URLSearchParams(window.location.search).get('filtro') || 'todos';
+
+// GET condicional: devuelve {datos, cambio}; cambio es false si el servidor respondió 304
+async function obtenerJson(url) {
+    const headers = {};
+    if (etags[url]) {
+        headers['If-None-Match'] = etags[url];
+    }
+    const response = await fetch(url, { headers });
+    if (response.status === 304) {
+        return { datos: ultimosDatos[url], cambio: false };
+    }
+    if (!response.ok) {
+        throw new Error(`${url}: ${response.status}`);
+    }
+    const datos = await response.json();
+    etags[url] = response.headers.get('ETag');
+    ultimosDatos[url] = datos;
+    return { datos, cambio: true };
+}
+
+async function cargarTotales() {
+    const { datos, cambio } = await obtenerJson('/api/datos/totales');
+    if (cambio) {
+        mostrarTotales(datos);
+    }
+}
+
+function mostrarTotales(datos) {
+    document.querySelectorAll('[data-total]').forEach(elemento => {
+        const valor = datos[elemento.dataset.total];
+        if (valor !== undefined && elemento.textContent !== String(valor)) {
+            elemento.textContent = valor;
+        }
+    });
+}
+
+async function cargarVehiculos(filtro) {
+    const { datos, cambio } = await obtenerJson('/api/datos/vehiculos?filtro=' + encodeURIComponent(filtro));
+    if (!cambio && filtro === filtroActivo && document.querySelector('#tablaPesa1 tbody').dataset.filtro === filtro) {
+        return;
+    }
+    renderizarVehiculos(datos.vehiculos, filtro);
+}
+
+// Sólo se reescriben las filas que cambiaron; las demás se dejan intactas
+function renderizarVehiculos(vehiculos, filtro) {
+    const tbody = document.querySelector('#tablaPesa1 tbody');
+    tbody.dataset.filtro = filtro;
+    const filas = tbody.rows;
+
+    vehiculos.forEach((vehiculo, indice) => {
+        const firma = JSON.stringify(vehiculo);
+        let fila = filas[indice];
+        if (fila && fila.dataset.firma === firma) {
+            return;
+        }
+        if (!fila) {
+            fila = tbody.insertRow();
+        }
+        fila.dataset.firma = firma;
+        fila.innerHTML = '';
+        ['NombreConductor', 'Placa', 'Producto', 'Proceso', 'Cliente'].forEach(campo => {
+            fila.insertCell().textContent = vehiculo[campo] ?? '';
         });
+        const estado = document.createElement('span');
+        estado.className = 'status ' + (CLASES_ESTADO[vehiculo.Estado] || 'canceled');
+        estado.textContent = vehiculo.Estado ?? '';
+        fila.insertCell().appendChild(estado);
+    });
+
+    // Quitar las filas que sobran
+    while (filas.length > vehiculos.length) {
+        tbody.deleteRow(filas.length - 1);
+    }
+}
 
+function marcarTarjeta(filtro) {
+    const cards = document.querySelectorAll('.card');
+    cards.forEach(card => card.classList.remove('active'));
+    const indice = FILTROS.indexOf(filtro);
+    if (cards[indice]) {
+        cards[indice].classList.add('active');
+    }
+}
+
+// Función para aplicar el filtro al hacer clic en las tarjetas
+function aplicarFiltro(filtro) {
+    filtroActivo = filtro;
+    marcarTarjeta(filtro);
+
+    // Conservar el filtro en la URL sin recargar la página
+    history.replaceState(null, '', '/api/pesajes?filtro=' + encodeURIComponent(filtro));
+    cargarVehiculos(filtro).catch(error => console.error('Error cargando datos:', error));
+}
+
+async function actualizar() {
+    try {
+        await Promise.all([cargarTotales(), cargarVehiculos(filtroActivo)]);
     } catch (error) {
-        console.error("Error cargando datos:", error);
+        console.error('Error cargando datos:', error);
+    }
+}
+
+function mostrarPeso(datos) {
+    const elemento = document.getElementById('pesoEnVivo');
+    if (!elemento) {
+        return;
+    }
+    elemento.hidden = false;
+    elemento.textContent = `${datos.bascula}: ${Math.round(datos.peso)} ${datos.unidad}`;
+    elemento.classList.toggle('estable', datos.estable !== false);
+}
+
+// Consulta periódica, sólo mientras el canal de eventos no está conectado
+let temporizadorConsulta = null;
+
+function iniciarConsulta() {
+    if (temporizadorConsulta === null) {
+        temporizadorConsulta = setInterval(actualizar, INTERVALO_ACTUALIZACION);
+    }
+}
+
+function detenerConsulta() {
+    if (temporizadorConsulta !== null) {
+        clearInterval(temporizadorConsulta);
+        temporizadorConsulta = null;
+    }
+}
+
+let recargaPendiente = null;
+
+function programarRecarga() {
+    if (recargaPendiente === null) {
+        recargaPendiente = setTimeout(() => {
+            recargaPendiente = null;
+            cargarVehiculos(filtroActivo).catch(error => console.error('Error cargando datos:', error));
+        }, ESPERA_RECARGA);
+    }
+}
+
+function conectarEventos() {
+    if (!window.EventSource) {
+        iniciarConsulta();
+        return;
     }
+    const fuente = new EventSource('/api/eventos');
+    fuente.addEventListener('open', () => {
+        // Al (re)conectar, ponerse al día una vez y dejar de consultar
+        detenerConsulta();
+        actualizar();
+    });
+    fuente.addEventListener('error', () => {
+        // EventSource reintenta solo; mientras tanto se consulta periódicamente
+        iniciarConsulta();
+    });
+    fuente.addEventListener('totales', evento => mostrarTotales(JSON.parse(evento.data)));
+    fuente.addEventListener('estado', programarRecarga);
+    fuente.addEventListener('peso', evento => mostrarPeso(JSON.parse(evento.data)));
 }
 
-// Ejecuta la función cuando cargue la página
-window.onload = cargarPesajes;
-fetch('/api/pesajes')
-  .then(response => response.json())
-  .then(data => {
-      // Procesa los datos aquí
-      console.log(data);
-  })
-  .catch(error => {
-      console.error('Error cargando datos:', error);
-  });
+document.addEventListener('DOMContentLoaded', function() {
+    marcarTarjeta(filtroActivo);
+    conectarEventos();
+});
@@ -2,10 +2,19 @@ import flet as ft
 import threading
 from datetime import datetime
 from common.serial_manager import SerialManager
+from common.display_throttle import DisplayThrottle
+from common.multi_scale import MultiScaleManager
+from common.scale_protocols import WeightRecord
+from common.event_log import RingLog, LogArchive
+from common.pagination import PaginationManager
 from common.ui_components import UIComponents
 from common.database_manager import PesajesManager
 
 
+# Historial completo del registro de eventos
+EVENT_LOG_PATH = 'bascula_eventos.log'
+
+
 class BasculaView:
     def __init__(self, page, color_principal, color_secundario, pagination=None, vehicle_data=None, update_data_callback=None, stat_cards=None):
         self.page = page
@@ -28,13 +37,32 @@ class BasculaView:
         self.current_weight = "0.00"
         
 
-        # Lista para mantener un historial de pesos
-        self.weight_history = []
+        # Historial de pesos (búfer circular, ver más abajo)
         self.MAX_HISTORY_SIZE = 10  # Máximo número de pesos a mantener
         
-        # Lista para registro de eventos
-        self.event_log = []
+        # Registro de eventos: MAX_LOG_SIZE en pantalla, el resto en disco
         self.MAX_LOG_SIZE = 50
+        self.event_archive = LogArchive(EVENT_LOG_PATH)
+        
+        # Las lecturas de la báscula se agrupan y se muestran como máximo
+        # DISPLAY_RATE_HZ veces por segundo, siempre la más reciente
+        self.DISPLAY_RATE_HZ = 10
+        self.display_throttle = DisplayThrottle(self.show_reading, self.DISPLAY_RATE_HZ)
+        
+        # Básculas de la zona: la principal usa self.serial_manager y cada una
+        # lee en su propio hilo; los eventos llegan por un único bus
+        self.scale_manager = MultiScaleManager()
+        self.scale = self.scale_manager.add_scale(
+            "Báscula 1", serial_manager=self.serial_manager,
+            tolerance=20, dwell_time=2.0, min_weight=100
+        )
+        # Detección de peso estable sobre todas las tramas (no sólo las mostradas)
+        self.stability_detector = self.scale.detector
+        self.stable_event = None
+        # True cuando ya se capturó el vehículo que está sobre la báscula
+        self.auto_captured = False
+        self.weight_db = None
+        self.scale_manager.subscribe(self.on_scale_event)
         
         # Inicializar componentes UI
         self.stat_cards = self.create_stat_cards()
@@ -120,6 +148,21 @@ class BasculaView:
             auto_scroll=True
         )
         
+        # Búferes circulares: cada entrada agrega un control y retira el más antiguo
+        self.weight_history = RingLog(
+            self.weight_history_list,
+            self.MAX_HISTORY_SIZE,
+            self.create_weight_history_tile,
+        )
+        self.event_log = RingLog(
+            self.event_log_list,
+            self.MAX_LOG_SIZE,
+            self.create_event_log_tile,
+            page=self.page,
+            archive=self.event_archive,
+            archive_text=self.event_archive_text,
+        )
+        
         # Botones
         self.connect_button = ft.ElevatedButton(
             "Conectar",
@@ -149,6 +192,19 @@ class BasculaView:
             on_click=self.register_weight
         )
 
+        self.auto_capture_checkbox = ft.Checkbox(
+            label="Captura automática",
+            value=False,
+            tooltip="Registrar el peso en cuanto la lectura se estabilice",
+        )
+        
+        self.stability_text = ft.Text(
+            "INESTABLE",
+            size=12,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.ORANGE_700,
+        )
+
         self.cancelar_button = ft.ElevatedButton(
             "Cancelar",
             #icon=ft.Icons.SCALE,
@@ -307,8 +363,12 @@ class BasculaView:
         # Obtener el folio actual (basado en la fecha seleccionada)
         folio_actual = self.pesajes_manager.get_current_folio()
         
-        # Obtener los datos resumidos de pesajes
-        pesajes_data = self.pesajes_manager.get_pesajes_resumen(folio_actual)
+        # Obtener los datos resumidos de pesajes (de la réplica local si existe)
+        replica_sync = getattr(self.vehicle_data, 'replica_sync', None)
+        if replica_sync is not None:
+            pesajes_data = replica_sync.read_pesajes_resumen(folio_actual)
+        else:
+            pesajes_data = self.pesajes_manager.get_pesajes_resumen(folio_actual)
         
         # Si no hay datos, mostrar mensaje
         if not pesajes_data:
@@ -707,6 +767,13 @@ class BasculaView:
                                             width=500,
                                             height=150
                                         ),
+                                        ft.Row(
+                                            [
+                                                self.stability_text,
+                                                self.auto_capture_checkbox,
+                                            ],
+                                            alignment=ft.MainAxisAlignment.SPACE_EVENLY
+                                        ),
                                         ft.Row(
                                             [
                                                 self.cancelar_button,
@@ -768,11 +835,23 @@ class BasculaView:
                                         # Registro de eventos
                                         ft.Column(
                                             [
-                                                ft.Text(
-                                                    "Registro de eventos",
-                                                    weight=ft.FontWeight.BOLD,
-                                                    color=self.color_principal,
-                                                    size=15
+                                                ft.Row(
+                                                    [
+                                                        ft.Text(
+                                                            "Registro de eventos",
+                                                            weight=ft.FontWeight.BOLD,
+                                                            color=self.color_principal,
+                                                            size=15
+                                                        ),
+                                                        ft.IconButton(
+                                                            icon=ft.Icons.HISTORY,
+                                                            icon_color=self.color_principal,
+                                                            icon_size=18,
+                                                            tooltip="Ver historial completo",
+                                                            on_click=self.show_event_history
+                                                        ),
+                                                    ],
+                                                    spacing=0
                                                 ),
                                                 ft.Container(
                                                     content=self.event_log_list,
@@ -870,7 +949,7 @@ class BasculaView:
                 self.connect_button.bgcolor = ft.Colors.RED
                 
                 # Registrar callback para datos recibidos
-                self.serial_manager.set_data_callback(self.on_data_received)
+                self.serial_manager.set_data_callback(self.scale.on_frame)
                 
                 # Deshabilitar selección de puerto y configuración mientras está conectado
                 self.port_dropdown.disabled = True
@@ -906,14 +985,67 @@ class BasculaView:
         
         self.page.update()
     
-    def on_data_received(self, data):
-        """Callback para cuando se recibe datos del puerto serial"""
+    def on_scale_event(self, event):
+        """
+        Eventos del bus de básculas (desde el hilo despachador).
+        
+        Las tramas ya llegan interpretadas y pasadas por el detector de
+        estabilidad de su báscula; aquí sólo se guarda la lectura y
+        show_reading la muestra al ritmo de DISPLAY_RATE_HZ.
+        """
+        tipo = event["tipo"]
+        if event["bascula"] != self.scale.name:
+            # Otras básculas de la zona: sólo se registran sus pesos estables
+            if tipo == "estable":
+                self.add_event_log(f"{event['bascula']}: peso estable {event['estable']['peso']:.0f} kg")
+            return
+        
+        if tipo == "lectura":
+            reading = event["lectura"]
+            if reading.peso < self.stability_detector.min_weight:
+                # Báscula vacía: el siguiente vehículo puede capturarse
+                self.auto_captured = False
+                self.stable_event = None
+            self.display_throttle.push((event["texto"], reading))
+        elif tipo == "mensaje":
+            self.display_throttle.push((event["texto"], None))
+        elif tipo == "estable":
+            self.on_stable_weight(event["estable"])
+    
+    def on_stable_weight(self, event):
+        """
+        Evento de peso estable de la báscula principal (desde el hilo del bus).
+        
+        Args:
+            event: dict de StabilityDetector.add con peso, mínimo, máximo y muestras
+        """
+        self.stable_event = event
+        self.add_event_log(
+            f"Peso estable: {event['peso']:.0f} kg (±{(event['maximo'] - event['minimo']) / 2:.0f}, {event['muestras']} lecturas)"
+        )
+        
+        if not self.auto_capture_checkbox.value or self.auto_captured:
+            return
+        if not self.placa_field.value:
+            self.add_event_log("Captura automática pendiente: ingrese la placa del vehículo", is_error=True)
+            return
+        
+        self.auto_captured = True
+        threading.Thread(target=self.register_weight, kwargs={"stable_event": event}, daemon=True).start()
+    
+    def show_reading(self, frame):
+        """
+        Mostrar la lectura más reciente con una sola actualización de la página.
+        
+        Args:
+            frame: (texto de la trama, ScaleReading o None si no es un peso)
+        """
         try:
-            # Procesar el dato
+            data, reading = frame
             clean_data = data.strip() if isinstance(data, str) else str(data)
             
-            try:
-                weight_value = float(clean_data)
+            if reading is not None:
+                weight_value = reading.peso
                 
                 # AQUÍ ES DONDE SE CONFIGURA EL NÚMERO DE DECIMALES
                 # Cambia el .2f por .0f para ningún decimal, .1f para 1 decimal,
@@ -924,18 +1056,19 @@ class BasculaView:
                 
                 # Añadir al historial con timestamp
                 timestamp = datetime.now().strftime("%H:%M:%S")
-                self.add_to_weight_history(f"{timestamp} - {self.current_weight} kg")
-            except ValueError:
+                self.add_to_weight_history(f"{timestamp} - {self.current_weight} {reading.unidad}")
+            else:
                 # Si no es un número, mostramos el texto tal cual
                 self.current_weight = clean_data
                 
                 # Registrar como evento
-                self.add_event_log(f"Mensaje del dispositivo: {clean_data}")
+                self.add_event_log(f"Mensaje del dispositivo: {clean_data}", update=False)
             
             # Actualizar la tarjeta de peso
-            self.stat_cards['total'].set_value(self.current_weight)
+            self.stat_cards['total'].set_value(self.current_weight, update=False)
+            self.update_stability_indicator()
             
-            # Actualizar la UI desde el hilo principal
+            # Una sola actualización para tarjeta, historial y registro
             self.page.update()
 
         except Exception as e:
@@ -943,8 +1076,24 @@ class BasculaView:
             print(error_msg)
             self.add_event_log(error_msg, is_error=True)
     
-    def register_weight(self, e):
-        """Registrar el peso actual en la base de datos"""
+    def update_stability_indicator(self):
+        """Mostrar si la lectura está estable (sin actualizar la página)"""
+        if self.stability_detector.is_stable:
+            value, color = "ESTABLE", ft.Colors.GREEN_700
+        else:
+            value, color = "INESTABLE", ft.Colors.ORANGE_700
+        if self.stability_text.value != value:
+            self.stability_text.value = value
+            self.stability_text.color = color
+    
+    def register_weight(self, e=None, stable_event=None):
+        """
+        Registrar el peso en la base de datos.
+        
+        Args:
+            e: Evento del botón Registrar
+            stable_event: Evento de peso estable cuando la captura es automática
+        """
         if not self.placa_field.value:
             error_msg = "Por favor ingrese la placa del vehículo"
             self.add_event_log(error_msg, is_error=True)
@@ -969,28 +1118,78 @@ class BasculaView:
             self.page.update()
             return
             
+        # Peso a registrar: el promedio de la meseta si la lectura está estable
+        # (se guarda sin redondear; sólo los mensajes lo muestran en kg enteros)
+        if stable_event is None and self.stability_detector.is_stable:
+            stable_event = self.stable_event
+        if stable_event is not None:
+            peso = stable_event['peso']
+            estable = True
+        else:
+            try:
+                peso = float(self.current_weight)
+            except ValueError:
+                error_msg = f"La lectura actual no es un peso: {self.current_weight}"
+                self.add_event_log(error_msg, is_error=True)
+                return
+            estable = False
+        
         # Actualizar fecha/hora actual
         current_time = datetime.now()
         self.date_field.value = current_time.strftime("%d/%m/%Y %H:%M")
         
+        record = WeightRecord(
+            self.placa_field.value,
+            peso,
+            proceso=self.Proceso_bascula.value,
+            fecha=current_time,
+            estable=estable,
+            conductor=self.conductor_field.value or None,
+        )
+        
         # Registrar el peso 
-        success_msg = f"REGISTRO - Placa: {self.placa_field.value} - Peso: {self.current_weight} kg - Proceso: {self.Proceso_bascula.value} - Ejes: {self.ejes_field.value} - Cliente: {self.cliente_field.value}"
-        self.add_event_log(success_msg)
+        modo = "AUTOMÁTICO" if stable_event is not None and e is None else "REGISTRO"
+        success_msg = f"{modo} - Placa: {record.placa} - Peso: {peso:.0f} kg - Proceso: {record.proceso} - Ejes: {self.ejes_field.value} - Cliente: {self.cliente_field.value}"
+        if not estable:
+            success_msg += " (peso inestable)"
+        self.add_event_log(success_msg, is_error=not estable, update=False)
         
         # Añadir al historial en formato especial (puede ser útil para reportes)
         timestamp = current_time.strftime("%d/%m/%Y %H:%M:%S")
-        history_entry = f"{timestamp} | {self.placa_field.value} | {self.current_weight} kg"
+        history_entry = f"{timestamp} | {record.placa} | {peso:.0f} kg"
         self.add_to_weight_history(history_entry)
         
-        # Aquí iría la lógica para guardar en la base de datos
-        # Por ahora solo mostramos un mensaje
         self.page.snack_bar = ft.SnackBar(
             content=ft.Text(success_msg),
-            bgcolor=ft.Colors.GREEN
+            bgcolor=ft.Colors.GREEN if estable else ft.Colors.ORANGE
         )
         self.page.snack_bar.open = True
         self.page.update()
+        
+        # Guardar en la base de datos sin bloquear la interfaz
+        threading.Thread(target=self.save_weight_record, args=(record,), daemon=True).start()
     
+    def save_weight_record(self, record):
+        """
+        Encolar un WeightRecord para BDPesajes (se ejecuta en un hilo aparte).
+        
+        El registro queda en el diario local al instante y se escribe en la
+        base junto con los demás pesajes del mismo lote.
+        """
+        try:
+            if self.weight_db is None:
+                from common.weight_database import WeightDatabaseManager
+                db_manager = self.vehicle_data.db_manager if self.vehicle_data else None
+                self.weight_db = WeightDatabaseManager(db_manager)
+            self.weight_db.enqueue_weight_record(
+                record,
+                on_saved=lambda record_id: self.add_event_log(
+                    f"Pesaje guardado (ID {record_id}) - Placa: {record.placa} - {record.peso:.0f} kg"
+                )
+            )
+        except Exception as e:
+            print(f"Error al guardar el pesaje: {e}")
+            self.add_event_log(f"No se pudo guardar el pesaje de {record.placa}", is_error=True)
 
     def show_config_modal(self, e=None):
         """Mostrar el modal de configuración del puerto serial"""
@@ -1030,7 +1229,7 @@ class BasculaView:
             self.connect_button.bgcolor = ft.Colors.RED
             
             # Registrar callback para datos recibidos
-            self.serial_manager.set_data_callback(self.on_data_received)
+            self.serial_manager.set_data_callback(self.scale.on_frame)
             
             # Deshabilitar selección de puerto y configuración mientras está conectado
             self.port_dropdown.disabled = True
@@ -1071,56 +1270,83 @@ class BasculaView:
         self.page.update()
     
     def add_to_weight_history(self, weight_entry):
-        """Añadir un peso al historial"""
-        # Limitar tamaño del historial
-        if len(self.weight_history) >= self.MAX_HISTORY_SIZE:
-            self.weight_history.pop(0)  # Eliminar el más antiguo
-            
-        # Añadir nueva entrada
-        self.weight_history.append(weight_entry)
-        
-        # Actualizar ListView
-        self.weight_history_list.controls.clear()
-        for entry in self.weight_history:
-            self.weight_history_list.controls.append(
-                ft.ListTile(
-                    title=ft.Text(entry, size=12),
-                    dense=True,
-                    leading=ft.Icon(ft.Icons.SCALE, color=self.color_principal, size=16)
-                )
+        """Añadir un peso al historial (se muestra en la próxima actualización de la página)"""
+        self.weight_history.append(weight_entry, update=False)
+    
+    def create_weight_history_tile(self, weight_entry):
+        return ft.ListTile(
+            title=ft.Text(weight_entry, size=12),
+            dense=True,
+            leading=ft.Icon(ft.Icons.SCALE, color=self.color_principal, size=16)
+        )
+    
+    def add_event_log(self, message, is_error=False, update=True):
+        """
+        Añadir un evento al registro.
+        
+        Con update=True la página se actualiza poco después, agrupando los
+        eventos seguidos; con False se muestra en el próximo page.update().
+        """
+        now = datetime.now()
+        self.event_log.append((now, message, is_error), update=update)
+    
+    def create_event_log_tile(self, event):
+        timestamp, message, is_error = event
+        return ft.ListTile(
+            title=ft.Text(
+                f"{timestamp.strftime('%H:%M:%S')} - {message}",
+                size=12,
+                color=ft.Colors.RED if is_error else None
+            ),
+            dense=True,
+            leading=ft.Icon(
+                ft.Icons.ERROR if is_error else ft.Icons.INFO,
+                color=ft.Colors.RED if is_error else ft.Colors.BLUE,
+                size=16
             )
+        )
     
-    def add_event_log(self, message, is_error=False):
-        """Añadir un evento al registro"""
-        # Limitar tamaño del registro
-        if len(self.event_log) >= self.MAX_LOG_SIZE:
-            self.event_log.pop(0)  # Eliminar el más antiguo
-            
-        # Añadir nueva entrada
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        entry = f"{timestamp} - {message}"
-        self.event_log.append(entry)
-        
-        # Actualizar ListView
-        self.event_log_list.controls.clear()
-        for log_entry in self.event_log:
-            self.event_log_list.controls.append(
-                ft.ListTile(
-                    title=ft.Text(
-                        log_entry, 
-                        size=12,
-                        color=ft.Colors.RED if is_error else None
-                    ),
-                    dense=True,
-                    leading=ft.Icon(
-                        ft.Icons.ERROR if is_error else ft.Icons.INFO,
-                        color=ft.Colors.RED if is_error else ft.Colors.BLUE,
-                        size=16
-                    )
+    @staticmethod
+    def event_archive_text(event):
+        timestamp, message, is_error = event
+        nivel = "ERROR" if is_error else "INFO"
+        return f"{timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {nivel} | {message}"
+    
+    def show_event_history(self, e=None):
+        """Mostrar el historial completo del registro, paginado desde el disco"""
+        history_list = ft.ListView(spacing=2, divider_thickness=1, expand=True)
+        pagination = PaginationManager(self.page, items_per_page=100)
+        
+        def render_page():
+            history_list.controls = [
+                ft.Text(
+                    line,
+                    size=12,
+                    color=ft.Colors.RED if " | ERROR | " in line else None,
+                    selectable=True
                 )
-            )
-        # Forzar actualización de la interfaz
-        self.page.update()
+                for line in pagination.get_current_page_data()
+            ]
+            self.page.update()
+        
+        pagination.set_page_change_callback(render_page)
+        pagination.data = self.event_archive
+        # Abrir en la última página (los eventos más recientes)
+        pagination.current_page = pagination.get_total_pages()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Historial de eventos ({len(self.event_archive)})"),
+            content=ft.Container(
+                content=ft.Column([history_list, pagination.get_controls()], spacing=5),
+                width=800,
+                height=500
+            ),
+            actions=[ft.TextButton("Cerrar", on_click=lambda e: self.close_modal(e, dialog))],
+        )
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        pagination.update_ui()
+        render_page()
     
     def on_config_saved(self):
         """Callback para cuando se guarda la configuración"""
@@ -1234,10 +1460,10 @@ class StatCard:
             width=300
         )
     
-    def set_value(self, value):
+    def set_value(self, value, update=True):
         self.value = value
         self.card_content.controls[0].controls[0].value = value
-        if self.page:
+        if self.page and update:
             self.page.update()
 
     def on_data_received(self, data):
@@ -1,16 +1,61 @@
 import flet as ft
 
 class CMCView:
-    def __init__(self, page, color_principal, stat_cards, data_table, pagination, update_data_callback):
+    def __init__(self, page, color_principal, stat_cards, data_table, pagination, update_data_callback,
+                 virtual_table=None, on_mode_change=None, on_source_change=None):
         self.page = page
         self.color_principal = color_principal
         self.stat_cards = stat_cards
         self.data_table = data_table
         self.pagination = pagination
         self.update_data_callback = update_data_callback
+        self.virtual_table = virtual_table
+        self.on_mode_change = on_mode_change
+        self.on_source_change = on_source_change
+        # Origen de los datos: folio completo en memoria o consultas paginadas en el servidor
+        self.server_side = False
+        # Modo de la tabla: paginada (por defecto) o virtualizada con desplazamiento continuo
+        self.virtual_mode = False
         self.view = self.create_view()
         
     def create_view(self):
+        self.paged_container = ft.Container(
+            content=ft.ListView(
+                controls=[self.data_table],
+                expand=True,
+                auto_scroll=True
+            ),
+            padding=ft.padding.only(left=0, right=0, bottom=0, top=0),
+            bgcolor=ft.colors,
+            border_radius=10,
+            expand=True,
+            height=690,
+        )
+        self.virtual_container = ft.Container(
+            content=self.virtual_table.get_view() if self.virtual_table else None,
+            border_radius=10,
+            expand=True,
+            height=690,
+            visible=False,
+        )
+        self.pagination_controls = self.pagination.get_controls()
+        self.mode_button = ft.IconButton(
+            icon=ft.Icons.VIEW_STREAM,
+            icon_color=self.color_principal,
+            tooltip="Desplazamiento continuo",
+            on_click=self.toggle_mode,
+            visible=self.virtual_table is not None,
+        )
+        # Antigüedad de los datos mostrados cuando se leen de la réplica local
+        self.replica_status = ft.Text("", size=11, color=ft.Colors.GREY_600)
+        self.source_button = ft.IconButton(
+            icon=ft.Icons.STORAGE,
+            icon_color=ft.Colors.GREY_500,
+            tooltip="Consultar por páginas en el servidor",
+            on_click=self.toggle_source,
+            visible=self.on_source_change is not None,
+        )
+
         return ft.Column(
             [
                 ft.Container(
@@ -34,27 +79,24 @@ class CMCView:
                             ft.Row(
                                 [
                                     ft.Text("Enturnados", size=20, weight=ft.FontWeight.BOLD, color=self.color_principal),
-                                    ft.ElevatedButton(
-                                        "Actualizar", 
-                                        on_click=self.update_data_callback, 
-                                        icon=ft.Icons.REFRESH
+                                    ft.Row(
+                                        [
+                                            self.replica_status,
+                                            self.source_button,
+                                            self.mode_button,
+                                            ft.ElevatedButton(
+                                                "Actualizar", 
+                                                on_click=self.update_data_callback, 
+                                                icon=ft.Icons.REFRESH
+                                            ),
+                                        ]
                                     ),
                                 ],
                                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                             ),
-                            ft.Container(
-                                content=ft.ListView(
-                                    controls=[self.data_table],
-                                    expand=True,
-                                    auto_scroll=True
-                                ),
-                                padding=ft.padding.only(left=0, right=0, bottom=0, top=0),
-                                bgcolor=ft.colors,
-                                border_radius=10,
-                                expand=True,
-                                height=690,
-                            ),
-                            self.pagination.get_controls(),
+                            self.paged_container,
+                            self.virtual_container,
+                            self.pagination_controls,
                         ],
                         spacing=5,
                     ),
@@ -66,5 +108,55 @@ class CMCView:
             visible=True,
         )
     
+    def toggle_mode(self, e=None):
+        """Alternar entre la tabla paginada y la tabla virtualizada"""
+        self.set_virtual_mode(not self.virtual_mode)
+
+    def set_virtual_mode(self, enabled):
+        if self.virtual_table is None:
+            return
+        self.virtual_mode = enabled
+        self.paged_container.visible = not enabled
+        self.pagination_controls.visible = not enabled
+        self.virtual_container.visible = enabled
+        self.mode_button.icon = ft.Icons.VIEW_LIST if enabled else ft.Icons.VIEW_STREAM
+        self.mode_button.tooltip = "Vista por páginas" if enabled else "Desplazamiento continuo"
+        if self.on_mode_change:
+            self.on_mode_change(enabled)
+        self.page.update()
+
+    def set_replica_status(self, staleness, error=None):
+        """
+        Mostrar la antigüedad de la copia local.
+        
+        Args:
+            staleness: Segundos desde la última copia, o None si no hay réplica
+            error: Último error de sincronización (opcional)
+        """
+        if staleness is None:
+            self.replica_status.value = ""
+            return
+        if staleness < 60:
+            edad = f"{int(staleness)} s"
+        elif staleness < 3600:
+            edad = f"{int(staleness // 60)} min"
+        else:
+            edad = f"{int(staleness // 3600)} h"
+        self.replica_status.value = f"Copia local de hace {edad}"
+        self.replica_status.color = ft.Colors.RED_400 if error else ft.Colors.GREY_600
+        self.replica_status.tooltip = f"Sin conexión con Access: {error}" if error else None
+
+    def toggle_source(self, e=None):
+        """Alternar entre el folio en memoria y la consulta paginada en el servidor"""
+        self.server_side = not self.server_side
+        self.source_button.icon_color = self.color_principal if self.server_side else ft.Colors.GREY_500
+        self.source_button.tooltip = (
+            "Cargar el folio completo" if self.server_side
+            else "Consultar por páginas en el servidor"
+        )
+        if self.on_source_change:
+            self.on_source_change(self.server_side)
+        self.page.update()
+
     def get_view(self):
         return self.view
\ No newline at end of file
@@ -1,5 +1,6 @@
 import flet as ft
 import serial
+from common.scale_protocols import parser_options, DEFAULT_PROTOCOL
 
 class SerialConfigModal:
     def __init__(self, page, serial_manager, on_config_saved=None, parent_view=None):
@@ -31,6 +32,28 @@ class SerialConfigModal:
             width=300
         )
         
+        # Fin de trama que envía la báscula (ver FrameAccumulator)
+        self.terminator_dropdown = ft.Dropdown(
+            label="Fin de trama",
+            options=[
+                ft.dropdown.Option("line", "CR, LF o CRLF"),
+                ft.dropdown.Option("cr", "CR"),
+                ft.dropdown.Option("lf", "LF"),
+                ft.dropdown.Option("crlf", "CRLF"),
+                ft.dropdown.Option("stx_etx", "STX ... ETX"),
+            ],
+            value="line",
+            width=300
+        )
+        
+        # Formato de las tramas del indicador (ver common.scale_protocols)
+        self.protocol_dropdown = ft.Dropdown(
+            label="Protocolo del indicador",
+            options=[ft.dropdown.Option(name, description) for name, description in parser_options()],
+            value=DEFAULT_PROTOCOL,
+            width=300
+        )
+        
         # Indicador de estado
         self.connection_status = ft.Text(
             "Desconectado",
@@ -100,6 +123,8 @@ class SerialConfigModal:
             # Actualizar baudrate seleccionado
             current_baudrate = str(self.serial_manager.baudrate) if hasattr(self.serial_manager, 'baudrate') else "9600"
             self.baudrate_dropdown.value = current_baudrate
+            self.terminator_dropdown.value = getattr(self.serial_manager, 'terminator', "line")
+            self.protocol_dropdown.value = getattr(self.serial_manager, 'protocol', DEFAULT_PROTOCOL)
             
             # Crear el diálogo
             self.overlay = ft.AlertDialog(
@@ -123,6 +148,8 @@ class SerialConfigModal:
                         # Sección de configuración
                         ft.Text("Parámetros de Comunicación", weight=ft.FontWeight.BOLD),
                         self.baudrate_dropdown,
+                        self.terminator_dropdown,
+                        self.protocol_dropdown,
                     ], spacing=10, scroll=ft.ScrollMode.AUTO),
                     width=500,
                     height=400,
@@ -254,8 +281,14 @@ class SerialConfigModal:
             baudrate = int(self.baudrate_dropdown.value)
             self.serial_manager.baudrate = baudrate
             
+            # El hilo de lectura toma el nuevo terminador en la siguiente lectura
+            self.serial_manager.terminator = self.terminator_dropdown.value or "line"
+            
+            # Las tramas siguientes se interpretan con el nuevo protocolo
+            self.serial_manager.protocol = self.protocol_dropdown.value or DEFAULT_PROTOCOL
+            
             # Registrar evento - lo hacemos a través de BasculaView
-            config_msg = f"Configuración guardada: {baudrate} baudios"
+            config_msg = f"Configuración guardada: {baudrate} baudios, protocolo {self.serial_manager.protocol}"
             if self.parent_view and hasattr(self.parent_view, 'add_event_log'):
                 self.parent_view.add_event_log(config_msg)
             